@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+# Measures how long 'import pylink' takes in a fresh interpreter, and
+# makes sure none of the heavy plotting/templating/interpolation
+# packages sneak into the import path.
+
+import argparse
+import subprocess
+import sys
+
+HEAVY = ['matplotlib', 'scipy', 'jinja2']
+
+PROBE = '''
+import sys, time
+t = time.perf_counter()
+import pylink
+dt = time.perf_counter() - t
+heavy = [m for m in %r if m in sys.modules]
+print('%%f %%s' %% (dt, ','.join(heavy)))
+''' % HEAVY
+
+
+def measure(n):
+    times = []
+    heavy = set()
+    for i in range(n):
+        out = subprocess.check_output([sys.executable, '-c', PROBE])
+        dt, loaded = (out.decode().strip().split(' ') + [''])[:2]
+        times.append(float(dt))
+        heavy.update([m for m in loaded.split(',') if m])
+    return (times, heavy)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time "import pylink"')
+    parser.add_argument('-n', type=int, default=10,
+                        help='number of fresh interpreters to sample')
+    args = parser.parse_args()
+
+    (times, heavy) = measure(args.n)
+    times.sort()
+    print('import pylink (%d runs)' % len(times))
+    print('  min:    %.1f ms' % (times[0] * 1e3))
+    print('  median: %.1f ms' % (times[len(times)//2] * 1e3))
+    print('  max:    %.1f ms' % (times[-1] * 1e3))
+    if heavy:
+        print('  heavy modules loaded: %s' % ', '.join(sorted(heavy)))
+    else:
+        print('  heavy modules loaded: none')
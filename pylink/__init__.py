@@ -19,19 +19,34 @@ Geometry
 Interconnect
 Code
 Modulation
+MultiCarrier
 Receiver
 Transmitter
 
 === Other Objects ===
 Element
 DAGModel
+EPFDResult
 LoopException
+ModelRecipe
+ModelSchema
+Distribution
+Normal
+Uniform
+Triangular
+Empirical
 BitrateFigure
 CanonicalPFDFigure
 ExpectedPFDFigure
 PFDvsBWFigure
 BitrateFigure
 Report
+BudgetService
+Reactor
+Sweep
+SweepChunk
+FigureCache
+RenderJob
 TaggedAttribute
 
 === Utility Functions ===
@@ -45,6 +60,16 @@ e_field_to_eirp_dbw
 eirp_dbw_to_e_field_v_per_m
 human_hz
 human_m
+render_all
+save_model
+load_model
+monte_carlo
+parallel_sweep
+pfd_compliance
+epfd
+frequency_sweep
+sensitivity
+tornado
 """
 
 __title__ = 'pylink'
@@ -52,17 +77,36 @@ __author__ = 'Harrison Caudill <harrison@hypersphere.org>'
 __version__ = '0.9'
 __license__ = 'BSD'
 
+import importlib
+
 
 from pylink.element import Element
 from pylink.model import DAGModel
 from pylink.model import LoopException
-from pylink.report import BitrateFigure
-from pylink.report import CanonicalPFDFigure
-from pylink.report import ExpectedPFDFigure
-from pylink.report import PFDvsBWFigure
-from pylink.report import BitrateFigure
-from pylink.report import Report
+from pylink.parallel import ModelRecipe
+from pylink.parallel import parallel_sweep
+from pylink.reactive import Reactor
+from pylink.render import FigureCache
+from pylink.render import RenderJob
+from pylink.render import render_all
+from pylink.schema import ModelSchema
+from pylink.snapshot import load_model
+from pylink.sweep import Sweep
+from pylink.sweep import SweepChunk
+from pylink.snapshot import save_model
 from pylink.tagged_attribute import TaggedAttribute
+from pylink.uncertainty import Distribution
+from pylink.uncertainty import Normal
+from pylink.uncertainty import Uniform
+from pylink.uncertainty import Triangular
+from pylink.uncertainty import Empirical
+from pylink.uncertainty import monte_carlo
+from pylink.compliance import pfd_compliance
+from pylink.epfd import EPFDResult
+from pylink.epfd import epfd
+from pylink.frequency import frequency_sweep
+from pylink.sensitivity import sensitivity
+from pylink.sensitivity import tornado
 from pylink.utils import to_db
 from pylink.utils import from_db
 from pylink.utils import spreading_loss_db
@@ -84,6 +128,32 @@ from pylink.tributaries.modulation import Code
 from pylink.tributaries.modulation import Modulation
 from pylink.tributaries.modulation import NORMAL_DVBS2X_PERFORMANCE
 from pylink.tributaries.modulation import PERFECT_DVBS2X_PERFORMANCE
+from pylink.tributaries.multicarrier import MultiCarrier
 from pylink.tributaries.receiver import Receiver
 from pylink.tributaries.transmitter import Transmitter
 from pylink.tributaries.hyperspectral import HyperSpectralSNRBudget
+
+
+# The report module drags in matplotlib and jinja2, which dominate the
+# cost of 'import pylink', so its names are only resolved on first use.
+# Same goes for the service and asyncio.
+_LAZY = {
+    'BudgetService': 'pylink.service',
+    'BitrateFigure': 'pylink.report',
+    'CanonicalPFDFigure': 'pylink.report',
+    'ExpectedPFDFigure': 'pylink.report',
+    'PFDvsBWFigure': 'pylink.report',
+    'Report': 'pylink.report',
+    }
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module 'pylink' has no attribute '%s'" % name)
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(_LAZY.keys()))
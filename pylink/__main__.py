@@ -0,0 +1,8 @@
+#!/usr/bin/python
+
+import sys
+
+from pylink.cli import main
+
+
+sys.exit(main())
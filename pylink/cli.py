@@ -0,0 +1,367 @@
+#!/usr/bin/python
+
+"""Command-line batch evaluation of link budgets.
+
+Reads scenarios (rows of node overrides) from a CSV or NPZ file,
+evaluates the requested output nodes for each one, and writes CSV as
+it goes, so arbitrarily long inputs run in bounded memory:
+
+  pylink examples/eg_budgets.py:budget scenarios.csv \\
+      -o link_margin_db -o cn0_db --workers 4 > results.csv
+
+The budget is given as <module or file>:<attribute>, where the
+attribute is either a DAGModel or a callable returning one, or as the
+path of a snapshot saved with save_model.
+
+CSV scenarios have a header row of node names, and every row must
+have a numeric value for each of them.  NPZ scenarios hold one equal-length
+array per node, named after it, and are read a chunk of rows at a
+time rather than loaded whole.
+"""
+
+import argparse
+import csv
+import importlib
+import importlib.util
+import itertools
+import os
+import sys
+
+from pylink.model import DAGModel
+
+
+def load_budget(spec):
+    """Loads a DAGModel from a command-line budget spec.
+
+    spec -- 'package.module:attr', 'path/to/file.py:attr' or the path
+            to a save_model snapshot directory
+
+    The attribute may be a DAGModel or a callable returning one.
+    """
+    if os.path.isdir(spec):
+        from pylink.snapshot import load_model
+        return load_model(spec)
+
+    if ':' not in spec:
+        raise ValueError("Budgets are given as <module>:<attribute>, "
+                         + "not %s" % spec)
+    (where, attr,) = spec.rsplit(':', 1)
+
+    if where.endswith('.py') or os.path.sep in where:
+        name = os.path.splitext(os.path.basename(where))[0]
+        mod_spec = importlib.util.spec_from_file_location(name, where)
+        if mod_spec is None:
+            raise ValueError("Can't load budget from %s" % where)
+        module = importlib.util.module_from_spec(mod_spec)
+        mod_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(where)
+
+    budget = getattr(module, attr)
+    if not isinstance(budget, DAGModel):
+        budget = budget()
+    if not isinstance(budget, DAGModel):
+        raise ValueError("%s did not give a DAGModel" % spec)
+    return budget
+
+
+class ScenarioError(ValueError):
+    """A malformed scenario file.
+    """
+    pass
+
+
+def _parse_value(s):
+    for kind in (int, float):
+        try:
+            return kind(s)
+        except ValueError:
+            pass
+    raise ValueError("not a number: %r" % s)
+
+
+def _read_csv(fd):
+    reader = csv.reader(fd)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ScenarioError("No header row of node names")
+
+    def _rows():
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise ScenarioError("Line %d has %d values, expected %d"
+                                    % (reader.line_num, len(row),
+                                       len(header)))
+            try:
+                yield [_parse_value(v) for v in row]
+            except ValueError as err:
+                raise ScenarioError("Line %d: %s" % (reader.line_num, err))
+    return (header, _rows(),)
+
+
+class _NpzColumn(object):
+    """Reads one array of an NPZ archive a chunk of rows at a time.
+
+    np.load doesn't memory-map the members of an archive (mmap_mode
+    only applies to plain .npy files), and indexing one decompresses
+    the whole array.  Instead, the member is streamed from the zip
+    file, which works for compressed archives too.
+    """
+
+    def __init__(self, archive, name):
+        import numpy as np
+
+        self.name = name
+        self._fd = archive.zip.open(name + '.npy')
+        version = np.lib.format.read_magic(self._fd)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(self._fd)
+        else:
+            header = np.lib.format.read_array_header_2_0(self._fd)
+        (self.shape, fortran_order, self.dtype,) = header
+        if not self.shape:
+            raise ScenarioError("Column %s isn't an array" % name)
+        self._data = None
+        if self.dtype.hasobject or (fortran_order and len(self.shape) > 1):
+            # Can't be read in pieces
+            self._fd.close()
+            self._data = archive[name]
+        self._row_size = self.dtype.itemsize
+        for n in self.shape[1:]:
+            self._row_size *= n
+
+    def __len__(self):
+        return self.shape[0]
+
+    def read(self, start, count):
+        """Returns the next <count> rows, which begin at <start>.
+        """
+        import numpy as np
+
+        if self._data is not None:
+            return self._data[start:start + count]
+        buf = self._fd.read(count * self._row_size)
+        chunk = np.frombuffer(buf, dtype=self.dtype)
+        return chunk.reshape((-1,) + tuple(self.shape[1:]))
+
+
+def _read_npz(path, chunk_size=256):
+    import numpy as np
+
+    data = np.load(path)
+    header = list(data.files)
+    columns = [_NpzColumn(data, name) for name in header]
+    n = len(columns[0]) if columns else 0
+    for col in columns:
+        if len(col) != n:
+            raise ScenarioError("Column %s has %d rows, expected %d"
+                                % (col.name, len(col), n))
+
+    def _rows():
+        with data:
+            for start in range(0, n, chunk_size):
+                count = min(chunk_size, n - start)
+                chunk = [col.read(start, count) for col in columns]
+                for i in range(count):
+                    yield [c[i].item() if 1 == c.ndim else c[i]
+                           for c in chunk]
+    return (header, _rows(),)
+
+
+class _Evaluator(object):
+    """Evaluates the outputs of one model for rows of input values.
+    """
+
+    def __init__(self, model, inputs, outputs):
+        self.model = model
+        self.inputs = [model.node_num(n) for n in inputs]
+        self.outputs = [model.node_num(n) for n in outputs]
+
+    def __call__(self, row):
+        if len(row) != len(self.inputs):
+            raise ScenarioError("Got %d values for %d inputs"
+                                % (len(row), len(self.inputs)))
+        m = self.model
+        with m.scoped(dict(zip(self.inputs, row))):
+            return [m.cached_calculate(node) for node in self.outputs]
+
+    def chunk(self, rows):
+        return [self(row) for row in rows]
+
+
+# Per-process evaluator used by the worker pool
+_worker = None
+
+
+def _init_worker(spec, inputs, outputs):
+    global _worker
+    _worker = _Evaluator(load_budget(spec), inputs, outputs)
+
+
+def _evaluate_chunk(rows):
+    return _worker.chunk(rows)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def evaluate_stream(model, spec, inputs, rows, outputs,
+                    workers=1, chunk_size=256):
+    """Yields the output values for each row of inputs, in order.
+
+    model -- DAGModel used for serial evaluation
+    spec -- budget spec each worker process loads its own model from
+    inputs -- node names matching the columns of each row
+    rows -- iterable of rows of input values
+    outputs -- node names to evaluate
+    workers -- number of worker processes (1 evaluates in-process)
+    chunk_size -- rows handed to a worker at a time
+
+    At most 2*workers chunks are held in memory at once, regardless
+    of the length of <rows>.
+    """
+    chunks = _chunks(rows, chunk_size)
+
+    if workers <= 1:
+        evaluator = _Evaluator(model, inputs, outputs)
+        for chunk in chunks:
+            for result in evaluator.chunk(chunk):
+                yield result
+        return
+
+    import multiprocessing
+
+    with multiprocessing.Pool(workers,
+                              initializer=_init_worker,
+                              initargs=(spec, inputs, outputs,)) as pool:
+        # Pool.imap would drain the whole input up front, so feed it
+        # a bounded window of chunks at a time.
+        while True:
+            window = list(itertools.islice(chunks, 2 * workers))
+            if not window:
+                return
+            for results in pool.imap(_evaluate_chunk, window):
+                for result in results:
+                    yield result
+
+
+def _cell(value):
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    return value
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='pylink',
+        description='Evaluate link budget nodes for a stream of scenarios.')
+    parser.add_argument('budget',
+                        help=('<module or file.py>:<attribute> giving a '
+                              + 'DAGModel (or a callable returning one), '
+                              + 'or a model snapshot directory'))
+    parser.add_argument('scenarios', nargs='?', default='-',
+                        help=('CSV (with a header of node names) or NPZ '
+                              + 'file of scenarios, - for CSV on stdin'))
+    parser.add_argument('-o', '--output', action='append', required=True,
+                        dest='outputs', metavar='NODE',
+                        help='node to evaluate, may be repeated')
+    parser.add_argument('-f', '--format', choices=['csv', 'npz'],
+                        help='scenario format (default: from the extension)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='scenarios handed to a worker at a time')
+    parser.add_argument('--no-inputs', action='store_true',
+                        help="don't repeat the scenario columns in the output")
+    parser.add_argument('--out', default='-',
+                        help='output CSV file, - for stdout')
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the 'pylink' command.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    try:
+        model = load_budget(args.budget)
+    except (ImportError, AttributeError, ValueError, OSError) as err:
+        parser.error("Can't load budget %s: %s" % (args.budget, err))
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'npz' if args.scenarios.endswith('.npz') else 'csv'
+
+    in_fd = None
+    try:
+        if fmt == 'npz':
+            (inputs, rows,) = _read_npz(args.scenarios, args.chunk_size)
+        elif args.scenarios == '-':
+            (inputs, rows,) = _read_csv(sys.stdin)
+        else:
+            in_fd = open(args.scenarios, 'r', newline='')
+            (inputs, rows,) = _read_csv(in_fd)
+    except (ScenarioError, OSError) as err:
+        if in_fd is not None:
+            in_fd.close()
+        parser.error("Can't read %s: %s" % (args.scenarios, err))
+
+    for name in inputs + args.outputs:
+        if name not in model._nodes:
+            parser.error("Unknown node: %s" % name)
+
+    out_fd = sys.stdout
+    if args.out != '-':
+        out_fd = open(args.out, 'w', newline='')
+
+    try:
+        writer = csv.writer(out_fd)
+        header = list(args.outputs)
+        if not args.no_inputs:
+            header = inputs + header
+        writer.writerow(header)
+
+        if args.no_inputs:
+            results = evaluate_stream(model, args.budget, inputs, rows,
+                                      args.outputs,
+                                      workers=args.workers,
+                                      chunk_size=args.chunk_size)
+            for result in results:
+                writer.writerow([_cell(v) for v in result])
+        else:
+            # Keep a copy of each row so the inputs can be echoed
+            (rows, echo,) = itertools.tee(rows)
+            results = evaluate_stream(model, args.budget, inputs, rows,
+                                      args.outputs,
+                                      workers=args.workers,
+                                      chunk_size=args.chunk_size)
+            for row, result in zip(echo, results):
+                writer.writerow([_cell(v) for v in row + result])
+    except ScenarioError as err:
+        # Rows are only checked as they're read, so some output may
+        # have been written already
+        sys.stderr.write("pylink: %s: %s\n" % (args.scenarios, err))
+        return 1
+    finally:
+        if in_fd is not None:
+            in_fd.close()
+        if out_fd is not sys.stdout:
+            out_fd.close()
+        else:
+            out_fd.flush()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
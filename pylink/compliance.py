@@ -0,0 +1,165 @@
+#!/usr/bin/python
+
+"""Numerical PFD compliance checks against elevation masks.
+
+A PFD mask (such as the gs_pfd_limits given to the Channel) is a
+piecewise-linear list of (elevation_deg, pfd_dbw_per_m2) points.
+pfd_compliance() evaluates the PFD across a dense elevation grid in a
+single vectorized pass, interpolates the mask onto the same grid, and
+reports the margin against it:
+
+  limits = [(0, -150), (5, -150), (25, -140), (90, -140)]
+  c = pylink.pfd_compliance(m, limits, bw=4e3)
+  c.compliant                   # => True
+  c.worst_margin_db             # and c.worst_elevation_deg
+  c.violations                  # => [(start_deg, end_deg), ...]
+  c.max_allowable_eirp_dbw      # EIRP at which the worst margin is 0
+"""
+
+import numpy as np
+
+from pylink import utils
+from pylink.uncertainty import DEFAULT_FIXED
+from pylink.uncertainty import _vectorized_eval
+
+
+def _eval_vs_el(model, elevations_deg, names):
+    e = model.enum
+    fixed = [model.node_num(n) for n in DEFAULT_FIXED if n in model._nodes]
+    nodes = [model.node_num(n) for n in names]
+    values = _vectorized_eval(model,
+                              {e.min_elevation_deg: elevations_deg},
+                              nodes, fixed)
+    return [values[n] for n in nodes]
+
+
+def canonical_pfd_vs_el(model, elevations_deg, bw=4e3):
+    """Returns the canonical PFD in <bw> Hz at each elevation.
+
+    This is what CanonicalPFDFigure draws: peak EIRP, boresight and
+    full use of the allocation.
+    """
+    elevations_deg = np.asarray(elevations_deg, dtype=float)
+    (pf,) = _eval_vs_el(model, elevations_deg, ['canonical_pf_dbw_per_m2'])
+    return utils.pfd_hz_manual_adjust(pf, model.allocation_hz, bw)
+
+
+def expected_pfd_vs_el(model, elevations_deg, bw=4e3):
+    """Returns the expected PFD in <bw> Hz at each elevation.
+
+    Unlike ExpectedPFDFigure, the modulation code (and so the
+    occupied bandwidth) is held at the one chosen for the model's own
+    elevation.
+    """
+    elevations_deg = np.asarray(elevations_deg, dtype=float)
+    (pf, bw_hz,) = _eval_vs_el(model, elevations_deg,
+                               ['pf_dbw_per_m2', 'required_rx_bw_hz'])
+    return utils.pfd_hz_manual_adjust(pf, bw_hz, bw)
+
+
+def _crossing(el_a, el_b, m_a, m_b):
+    # Where the margin, linear between two grid points, crosses zero
+    return el_a + (el_b - el_a) * m_a / (m_a - m_b)
+
+
+def _violations(elevations, margins):
+    bad = margins < 0
+    retval = []
+    i = 0
+    n = len(margins)
+    while i < n:
+        if not bad[i]:
+            i += 1
+            continue
+        j = i
+        while j + 1 < n and bad[j+1]:
+            j += 1
+        if i == 0:
+            start = elevations[0]
+        else:
+            start = _crossing(elevations[i-1], elevations[i],
+                              margins[i-1], margins[i])
+        if j == n - 1:
+            end = elevations[-1]
+        else:
+            end = _crossing(elevations[j], elevations[j+1],
+                            margins[j], margins[j+1])
+        retval.append((float(start), float(end),))
+        i = j + 1
+    return retval
+
+
+class PFDCompliance(object):
+    """The PFD of a model against a mask across an elevation grid.
+
+    <elevations_deg>, <pfd>, <limit>, <margin_db> and <max_eirp_dbw>
+    are equal-length arrays.  <max_eirp_dbw> is the EIRP at which the
+    margin at that elevation would be exactly zero, and
+    <max_allowable_eirp_dbw> is the smallest of them.  <violations>
+    lists the (start, end) elevation ranges over which the mask is
+    exceeded.
+    """
+
+    def __init__(self, elevations_deg, pfd, limit, eirp_dbw, bw):
+        self.elevations_deg = elevations_deg
+        self.pfd = pfd
+        self.limit = limit
+        self.bw = bw
+        self.eirp_dbw = eirp_dbw
+        self.margin_db = limit - pfd
+
+        worst = int(np.argmin(self.margin_db))
+        self.worst_margin_db = float(self.margin_db[worst])
+        self.worst_elevation_deg = float(elevations_deg[worst])
+        self.max_eirp_dbw = eirp_dbw + self.margin_db
+        self.max_allowable_eirp_dbw = float(np.min(self.max_eirp_dbw))
+        self.violations = _violations(elevations_deg, self.margin_db)
+
+    @property
+    def compliant(self):
+        return self.worst_margin_db >= 0
+
+
+def pfd_compliance(model,
+                   limits=None,
+                   bw=4e3,
+                   elevations_deg=None,
+                   expected=False):
+    """Checks the PFD of a model against a PFD vs elevation mask.
+
+    model -- DAGModel of a space-to-Earth link
+    limits -- list of (elevation_deg, pfd_dbw_per_m2) points, defaults
+              to the model's gs_pfd_limits
+    bw -- bandwidth of the mask, in Hz
+    elevations_deg -- elevations to evaluate, defaults to every tenth
+                      of a degree from 0 to 90
+    expected -- check the expected PFD (pattern gain, occupied
+                bandwidth) rather than the canonical one
+
+    The mask's own breakpoints are always added to the grid, so the
+    check is exact at its corners.  Returns a PFDCompliance.
+    """
+    if limits is None:
+        limits = model.gs_pfd_limits
+    if not limits:
+        raise ValueError("No PFD limits given and the model has none")
+    limits = sorted(limits)
+    lx = np.array([p[0] for p in limits], dtype=float)
+    ly = np.array([p[1] for p in limits], dtype=float)
+
+    if elevations_deg is None:
+        elevations_deg = np.linspace(0.0, 90.0, 901)
+    elevations_deg = np.asarray(elevations_deg, dtype=float)
+    inside = lx[(lx >= elevations_deg.min()) & (lx <= elevations_deg.max())]
+    elevations_deg = np.unique(np.concatenate([elevations_deg, inside]))
+
+    if expected:
+        pfd = expected_pfd_vs_el(model, elevations_deg, bw)
+        (eirp,) = _eval_vs_el(model, elevations_deg, ['tx_eirp_dbw'])
+    else:
+        pfd = canonical_pfd_vs_el(model, elevations_deg, bw)
+        eirp = np.full(len(elevations_deg), model.peak_tx_eirp_dbw)
+
+    limit = np.interp(elevations_deg, lx, ly)
+    return PFDCompliance(elevations_deg, np.asarray(pfd, dtype=float),
+                         limit, np.asarray(eirp, dtype=float), bw)
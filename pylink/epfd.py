@@ -0,0 +1,247 @@
+#!/usr/bin/python
+
+"""Aggregate equivalent power flux density (EPFD) from many transmitters.
+
+EPFD is the PFD that would be required at the victim's peak-gain
+angle to produce the same received power as the sum of all of the
+transmitters (see ITU-R Article 22 and 47 CFR 25.208):
+
+  epfd = sum_i(eirp_i * g_tx_i / (4 pi d_i^2) * g_rx(theta_i) / g_rx_max)
+
+epfd() evaluates that for every victim at every time step, for a
+whole constellation at once, as numpy arrays over
+time x transmitter x victim.  Time steps are processed in chunks so
+that arbitrarily long runs only ever hold the (time x victim) result:
+
+  r = pylink.epfd(sat_positions_km,         # (time, sats, 3)
+                  victim_positions_km,      # (victims, 3)
+                  victim_boresights,        # (victims, 3)
+                  eirp_dbw=-30,             # in the reference bandwidth
+                  victim_pattern=gso_pattern)
+  r.percentiles([50, 99, 99.9])
+  r.complies([(-182.0, 99.9), (-170.0, 100)])
+
+Positions are Earth-centered cartesian coordinates in km.
+"""
+
+import numpy as np
+
+from pylink import utils
+
+
+# Upper bound on the number of (time x transmitter x victim) elements
+# evaluated at once, ~64MB per intermediate array of doubles
+_MAX_CHUNK_ELEMENTS = 1 << 23
+
+
+def _unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def _pattern_gain(pattern, theta_deg):
+    """Gain of a pattern at off-axis angles.
+
+    pattern -- callable of off-axis angle in degrees, or an array of
+               gains at evenly spaced angles from 0 to 360 degrees
+               (eg the 360-point pattern of an Antenna)
+    """
+    if callable(pattern):
+        return pattern(theta_deg)
+    pattern = np.asarray(pattern, dtype=float)
+    angles = np.arange(len(pattern)) * (360.0 / len(pattern))
+    return np.interp(theta_deg, angles, pattern, period=360)
+
+
+def _pattern_peak(pattern):
+    if callable(pattern):
+        return float(np.max(pattern(np.linspace(0, 180, 1801))))
+    return float(np.max(pattern))
+
+
+def _time_chunks(tx_positions, chunk_size):
+    if isinstance(tx_positions, np.ndarray):
+        if 2 == tx_positions.ndim:
+            tx_positions = tx_positions[np.newaxis]
+        for start in range(0, len(tx_positions), chunk_size):
+            yield tx_positions[start:start+chunk_size]
+    else:
+        # Any iterable of per-step (or per-chunk) position arrays
+        for positions in tx_positions:
+            positions = np.asarray(positions, dtype=float)
+            if 2 == positions.ndim:
+                positions = positions[np.newaxis]
+            for start in range(0, len(positions), chunk_size):
+                yield positions[start:start+chunk_size]
+
+
+def _chunk_epfd(tx, victims, up, boresights, eirp_dbw, victim_pattern,
+                victim_peak_dbi, tx_pattern, tx_peak_db, min_elevation_deg):
+    # tx is (t, s, 3), victims/up/boresights are (v, 3), and
+    # everything below is (t, s, v) until summed over transmitters.
+    los = victims[np.newaxis, np.newaxis, :, :] - tx[:, :, np.newaxis, :]
+    d_km = np.linalg.norm(los, axis=-1)
+    los = los / d_km[..., np.newaxis]
+
+    # los points from the transmitter to the victim, so the victim
+    # looks back along -los
+    sin_el = -np.einsum('tsvk,vk->tsv', los, up)
+    visible = sin_el >= np.sin(np.radians(min_elevation_deg))
+
+    cos_rx = np.clip(-np.einsum('tsvk,vk->tsv', los, boresights), -1, 1)
+    g_rx = (_pattern_gain(victim_pattern, np.degrees(np.arccos(cos_rx)))
+            - victim_peak_dbi)
+
+    pfd = eirp_dbw - utils.spreading_loss_db(d_km) + g_rx
+    if tx_pattern is not None:
+        # Transmitters point at the center of the Earth
+        nadir = _unit(-tx)
+        cos_tx = np.clip(np.einsum('tsvk,tsk->tsv', los, nadir), -1, 1)
+        pfd = pfd + (_pattern_gain(tx_pattern, np.degrees(np.arccos(cos_tx)))
+                     - tx_peak_db)
+
+    linear = np.where(visible, utils.from_db(pfd), 0.0)
+    with np.errstate(divide='ignore'):
+        return utils.to_db(np.sum(linear, axis=1))
+
+
+class EPFDResult(object):
+    """EPFD of every victim at every time step.
+
+    <epfd_dbw_per_m2> is a (time, victim) array, in dBW/m^2 in the
+    reference bandwidth the EIRP was given in.  Time steps without
+    any visible transmitter are -inf.  Statistics are per victim,
+    optionally weighting each time step by <weights>.
+    """
+
+    def __init__(self, epfd_dbw_per_m2, weights=None):
+        self.epfd_dbw_per_m2 = epfd_dbw_per_m2
+        self.weights = weights
+
+    def worst(self):
+        """Returns the maximum EPFD of each victim.
+        """
+        return np.max(self.epfd_dbw_per_m2, axis=0)
+
+    def _quantiles(self, q):
+        values = self.epfd_dbw_per_m2
+        q = np.asarray(q, dtype=float) / 100.0
+        if self.weights is None:
+            return np.quantile(values, q, axis=0, method='inverted_cdf')
+        order = np.argsort(values, axis=0)
+        ranked = np.take_along_axis(values, order, axis=0)
+        cdf = np.cumsum(np.asarray(self.weights, dtype=float)[order], axis=0)
+        cdf /= cdf[-1]
+        retval = np.empty((len(q), values.shape[1]))
+        for v in range(values.shape[1]):
+            idx = np.searchsorted(cdf[:, v], q, side='left')
+            retval[:, v] = ranked[np.minimum(idx, len(ranked)-1), v]
+        return retval
+
+    def percentiles(self, q=(50, 99, 99.9, 100)):
+        """Returns a dict of percentile => array of EPFD per victim.
+
+        The p'th percentile is the level the EPFD doesn't exceed for
+        p percent of the time.
+        """
+        values = self._quantiles(q)
+        return dict(zip(q, values))
+
+    def exceedance(self, level):
+        """Returns the fraction of time each victim's EPFD is above level.
+        """
+        above = self.epfd_dbw_per_m2 > level
+        if self.weights is None:
+            return np.mean(above, axis=0)
+        w = np.asarray(self.weights, dtype=float)
+        return np.dot(w, above) / np.sum(w)
+
+    def mask_margins(self, mask):
+        """Returns the margin against each point of a limit mask.
+
+        mask -- list of (epfd_dbw_per_m2, percent) pairs, each meaning
+                the EPFD must not exceed that level for at least that
+                percent of the time
+
+        Returns a (points, victims) array of level minus the victim's
+        EPFD at that percentile, so negative margins are violations.
+        """
+        levels = np.array([level for level, pct in mask], dtype=float)
+        values = self._quantiles([pct for level, pct in mask])
+        return levels[:, np.newaxis] - values
+
+    def complies(self, mask):
+        """Returns True if every victim meets every point of the mask.
+        """
+        return bool(np.all(self.mask_margins(mask) >= 0))
+
+
+def epfd(tx_positions_km,
+         victim_positions_km,
+         victim_boresights,
+         eirp_dbw,
+         victim_pattern,
+         tx_pattern=None,
+         min_elevation_deg=0.0,
+         weights=None,
+         chunk_size=None):
+    """Computes the aggregate EPFD of many transmitters at many victims.
+
+    tx_positions_km -- (time, transmitters, 3) array of transmitter
+                       positions, or an iterable of (transmitters, 3)
+                       or (time, transmitters, 3) arrays to stream
+                       through
+    victim_positions_km -- (victims, 3) array of receiver positions
+    victim_boresights -- (victims, 3) array of the directions the
+                         victim antennas point in
+    eirp_dbw -- peak EIRP of each transmitter in the reference
+                bandwidth, a scalar or one per transmitter
+    victim_pattern -- victim antenna gain (dBi) vs off-axis angle, as
+                      an Antenna-style 360-point pattern or a callable
+                      of the angle in degrees
+    tx_pattern -- optional transmit gain vs angle off of nadir, in the
+                  same forms, relative to its own peak
+    min_elevation_deg -- transmitters below this elevation at a victim
+                         don't contribute to it
+    weights -- optional fraction of time each step represents
+    chunk_size -- time steps evaluated at once, defaults to as many as
+                  fit in a bounded amount of memory
+
+    Returns an EPFDResult.
+    """
+    victims = np.atleast_2d(np.asarray(victim_positions_km, dtype=float))
+    boresights = _unit(np.atleast_2d(np.asarray(victim_boresights,
+                                                dtype=float)))
+    if victims.shape != boresights.shape:
+        raise ValueError("Need one boresight per victim")
+    up = _unit(victims)
+
+    eirp_dbw = np.asarray(eirp_dbw, dtype=float)
+    if eirp_dbw.ndim:
+        # one per transmitter, broadcast across (time, tx, victim)
+        eirp_dbw = eirp_dbw[:, np.newaxis]
+
+    victim_peak = _pattern_peak(victim_pattern)
+    tx_peak = _pattern_peak(tx_pattern) if tx_pattern is not None else 0
+
+    if chunk_size is None:
+        if isinstance(tx_positions_km, np.ndarray):
+            n_tx = tx_positions_km.shape[-2]
+        else:
+            n_tx = None
+        if n_tx:
+            chunk_size = max(1, _MAX_CHUNK_ELEMENTS // (n_tx * len(victims)))
+        else:
+            chunk_size = 1024
+
+    results = []
+    for tx in _time_chunks(tx_positions_km, chunk_size):
+        results.append(_chunk_epfd(np.asarray(tx, dtype=float),
+                                   victims, up, boresights, eirp_dbw,
+                                   victim_pattern, victim_peak,
+                                   tx_pattern, tx_peak, min_elevation_deg))
+
+    values = (np.concatenate(results, axis=0) if results
+              else np.empty((0, len(victims))))
+    if weights is not None and len(weights) != len(values):
+        raise ValueError("Need one weight per time step")
+    return EPFDResult(values, weights)
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+
+"""Evaluation of frequency-dependent outputs across a grid of carriers.
+
+Rather than overriding center_freq_hz once per candidate frequency,
+the whole grid is pushed through the model as a single numpy array.
+Wavelength, propagation loss, antenna effective area and (for
+antennas given a gain_table) antenna gains all come out with one
+value per frequency:
+
+  m = pylink.DAGModel([...,
+                       pylink.Channel(frequency_grid_mhz=[400, 401, 402]),
+                       ...])
+  sweep = pylink.frequency_sweep(m, ['unity_gain_propagation_loss_db',
+                                     'link_margin_db'])
+  sweep['link_margin_db']               # => array of 3 margins
+"""
+
+import numpy as np
+
+from pylink.uncertainty import DEFAULT_FIXED
+from pylink.uncertainty import _vectorized_eval
+
+
+def frequency_sweep(model, outputs, freqs_hz=None, fixed=None):
+    """Evaluates outputs at every frequency of a grid at once.
+
+    model -- DAGModel
+    outputs -- list of node names
+    freqs_hz -- center frequencies, defaults to the Channel's
+                frequency_grid_hz
+    fixed -- node names held at their current value, defaults to
+             DEFAULT_FIXED (ie the modulation code, which is chosen
+             once at the model's own center frequency)
+
+    Returns a dict of output name => array with one entry (or row,
+    for per-angle outputs like antenna patterns) per frequency.  The
+    model itself is left untouched.
+    """
+    if freqs_hz is None:
+        freqs_hz = model.frequency_grid_hz
+    if freqs_hz is None:
+        raise ValueError("No frequencies given and the model has no "
+                         + "frequency_grid_hz")
+    freqs_hz = np.asarray(freqs_hz, dtype=float).reshape(-1)
+
+    if fixed is None:
+        fixed = DEFAULT_FIXED
+    fixed = [model.node_num(name) for name in fixed if name in model._nodes]
+
+    nodes = [model.node_num(name) for name in outputs]
+    values = _vectorized_eval(model, {model.enum.center_freq_hz: freqs_hz},
+                              nodes, fixed)
+    return dict((name, values[node]) for name, node in zip(outputs, nodes))
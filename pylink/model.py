@@ -1,5 +1,8 @@
 #!/usr/bin/python
 
+import collections
+import collections.abc
+import contextlib
 import inspect
 import math
 import os
@@ -7,7 +10,11 @@ import pprint
 import re
 import sys
 import tempfile
+import threading
 import traceback
+import weakref
+
+import numpy as np
 
 import pylink.utils as utils
 
@@ -18,6 +25,278 @@ class LoopException(Exception):
     pass
 
 
+class _Deferred(BaseException):
+    """Unwinds an evaluation that got too deep, see DAGModel._evaluate.
+
+    It isn't an Exception so that calculators catching those don't
+    swallow it.
+    """
+
+    def __init__(self, node):
+        BaseException.__init__(self, node)
+        self.node = node
+
+
+# Marks a calculated node reverted within a scope, even though the
+# shared model has it overridden.
+_REVERTED = object()
+
+
+# Arrays bigger than this aren't worth hashing for the memo
+_MEMO_MAX_ARRAY = 4096
+
+# Calculations nested deeper than this are deferred rather than
+# recursed into, see DAGModel._evaluate
+_MAX_DEPTH = 64
+
+# The bits set in each possible byte, for decoding bitsets
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+# Structures a model may share with its schema or copies, see _own
+_SHAREABLE = ('_calc', '_meta', '_dists', '_deps',)
+
+
+class _Identity(object):
+    """Memo key part for unhashable values, compared by identity.
+
+    It keeps a reference to the value so its id can't be reused.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return id(self.value)
+
+    def __eq__(self, other):
+        return (isinstance(other, _Identity)
+                and self.value is other.value)
+
+
+def _bit_nodes(bits):
+    # The node numbers set in a bitset, in ascending order
+    retval = []
+    base = 0
+    for byte in bits.to_bytes((bits.bit_length() + 7) // 8, 'little'):
+        if byte:
+            for i in _BYTE_BITS[byte]:
+                retval.append(base + i)
+        base += 8
+    return retval
+
+
+def _closure(edges):
+    # Returns node => bitset of every node reachable from it along
+    # <edges> (node => iterable of nodes), for each node in <edges>.
+    # Nodes are handled after everything they lead to, so each
+    # bitset is just the union of its neighbours' and a pass is
+    # linear in the number of edges.
+    sources = {}
+    waiting = {}
+    for node, targets in edges.items():
+        waiting[node] = 0
+        for target in targets:
+            if target in edges:
+                waiting[node] += 1
+                sources.setdefault(target, []).append(node)
+
+    retval = {}
+    ready = [node for node, n in waiting.items() if not n]
+    while ready:
+        node = ready.pop()
+        bits = 0
+        for target in edges[node]:
+            bits |= (1 << target) | retval.get(target, 0)
+        retval[node] = bits
+        for source in sources.get(node, ()):
+            waiting[source] -= 1
+            if not waiting[source]:
+                ready.append(source)
+
+    # Whatever is left is on (or leads to) a cycle, which only
+    # declared dependencies can introduce.  Iterate to a fixed point.
+    stuck = [node for node in edges if node not in retval]
+    changed = bool(stuck)
+    while changed:
+        changed = False
+        for node in stuck:
+            bits = orig = retval.get(node, 0)
+            for target in edges[node]:
+                bits |= (1 << target) | retval.get(target, 0)
+            if bits != orig:
+                retval[node] = bits
+                changed = True
+    return retval
+
+
+class _Bitsets(collections.abc.Mapping):
+    """Read-only node => list of nodes view of a dict of bitsets.
+
+    Bit n of a bitset stands for node n, so a transitive dependency
+    map costs a few machine words per node rather than a list of
+    every dependency.  <bits> is the underlying dict, for callers
+    that can work with the bitsets directly.  Lists are remembered
+    once decoded, as the same few nodes tend to be asked about over
+    and over (eg those being overridden), so don't modify them.
+    """
+
+    def __init__(self, bits):
+        self.bits = bits
+        self._lists = {}
+
+    def __getitem__(self, node):
+        try:
+            return self._lists[node]
+        except KeyError:
+            retval = self._lists[node] = _bit_nodes(self.bits[node])
+            return retval
+
+    def __iter__(self):
+        return iter(self.bits)
+
+    def __len__(self):
+        return len(self.bits)
+
+
+class _ThreadState(object):
+    """A model's per-thread calculation stack and scope chain.
+
+    This is a plain object, fetched once per call from a _ThreadLocal,
+    as every attribute lookup on a threading.local has to find the
+    calling thread's copy first.
+    """
+
+    __slots__ = ('stack', 'scope', 'base', 'evaluating', 'clears',)
+
+    def __init__(self):
+        # Never more than _MAX_DEPTH deep (per scope), so it's cheap
+        # to search for loops
+        self.stack = []
+        self.scope = None
+        # The stack depth at which the innermost scope was opened,
+        # below which nothing may be deferred
+        self.base = 0
+        # Whether this thread counts towards DAGModel._n_evaluating
+        self.evaluating = False
+        # Cache invalidations made by this thread
+        self.clears = 0
+
+
+class _ThreadLocal(threading.local):
+    """Holds each thread's _ThreadState for a model.
+    """
+
+    def __init__(self):
+        self.state = _ThreadState()
+
+
+class _Scope(object):
+    """Overrides and cached values local to one DAGModel.scoped block.
+
+    Scopes nest, and each one only records what differs from its
+    parent: <values> holds the overrides, <cache> the values computed
+    within the scope, and <dirty> the nodes whose parent value can't
+    be trusted because one of their inputs was overridden here.
+    """
+
+    def __init__(self, parent, edges):
+        self.parent = parent
+        self.values = {}
+        self.cache = {}
+        self.dirty = set()
+
+        # Number of dependency edges known when the scope was opened,
+        # if more turn up the dirty set may be incomplete.
+        self.edges = edges
+
+    def invalidate(self, nodes):
+        self.dirty.update(nodes)
+        cache = self.cache
+        if cache:
+            for node in nodes:
+                cache.pop(node, None)
+
+
+def _same_value(a, b):
+    # Whether overriding a with b would change anything at all,
+    # including the type (1 and 1.0 compute different things)
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray) and a.dtype != b.dtype:
+        return False
+    return not utils._differs(a, b)
+
+
+class _ForkValues(collections.ChainMap):
+    """Values of a DAGModel.fork(), layered over those of its parent.
+
+    Writes only go to the fork's own map.  Deleting a value the parent
+    has leaves a _REVERTED marker behind to hide it.
+    """
+
+    def __getitem__(self, key):
+        value = collections.ChainMap.__getitem__(self, key)
+        if value is _REVERTED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __delitem__(self, key):
+        if any(key in m for m in self.maps[1:]):
+            self.maps[0][key] = _REVERTED
+        else:
+            del self.maps[0][key]
+
+    def __iter__(self):
+        return (k for k in collections.ChainMap.__iter__(self) if k in self)
+
+    def __len__(self):
+        return sum(1 for k in self)
+
+
+class _ForkCache(dict):
+    """Cache of a DAGModel.fork().
+
+    Holds only what the fork computed itself, and falls back to the
+    parent's cache for nodes that don't depend on anything the fork
+    changed.  The parent clears the fork's entries whenever it clears
+    its own, see DAGModel._cache_clear.
+    """
+
+    def __init__(self, model):
+        dict.__init__(self)
+        self.model = model
+        self.imported = set()
+
+    def __missing__(self, node):
+        model = self.model
+        parent = model._parent
+        changed = model._values.maps[0]
+
+        with parent._lock:
+            if parent._deps_are_stale:
+                parent._map_dependencies()
+            upstream = parent._flat_deps.bits.get(node, 0)
+
+        if node in changed or any(upstream >> dep & 1 for dep in changed):
+            raise KeyError(node)
+        value = parent._cache[node]
+
+        # The fork needs to know what the value depends upon to be
+        # able to invalidate its own clients of it later on.
+        if node not in self.imported:
+            for dep in _bit_nodes(upstream):
+                model._add_dependency_impl(dep, node)
+            self.imported.add(node)
+        return value
+
+
 class DAGModel(object):
     """DAG Solver
 
@@ -60,32 +339,338 @@ class DAGModel(object):
         (self._names, self._nodes,) = utils.node_associations(self.enum)
 
         # merge the contributions
+        self._shared = set()
         self._calc = {}
         self._values = {}
         self._meta = {}
+        self._dists = {}
         tributes = [m.tribute for m in contrib]
         tributes.append(extras)
         for t in tributes:
             self.accept_tribute(t)
 
         # Record the calculation stack for dependency tracking
+        self._init_threading()
         self._stack = []
 
+        self._parent = None
+        self._forks = weakref.WeakSet()
+        self._memo = None
         self._init_cache()
 
-        # We start with an empty dependency tree and update as able
+        # We start with whatever dependencies the tributaries declare
+        # and update as we observe calculations.  A declaration only
+        # counts if its tributary is the one that supplied the node.
         self._deps = {}
-        self._map_dependencies()
+        owner = {}
+        for t in contrib:
+            for name in t.tribute:
+                owner[name] = t
+        for name in extras:
+            owner[name] = None
+        for t in contrib:
+            declared = getattr(t, 'dependencies', None) or {}
+            self.declare_dependencies(dict(
+                (k, v) for k, v in declared.items() if owner.get(k) is t))
+        self._unmap_dependencies()
+
+    def _export_state(self, include_cache=False):
+        """Returns a plain dict describing this model.
+
+        include_cache -- also include the currently cached values
+
+        The calculators are included as-is, so they need to be
+        module-level functions or methods of picklable objects if the
+        state is going to be serialized.
+        """
+        retval = {
+            'nodes': dict(self._nodes),
+            'calc': dict(self._calc),
+            'values': dict(self._values),
+            'meta': dict((k, dict(v)) for k, v in self._meta.items()),
+            'deps': dict((k, dict(v)) for k, v in self._deps.items()),
+            'dists': dict(self._dists),
+            }
+        if include_cache:
+            retval['cache'] = dict(self._cache)
+        return retval
+
+    @classmethod
+    def _from_state(cls, state):
+        """Creates a new model from the output of _export_state.
+        """
+        self = cls.__new__(cls)
+        self.__setstate__(state)
+        return self
+
+    def __getstate__(self):
+        # The lock and thread-local state can't be pickled, and the
+        # calculators only can be if they're module-level functions
+        # or methods of picklable tributaries.
+        state = self._export_state(include_cache=True)
+        if self._memo is not None:
+            state['memo_maxsize'] = self._memo_maxsize
+        return state
+
+    def __setstate__(self, state):
+        self.enum = utils.sequential_enum(**state['nodes'])
+        (self._names, self._nodes,) = utils.node_associations(self.enum)
+
+        self._shared = set()
+        self._calc = dict(state['calc'])
+        self._values = dict(state['values'])
+        self._meta = dict(state['meta'])
+        self._dists = dict(state.get('dists', {}))
+
+        self._init_threading()
+        self._stack = []
+
+        self._parent = None
+        self._forks = weakref.WeakSet()
+        self._memo = None
+        self._init_cache()
+        self._cache.update(state.get('cache', {}))
+
+        self._deps = dict((k, dict(v)) for k, v in state['deps'].items())
+        self._unmap_dependencies()
+
+        if state.get('memo_maxsize') is not None:
+            self.enable_memo(state['memo_maxsize'])
+
+    @classmethod
+    def from_schema(cls, schema, **values):
+        """Creates a new model from a ModelSchema.
+
+        schema -- ModelSchema describing the nodes
+        values -- any static node values to change for this model
+
+        The node structure, calculators, metadata and dependency graph
+        are shared with the schema (and copied only if this model
+        changes them), so only the values and caches belong to the
+        new model.  That makes this much cheaper than __init__ when
+        many models share the same tributaries.
+        """
+        self = cls._sharing(schema)
+        if values:
+            self.accept_tribute(values)
+        return self
+
+    @classmethod
+    def _sharing(cls, source, values=None):
+        # A new model sharing everything but the values (which are
+        # copied) and the cache (which starts out empty) with source,
+        # a ModelSchema or another DAGModel.
+        self = cls.__new__(cls)
+
+        self.enum = source.enum
+        self._names = source._names
+        self._nodes = source._nodes
+
+        # Copied on first write, see _own
+        self._shared = set(_SHAREABLE)
+        self._calc = source._calc
+        self._meta = source._meta
+        self._dists = source._dists
+        self._deps = source._deps
+        if values is None:
+            values = dict(source._values)
+        self._values = values
+
+        self._init_threading()
+        self._stack = []
+
+        self._parent = None
+        self._forks = weakref.WeakSet()
+        self._memo = None
+        self._init_cache()
+
+        # The maps are only ever replaced, never modified, so they
+        # can be shared as well.
+        self._flat_deps = source._flat_deps
+        self._clients = source._clients
+        self._deps_are_stale = False
+
+        return self
+
+    def copy(self):
+        """Returns an independent copy of this model.
+
+        The calculators, metadata, static values (numpy arrays and
+        all) and dependency graph are shared rather than copied, and
+        whichever model changes one of them first makes its own copy
+        at that point.  Only the override/static value table and the
+        cache are copied up front, so this is cheap enough to do per
+        request.  Changes to either model afterwards don't affect the
+        other.
+        """
+        with self._lock:
+            if self._deps_are_stale:
+                self._map_dependencies()
+            # Both models now share the structures, so both have to
+            # copy them before writing
+            self._shared.update(_SHAREABLE)
+            other = self._sharing(self)
+            other._cache = dict(self._cache)
+            if self._memo is not None:
+                other.enable_memo(self._memo_maxsize)
+                other._memo.update(self._memo)
+        return other
+
+    def __copy__(self):
+        return self.copy()
+
+    def fork(self):
+        """Returns a lightweight child model layered over this one.
+
+        The fork sees this model's values, overrides and cached
+        values live, while its own overrides, reverts and anything
+        computed from them stay in the fork.  Nodes that don't depend
+        on anything the fork changed are served from this model's
+        cache rather than recomputed, so trying alternatives in forks
+        neither disturbs nor duplicates the baseline:
+
+          alt = model.fork()
+          alt.override(e.rx_antenna_gain, 12)
+          alt.link_margin_db - model.link_margin_db
+
+        Changes made to this model afterwards show through to its
+        forks.  Forks may be forked in turn, and are dropped once
+        nothing else references them.
+        """
+        with self._lock:
+            if self._deps_are_stale:
+                self._map_dependencies()
+            # The fork's graph starts out as ours, and either copies
+            # it before writing
+            self._shared.update(_SHAREABLE)
+            child = self._sharing(self, _ForkValues({}, self._values))
+            child._parent = self
+            child._init_cache()
+            self._forks.add(child)
+        return child
+
+    def _own(self, name):
+        # Makes a private copy of a structure shared with a schema
+        # before it is modified.
+        if name in self._shared:
+            self._shared.discard(name)
+            value = getattr(self, name)
+            if name in ('_meta', '_deps'):
+                value = dict((k, dict(v)) for k, v in value.items())
+            else:
+                value = dict(value)
+            setattr(self, name, value)
+
+    def _init_threading(self):
+        # Each thread gets its own calculation stack and scope chain,
+        # while the lock serializes changes to the shared cache and
+        # dependency graph.
+        self._tls = _ThreadLocal()
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._n_edges = 0
+        # Scopes open across all threads.  While there are none, the
+        # thread-local scope chain needn't be looked at.
+        self._n_scopes = 0
+        # Likewise, calculations in progress across all threads.  While
+        # there are none, a cache hit has no dependency edge to record.
+        self._n_evaluating = 0
+
+    @property
+    def _stack(self):
+        return self._tls.state.stack
+
+    @_stack.setter
+    def _stack(self, stack):
+        self._tls.state.stack = stack
+
+    @property
+    def _scope(self):
+        return self._tls.state.scope
+
+    @_scope.setter
+    def _scope(self, scope):
+        self._tls.state.scope = scope
+
+    @contextlib.contextmanager
+    def scoped(self, overrides=None):
+        """Context manager confining overrides to the current thread.
+
+        overrides -- optional dict of node number => value to apply
+                     within the scope
+
+        Within the block, override() and revert() only affect the
+        calling thread, and nothing computed from them is published
+        to the shared cache.  Everything else is still served from
+        (and contributes to) the shared cache, so other threads keep
+        reading the unmodified model concurrently.  The overrides are
+        dropped when the block exits, and scopes may be nested.
+
+        with model.scoped({e.min_elevation_deg: 10}):
+            margin = model.link_margin_db
+        """
+        scope = _Scope(self._scope, self._n_edges)
+        with self._lock:
+            self._n_scopes += 1
+        local = self._tls.state
+        base = local.base
+        local.scope = scope
+        local.base = len(local.stack)
+        try:
+            if overrides:
+                self.override_many(overrides)
+            yield self
+        finally:
+            local.scope = scope.parent
+            local.base = base
+            with self._lock:
+                self._n_scopes -= 1
+
+    def _lookup_value(self, node):
+        # Returns (found, value) for the override or static value of a
+        # node, honoring any scopes in effect for this thread.
+        scope = self._tls.state.scope if self._n_scopes else None
+        while scope is not None:
+            if node in scope.values:
+                value = scope.values[node]
+                if value is _REVERTED:
+                    return (False, None)
+                return (True, value)
+            scope = scope.parent
+        try:
+            return (True, self._values[node])
+        except KeyError:
+            return (False, None)
+
+    def _invalidation_set(self, node):
+        with self._lock:
+            if self._deps_are_stale:
+                self._map_dependencies()
+            return [node] + self._clients[node]
 
     def accept_tribute(self, t):
+        # Imported here so that the core model doesn't depend on the
+        # uncertainty module
+        from pylink.uncertainty import Distribution
+
         for name, v, in t.items():
             node = self._nodes[name]
             if hasattr(v, '__call__'):
+                self._own('_calc')
                 self._calc[node] = v
-            elif isinstance(v, TaggedAttribute):
-                self._meta[node] = v.meta
-                self._values[node] = v.value
             else:
+                if isinstance(v, TaggedAttribute):
+                    self._own('_meta')
+                    self._meta[node] = v.meta
+                    v = v.value
+                if node in self._dists or isinstance(v, Distribution):
+                    self._own('_dists')
+                    self._dists.pop(node, None)
+                if isinstance(v, Distribution):
+                    # The model is evaluated at the nominal value, see
+                    # uncertainty.monte_carlo for the rest
+                    self._dists[node] = v
+                    v = v.nominal
                 self._values[node] = v
 
     def clear_cache(self):
@@ -109,7 +694,12 @@ class DAGModel(object):
     def is_overridden(self, node):
         """Determines whether or not the given node is overridden.
         """
-        return self.is_calculated_node(node) and node in self._values
+        return self.is_calculated_node(node) and self._lookup_value(node)[0]
+
+    def get_distribution(self, node):
+        """Returns the Distribution a static node was given, or None.
+        """
+        return self._dists.get(node)
 
     def get_meta(self, node):
         """Returns the metadata dict associated with this node
@@ -121,31 +711,157 @@ class DAGModel(object):
     def set_meta(self, node, k, v):
         """Sets the desired key/value in this node's metadata dict
         """
+        self._own('_meta')
         self._meta.setdefault(node, {k:v})
         self._meta[node][k] = v
 
     def _map_dependencies(self):
-        # nodes => list of direct dependencies
-        # self._deps is maintained by the cache system
-        self._dep_names = self._named_deplist(self._deps)
+        with self._lock:
+            # self._deps (nodes => direct dependencies) is maintained
+            # by the cache system
 
-        # nodes => flattened dependency list
-        self._flat_deps = self._flattened_deps()
-        self._flat_dep_names = self._named_deplist(self._flat_deps)
+            # nodes => flattened dependencies
+            self._flat_deps = self._flattened_deps()
 
-        # nodes => flattened list of nodes depending upon it
-        self._clients = self._client_list(self._flat_deps)
-        self._client_names = self._named_deplist(self._clients)
+            # nodes => flattened nodes depending upon it
+            self._clients = self._client_list(self._deps)
 
-        self._deps_are_stale = False
+            self._deps_are_stale = False
+
+    def _unmap_dependencies(self):
+        # Mapping the graph costs more than building the rest of the
+        # model, so it waits until something needs it (usually the
+        # first invalidation).
+        self._flat_deps = _Bitsets({})
+        self._clients = _Bitsets({})
+        self._deps_are_stale = True
+
+    # The name-keyed maps are only needed for printing, so they're
+    # made on demand.
+
+    @property
+    def _dep_names(self):
+        return self._named_deplist(self._deps)
+
+    @property
+    def _flat_dep_names(self):
+        return self._named_deplist(self._flat_deps)
+
+    @property
+    def _client_names(self):
+        return self._named_deplist(self._clients)
 
     def _init_cache(self):
-        self._cache = {}
+        if self._parent is None:
+            self._cache = {}
+        else:
+            self._cache = _ForkCache(self)
+        if self._memo is not None:
+            self._memo.clear()
+
+    def enable_memo(self, maxsize=4096):
+        """Remembers calculated values by the values of their inputs.
+
+        maxsize -- maximum number of remembered values (LRU)
+
+        The regular cache forgets a value as soon as one of its inputs
+        is overridden.  With the memo enabled, a value is also filed
+        under the values of every static (or overridden) node it
+        depends upon, so going back to a previously evaluated set of
+        inputs is a lookup rather than a recalculation.  Values are
+        only filed once their dependencies are fully known.
+        Unhashable inputs are compared by identity, so don't modify
+        those in place.
+        """
+        with self._lock:
+            self._memo = collections.OrderedDict()
+            self._memo_maxsize = maxsize
+            self._memo_hits = 0
+            self._memo_misses = 0
+            self._memo_evictions = 0
+
+    def disable_memo(self):
+        """Turns the memo off and forgets its contents.
+        """
+        self._memo = None
+
+    def memo_stats(self):
+        """Returns a dict of memo hits, misses, evictions and size.
+
+        Returns None if the memo isn't enabled.
+        """
+        if self._memo is None:
+            return None
+        return {'hits': self._memo_hits,
+                'misses': self._memo_misses,
+                'evictions': self._memo_evictions,
+                'size': len(self._memo),
+                'maxsize': self._memo_maxsize}
+
+    def _memo_key(self, node):
+        # The node plus the current value of everything upstream of it
+        # that isn't calculated.  Returns None if it can't be keyed.
+        with self._lock:
+            if self._deps_are_stale:
+                self._map_dependencies()
+            upstream = self._flat_deps.get(node, ())
+            key = [node]
+            for dep in upstream:
+                (found, value,) = self._lookup_value(dep)
+                if not found:
+                    continue
+                if isinstance(value, np.ndarray):
+                    if value.size > _MEMO_MAX_ARRAY:
+                        return None
+                    value = (value.dtype.str, value.shape, value.tobytes())
+                else:
+                    try:
+                        hash(value)
+                    except TypeError:
+                        value = _Identity(value)
+                key.append((dep, value))
+            return tuple(key)
+
+    def _memo_get(self, key):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self._memo_hits += 1
+                return (True, self._memo[key])
+            self._memo_misses += 1
+            return (False, None)
+
+    def _memo_calculate(self, node):
+        key = self._memo_key(node)
+        if key is None:
+            return self._calc[node](self)
+
+        (hit, retval,) = self._memo_get(key)
+        if not hit:
+            n_edges = self._n_edges
+            retval = self._calc[node](self)
+            # Newly found dependencies mean the key was incomplete
+            if n_edges == self._n_edges:
+                self._memo_put(key, retval)
+        return retval
+
+    def _memo_put(self, key, value):
+        with self._lock:
+            self._memo[key] = value
+            self._memo.move_to_end(key)
+            while len(self._memo) > self._memo_maxsize:
+                self._memo.popitem(last=False)
+                self._memo_evictions += 1
 
     def _record_parent(self, node):
-        if len(self._stack):
-            dep = self._stack[-1]
-            self._add_dependency_impl(node, dep)
+        # Edges are only written the first time they're seen, so that
+        # reading a known input is a couple of lookups and no writes.
+        stack = self._tls.state.stack
+        if stack:
+            dep = stack[-1]
+            deps = self._deps.get(dep)
+            if deps is None or node not in deps:
+                self._add_dependency_impl(node, dep)
 
     def print_dependencies(self):
         """Pretty Prints the dependency information for all nodes.
@@ -168,11 +884,109 @@ class DAGModel(object):
         pprint.pprint(self._client_names)
 
     def _add_dependency_impl(self, node, dep):
-        self._deps.setdefault(dep, {node:0})
-        self._deps[dep].setdefault(node, 0)
-        self._deps[dep][node] += 1
-        if self._deps[dep][node] == 1:
-            self._deps_are_stale = True
+        with self._lock:
+            deps = self._deps.get(dep)
+            if deps is None or node not in deps:
+                self._own('_deps')
+                deps = self._deps.setdefault(dep, {})
+                deps[node] = 1
+                self._deps_are_stale = True
+                self._n_edges += 1
+
+    def declare_dependencies(self, deps):
+        """Registers the inputs of calculated nodes up front.
+
+        deps -- dict of node name => list of input node names
+
+        Normally dependencies are only discovered as nodes are
+        calculated.  Declaring them means the whole graph (and so
+        cache invalidation, topological_order, ...) is known before
+        anything has been computed.  Observed dependencies are still
+        added on top of declared ones.  Names that aren't nodes in
+        this model are ignored, as tributaries may declare inputs
+        provided by tributaries you haven't included.
+        """
+        nodes = self._nodes
+        with self._lock:
+            self._own('_deps')
+            n_edges = self._n_edges
+            for name, inputs in deps.items():
+                if name not in nodes:
+                    continue
+                dep = nodes[name]
+                for input_name in inputs:
+                    node = nodes.get(input_name)
+                    if node is None:
+                        continue
+                    known = self._deps.get(dep)
+                    if known is None:
+                        known = self._deps[dep] = {}
+                    if node not in known:
+                        known[node] = 1
+                        self._n_edges += 1
+            if n_edges != self._n_edges:
+                self._deps_are_stale = True
+
+    def trace_dependencies(self):
+        """Discovers the dependency graph with a dry run of every calculator.
+
+        Every calculated node is evaluated once to observe its inputs,
+        after which the cache is restored to its prior state.  Nodes
+        that can't be calculated in this model (eg due to a missing
+        input) are skipped.  Useful for models built from calculators
+        that don't declare their dependencies.
+        """
+        # Memo hits would skip the very calculators we want to watch
+        (memo, self._memo,) = (self._memo, None,)
+        orig_cache = dict(self._cache)
+        self._init_cache()
+        try:
+            for node in list(self._calc.keys()):
+                try:
+                    self.cached_calculate(node)
+                except (AttributeError, LoopException):
+                    self._stack = []
+        finally:
+            # Forks keep their own kind of cache
+            self._init_cache()
+            self._cache.update(orig_cache)
+            self._memo = memo
+        self._map_dependencies()
+
+    def topological_order(self):
+        """Returns all nodes, ordered so that inputs precede their clients.
+
+        The order is based upon the declared and observed dependencies
+        known so far.  Raises a LoopException if they contain a cycle.
+        """
+        if self._deps_are_stale:
+            self._map_dependencies()
+
+        n_inputs = {}
+        clients = {}
+        for node in self._names:
+            n_inputs[node] = 0
+            clients[node] = []
+        for dep, inputs in self._deps.items():
+            for node in inputs:
+                n_inputs[dep] += 1
+                clients[node].append(dep)
+
+        ready = [node for node in sorted(self._names) if not n_inputs[node]]
+        retval = []
+        while ready:
+            node = ready.pop()
+            retval.append(node)
+            for client in clients[node]:
+                n_inputs[client] -= 1
+                if not n_inputs[client]:
+                    ready.append(client)
+
+        if len(retval) != len(self._names):
+            stuck = [self.node_name(n) for n in self._names if n_inputs[n]]
+            s = pprint.pformat(sorted(stuck))
+            raise LoopException("\n=== LOOP DETECTED ===\n%s" % s)
+        return retval
 
     def cached_calculate(self, node, clear_stack=False):
         """Either return the cached value, or calculate/lookup the node's value.
@@ -185,68 +999,263 @@ class DAGModel(object):
         you can happily introduce cycles.  See the package README for
         more information about how to do this safely.
         """
-        if clear_stack:
-            orig_stack = self._stack
-            self._stack = []
-
-        self._record_parent(node)
-        if node in self._cache:
-            retval = self._cache[node]
-        else:
-            retval = self._calculate(node)
+        if not (self._n_scopes or self._n_evaluating):
+            # Nothing is being calculated, so there's no edge to
+            # record, and no scope to look through: a hit is a plain
+            # lookup.
+            try:
+                return self._cache[node]
+            except KeyError:
+                pass
 
         if clear_stack:
-            self._stack = orig_stack
-        return retval
-
+            local = self._tls.state
+            orig = (local.stack, local.base,)
+            local.stack = []
+            local.base = 0
+            try:
+                return self.cached_calculate(node)
+            finally:
+                (local.stack, local.base,) = orig
 
-    def _calculate(self, node, stack=None):
+        local = self._tls.state
+        stack = local.stack
         if stack:
-            orig_stack = self._stack
-            self._stack = stack
-
-        if node in self._stack:
-            stack = self._stack + [node]
+            # As _record_parent, inlined for speed
+            deps = self._deps.get(stack[-1])
+            if deps is None or node not in deps:
+                self._add_dependency_impl(node, stack[-1])
+        scope = local.scope if self._n_scopes else None
+        # As _cache_get, inlined for speed
+        while scope is not None:
+            if node in scope.cache:
+                return scope.cache[node]
+            if node in scope.dirty:
+                break
+            scope = scope.parent
+        else:
+            try:
+                return self._cache[node]
+            except KeyError:
+                pass
+        depth = len(stack) - local.base
+        if depth <= 0:
+            return self._evaluate(node)
+        if depth >= _MAX_DEPTH:
+            raise _Deferred(node)
+        return self._calculate(node)
+
+    def _evaluate(self, node):
+        # Evaluates <node> from the bottom of the stack.  Calculators
+        # recurse into their inputs through attribute access, which
+        # would hit the interpreter's recursion limit on long chains
+        # of nodes.  Instead, a calculation more than _MAX_DEPTH
+        # levels down raises _Deferred back to here, where it's
+        # pushed onto a work stack and evaluated in turn from the
+        # bottom.  Whatever it interrupted is then retried, finding
+        # it in the cache.  Retrying runs the interrupted calculators
+        # again from the start, so any side effects they have before
+        # reading the deferred node happen more than once.
+        #
+        # A scope opened partway through a calculation starts a new
+        # bottom, so a deferred node is always evaluated under the
+        # same scopes as the calculator that asked for it.  Otherwise
+        # it would be computed, and cached, outside of the scope, and
+        # the retry within the scope would never find it.
+        local = self._tls.state
+        if local.evaluating:
+            # Nested, eg within a scope, and already counted
+            return self._evaluate_from(node)
+        with self._lock:
+            self._n_evaluating += 1
+        local.evaluating = True
+        try:
+            return self._evaluate_from(node)
+        finally:
+            local.evaluating = False
+            with self._lock:
+                self._n_evaluating -= 1
+
+    def _evaluate_from(self, node):
+        # <node>, like any deferred node, is known not to be cached,
+        # but whatever one interrupted is looked up again on retry.
+        work = [node]
+        pending = set(work)
+        hit = False
+        while True:
+            top = work[-1]
+            if not hit:
+                try:
+                    retval = self._calculate(top)
+                except _Deferred as deferred:
+                    dep = deferred.node
+                    if dep in pending:
+                        names = [self.node_name(n) for n in work + [dep]]
+                        s = pprint.pformat(names)
+                        raise LoopException("\n=== LOOP DETECTED ===\n%s" % s)
+                    work.append(dep)
+                    pending.add(dep)
+                    continue
+            work.pop()
+            pending.discard(top)
+            if not work:
+                return retval
+            (hit, retval,) = self._cache_get(work[-1])
+
+    def _calculate(self, node):
+        local = self._tls.state
+        stack = local.stack
+        if node in stack:
+            stack = stack + [node]
             stack = [self.node_name(n) for n in stack]
             s = pprint.pformat(stack)
             raise LoopException("\n=== LOOP DETECTED ===\n%s" % s)
 
-        self._stack.append(node)
-
-        if node in self._values:
-            retval = self._values[node]
-        else:
-            retval = self._calc[node](self)
-
-        self._cache_put(node, retval)
-        self._stack.pop()
-
-        if stack:
-            self._stack = orig_stack
+        stack.append(node)
+        try:
+            generation = self._generation
+            clears = local.clears
+            scope = local.scope if self._n_scopes else None
+            # As _lookup_value, inlined for speed
+            found = False
+            level = scope
+            while level is not None:
+                if node in level.values:
+                    retval = level.values[node]
+                    found = retval is not _REVERTED
+                    break
+                level = level.parent
+            else:
+                found = node in self._values
+                if found:
+                    retval = self._values[node]
+            if found:
+                pass
+            elif self._memo is not None:
+                retval = self._memo_calculate(node)
+            else:
+                retval = self._calc[node](self)
+
+            if scope is not None:
+                self._cache_put(node, retval, (generation, clears,))
+            elif self._generation - generation == local.clears - clears:
+                # As _cache_put, inlined for speed
+                self._cache[node] = retval
+                if self._generation - generation != local.clears - clears:
+                    with self._lock:
+                        if self._cache.get(node) is retval:
+                            del self._cache[node]
+        finally:
+            stack.pop()
 
         return retval
 
-    def _cache_clear(self, node=None):
-        if self._deps_are_stale:
-            # This call is quite expensive, so we only want to do so
-            # if necessary.
-            self._map_dependencies()
-
-        if node is not None:
-            if node in self._cache:
-                del self._cache[node]
-            for client in self._clients[node]:
-                if client in self._cache:
-                    del self._cache[client]
-        else:
-            self._init_cache()
-
-    def _cache_put(self, node, value):
+    def _cache_clear(self, node=None, nodes=None):
+        # Drops <node>, or all of <nodes>, along with their clients
+        # from the cache, or everything if neither is given.
+        with self._lock:
+            if self._deps_are_stale:
+                # This call is quite expensive, so we only want to do
+                # so if necessary.
+                self._map_dependencies()
+
+            self._generation += 1
+            self._tls.state.clears += 1
+            if node is not None:
+                nodes = [node]
+            if nodes is not None:
+                for node in self._affected(nodes):
+                    self._cache.pop(node, None)
+            else:
+                self._init_cache()
+
+            # Forks may have computed values from the ones dropped
+            if self._forks:
+                for fork in list(self._forks):
+                    fork._cache_clear(nodes=nodes)
+
+    def _affected(self, nodes):
+        # The nodes along with all of their clients
+        with self._lock:
+            if self._deps_are_stale:
+                self._map_dependencies()
+            if 1 == len(nodes):
+                (node,) = nodes
+                return [node] + self._clients.get(node, [])
+            clients = self._clients.bits
+            bits = 0
+            for node in nodes:
+                bits |= (1 << node) | clients.get(node, 0)
+            return _bit_nodes(bits)
+
+    def _cache_get(self, node):
+        # Returns (hit, value), looking through this thread's scopes
+        # before the shared cache.
+        scope = self._tls.state.scope if self._n_scopes else None
+        while scope is not None:
+            if node in scope.cache:
+                return (True, scope.cache[node])
+            if node in scope.dirty:
+                return (False, None)
+            scope = scope.parent
+        try:
+            return (True, self._cache[node])
+        except KeyError:
+            return (False, None)
+
+    def _generation_mark(self):
+        # Counts the cache invalidations so far, both overall and
+        # those made by this thread.
+        return (self._generation, self._tls.state.clears,)
+
+    def _cache_put(self, node, value, mark=None):
+        # Values that don't depend on anything overridden within this
+        # thread's scopes are shared with everybody else.  That can
+        # only be trusted if no dependencies were discovered since the
+        # scopes were opened.
+        local = self._tls.state
+        scope = local.scope if self._n_scopes else None
+        while scope is not None:
+            if node in scope.dirty or scope.edges != self._n_edges:
+                local.scope.cache[node] = value
+                return
+            scope = scope.parent
+
+        # If another thread invalidated the cache while we were
+        # computing, our value may be stale, so it isn't published.
+        # Our own invalidations are fine: cycle-inducing calculators
+        # override and revert nodes as part of their calculation.
+        if mark is None:
+            with self._lock:
+                self._cache[node] = value
+            return
+        if self._generation - mark[0] != local.clears - mark[1]:
+            return
         self._cache[node] = value
+        # Rather than taking the lock, check again once it's
+        # published, and take it back if an invalidation slipped in.
+        if self._generation - mark[0] != local.clears - mark[1]:
+            with self._lock:
+                if self._cache.get(node) is value:
+                    del self._cache[node]
 
     def __getattr__(self, name):
-        if name in self._nodes:
-            node = self.node_num(name)
+        # Only called for missing attributes, which includes every
+        # attribute while unpickling or copying hasn't set _nodes yet
+        try:
+            node = self.__dict__['_nodes'][name]
+        except KeyError:
+            if '_nodes' not in self.__dict__:
+                raise AttributeError(name)
+            node = None
+        if node is not None:
+            # As cached_calculate, inlined for speed: only a miss needs
+            # to check that the node can be calculated at all.
+            if not (self._n_scopes or self._n_evaluating):
+                try:
+                    return self._cache[node]
+                except KeyError:
+                    pass
             if node not in self._values and node not in self._calc:
                 name = self.node_name(node)
                 msg = "It looks like you're missing an item: %s" % name
@@ -254,14 +1263,12 @@ class DAGModel(object):
             return self.cached_calculate(node)
         raise AttributeError("It looks like you're missing a node: %s" % name)
 
-    def _client_list(self, flat_deps):
-        retval = {}
-        for dep in self._names:
-            retval[dep] = []
-            for node in flat_deps:
-                if dep in flat_deps[node]:
-                    retval[dep].append(node)
-        return retval
+    def _client_list(self, deps):
+        clients = dict((node, []) for node in self._names)
+        for node, inputs in deps.items():
+            for dep in inputs:
+                clients[dep].append(node)
+        return _Bitsets(_closure(clients))
 
     def _named_deplist(self, deps):
         retval = {}
@@ -270,19 +1277,9 @@ class DAGModel(object):
             retval[n] = [ self.node_name(x) for x in deps[node] ]
         return retval
 
-    def __flattened_deps_r(self, node, res={}):
-        if node in self._deps:
-            # We only register dependencies for dependent items
-            for dep in self._deps[node]:
-                res[dep] = 1
-                self.__flattened_deps_r(dep, res=res)
-        return res.keys()
-
     def _flattened_deps(self):
-        retval = {}
-        for node in self._deps:
-            retval[node] = self.__flattened_deps_r(node, res={})
-        return retval
+        # We only register dependencies for dependent items
+        return _Bitsets(_closure(self._deps))
 
     def node_name(self, node):
         """Returns the name of the node
@@ -301,9 +1298,21 @@ class DAGModel(object):
 
         If it's a static node, it redefines it.  If it's a calculated
         node it'll serve this static value instead of executing node.
+        Within a scoped() block, the override only lasts until the
+        block exits.
         """
-        self._cache_clear(node=node)
-        self._values[node] = value
+        scope = self._tls.state.scope if self._n_scopes else None
+        if scope is not None:
+            scope.invalidate(self._invalidation_set(node))
+            scope.values[node] = value
+            return
+
+        # The value goes in before the cache is invalidated, so that a
+        # calculation which could still read the old value is always
+        # caught by the generation check in _cache_put.
+        with self._lock:
+            self._values[node] = value
+            self._cache_clear(node=node)
 
     def revert(self, node):
         """Reverts an override on a node.
@@ -311,15 +1320,112 @@ class DAGModel(object):
         Please note that this operation only makes sense if you're
         reverting an override on a calculator.
         """
+        scope = self._tls.state.scope if self._n_scopes else None
+        if scope is not None:
+            if self._lookup_value(node)[0]:
+                if node in self._calc:
+                    scope.invalidate(self._invalidation_set(node))
+                    scope.values[node] = _REVERTED
+                else:
+                    name = self.node_name(node)
+                    msg = "You can't revert a static value: %s" % name
+                    raise AttributeError(msg)
+            return
+
         if node in self._values:
             if node in self._calc:
-                self._cache_clear(node=node)
-                del self._values[node]
+                # As override, the invalidation comes last
+                with self._lock:
+                    del self._values[node]
+                    self._cache_clear(node=node)
             else:
                 name = self.node_name(node)
                 msg = "You can't revert a static value: %s" % name
                 raise AttributeError(msg)
 
+    def override_many(self, overrides=None, reverts=()):
+        """Overrides (and reverts) several nodes in one go.
+
+        overrides -- dict of node number => value
+        reverts -- node numbers whose overrides are to be reverted
+
+        Same as calling override() and revert() for each of them,
+        except that the cache is invalidated once for the lot, and
+        overriding a node with the value it already has (or reverting
+        one that isn't overridden) is skipped altogether.
+        """
+        changed = []
+        values = {}
+        for node, value in (overrides or {}).items():
+            (found, current,) = self._lookup_value(node)
+            if found and _same_value(current, value):
+                continue
+            changed.append(node)
+            values[node] = value
+
+        removed = []
+        for node in reverts:
+            if not self._lookup_value(node)[0]:
+                continue
+            if node not in self._calc:
+                name = self.node_name(node)
+                msg = "You can't revert a static value: %s" % name
+                raise AttributeError(msg)
+            changed.append(node)
+            removed.append(node)
+
+        if not changed:
+            return
+
+        scope = self._tls.state.scope if self._n_scopes else None
+        if scope is not None:
+            scope.invalidate(self._affected(changed))
+            scope.values.update(values)
+            for node in removed:
+                scope.values[node] = _REVERTED
+            return
+
+        # As override, the invalidation comes last
+        with self._lock:
+            self._values.update(values)
+            for node in removed:
+                del self._values[node]
+            self._cache_clear(nodes=changed)
+
+    @contextlib.contextmanager
+    def transaction(self, overrides=None, reverts=()):
+        """Context manager applying overrides until the block exits.
+
+        overrides -- dict of node number => value
+        reverts -- node numbers whose overrides are to be reverted
+
+        The changes are made with override_many() on the way in, and
+        the nodes are put back the way they were (again, in a single
+        invalidation) on the way out.  Unlike scoped(), the changes
+        are visible to every thread while the block runs, and only
+        the nodes given here are restored.
+
+        with model.transaction({e.rain_loss_db: 3, e.bitrate_hz: 1e6}):
+            margin = model.link_margin_db
+        """
+        overrides = overrides or {}
+        saved = {}
+        for node in list(overrides) + list(reverts):
+            saved[node] = self._lookup_value(node)
+
+        self.override_many(overrides, reverts)
+        try:
+            yield self
+        finally:
+            restore = {}
+            unset = []
+            for node, (found, value,) in saved.items():
+                if found:
+                    restore[node] = value
+                else:
+                    unset.append(node)
+            self.override_many(restore, unset)
+
     def override_value(self, node):
         """Returns the override value for a node.
 
@@ -328,9 +1434,28 @@ class DAGModel(object):
         you're overriding the calculated node to return None, well,
         you're out of luck.
         """
-        if node in self._values:
-            return self._values[node]
-        return None
+        return self._lookup_value(node)[1]
+
+    def sweep(self, inputs, outputs, mode='product', chunk_size=1024,
+              start=0, vectorized=False, fixed=None):
+        """Returns a lazy Sweep of the outputs over a grid of inputs.
+
+        inputs -- dict of node name (or number) => array of values
+        outputs -- list of node names (or numbers)
+        mode -- 'product' for every combination of the inputs, or
+                'zip' to take equal-length inputs together
+
+        Nothing is evaluated until the sweep is iterated over, which
+        yields SweepChunks of at most <chunk_size> points.  Start at
+        point <start> to resume an interrupted sweep, see
+        pylink.sweep for the rest of the arguments.  The model itself
+        is left untouched.
+        """
+        from pylink.sweep import Sweep
+
+        return Sweep(self, inputs, outputs, mode=mode,
+                     chunk_size=chunk_size, start=start,
+                     vectorized=vectorized, fixed=fixed)
 
     def _solve_for(self, var, fixed, fixed_value, start, stop, step):
 
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+
+"""Process-parallel sweeps writing into shared memory.
+
+DAGModels aren't shipped to the worker processes.  Each worker builds
+its own model, once, from a ModelRecipe: a picklable factory plus its
+arguments, or a budget spec as accepted by the pylink command.  The
+sweep's grid is split into contiguous ranges of points, and workers
+write their outputs straight into numpy arrays in shared memory, so
+only the range boundaries travel between processes:
+
+  recipe = pylink.ModelRecipe(make_budget, altitude_km=550)
+  out = pylink.parallel_sweep(recipe,
+                              {'min_elevation_deg': np.linspace(0, 90, 901),
+                               'rain_loss_db': np.linspace(0, 20, 201)},
+                              ['link_margin_db'],
+                              workers=64)
+  out['link_margin_db']         # => array of 901 * 201 margins
+
+Outputs must be numeric, with the same shape at every point.
+"""
+
+import multiprocessing
+import multiprocessing.shared_memory
+import multiprocessing.util
+
+import numpy as np
+
+from pylink.sweep import Sweep
+
+
+class ModelRecipe(object):
+    """A picklable description of how to build a DAGModel.
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        """Creates a new recipe.
+
+        factory -- module-level callable returning a DAGModel, or a
+                   budget spec string (see pylink.cli.load_budget)
+        args, kwargs -- passed to the factory
+        """
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+
+    def build(self):
+        """Returns a new DAGModel made from the recipe.
+        """
+        if isinstance(self.factory, str):
+            from pylink.cli import load_budget
+            return load_budget(self.factory)
+        return self.factory(*self.args, **self.kwargs)
+
+
+def _recipe(recipe):
+    if isinstance(recipe, ModelRecipe):
+        return recipe
+    return ModelRecipe(recipe)
+
+
+# Per-process state of the workers
+_worker = None
+_finalizer = None
+
+
+class _Worker(object):
+
+    def __init__(self, recipe, inputs, outputs, mode, vectorized, fixed,
+                 buffers):
+        model = recipe.build()
+        self.sweep = Sweep(model, inputs, outputs, mode=mode,
+                           vectorized=vectorized, fixed=fixed)
+        self.outputs = outputs
+        self.shm = []
+        self.arrays = {}
+        for name, (shm_name, shape, dtype,) in buffers.items():
+            shm = multiprocessing.shared_memory.SharedMemory(name=shm_name)
+            self.shm.append(shm)
+            self.arrays[name] = np.ndarray(shape, dtype=dtype,
+                                           buffer=shm.buf)
+
+    def __call__(self, start, stop):
+        chunk = self.sweep.evaluate(start, stop)
+        for name in self.outputs:
+            self.arrays[name][start:stop] = chunk.outputs[name]
+        return stop - start
+
+
+def _init_worker(*args):
+    global _worker
+    _worker = _Worker(*args)
+
+
+def _init_pool_worker(*args):
+    global _finalizer
+    _init_worker(*args)
+    # Pool workers leave through os._exit, skipping atexit, but
+    # multiprocessing runs its own finalizers on the way out
+    _finalizer = multiprocessing.util.Finalize(None, _release_worker,
+                                               exitpriority=0)
+
+
+def _run_range(bounds):
+    return _worker(*bounds)
+
+
+def _release_worker():
+    global _worker
+    if _worker is not None:
+        _worker.arrays.clear()
+        for shm in _worker.shm:
+            shm.close()
+    _worker = None
+
+
+def _ranges(start, n, size):
+    for i in range(start, n, size):
+        yield (i, min(i + size, n),)
+
+
+def parallel_sweep(recipe, inputs, outputs, mode='product', workers=None,
+                   chunk_size=4096, vectorized=False, fixed=None):
+    """Evaluates a sweep across a pool of worker processes.
+
+    recipe -- ModelRecipe (or a picklable factory, or budget spec)
+    inputs -- dict of node name => 1-D array of values
+    outputs -- list of node names to evaluate
+    mode -- 'product' or 'zip', as for DAGModel.sweep
+    workers -- number of processes, defaults to the number of CPUs
+    chunk_size -- points handed to a worker at a time
+    vectorized, fixed -- as for DAGModel.sweep
+
+    Returns a dict of output name => array with one entry per point,
+    in the same order as DAGModel.sweep.
+    """
+    recipe = _recipe(recipe)
+    outputs = list(outputs)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    # The parent evaluates the first point itself to learn the shape
+    # of each output, which also catches a bad recipe before any
+    # processes are started.
+    sweep = Sweep(recipe.build(), inputs, outputs, mode=mode,
+                  vectorized=vectorized, fixed=fixed)
+    n = sweep.n
+    if not n:
+        return dict((name, np.empty(0)) for name in outputs)
+    first = sweep.evaluate(0, 1)
+
+    segments = []
+    arrays = {}
+    buffers = {}
+    try:
+        for name in outputs:
+            sample = np.asarray(first.outputs[name], dtype=float)
+            shape = (n,) + sample.shape[1:]
+            size = max(int(np.prod(shape)) * sample.itemsize, 1)
+            shm = multiprocessing.shared_memory.SharedMemory(create=True,
+                                                             size=size)
+            segments.append(shm)
+            arrays[name] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+            arrays[name][0:1] = sample
+            buffers[name] = (shm.name, shape, 'float64',)
+
+        ranges = _ranges(1, n, chunk_size)
+        initargs = (recipe, inputs, outputs, mode, vectorized, fixed,
+                    buffers,)
+        if workers <= 1:
+            _init_worker(*initargs)
+            try:
+                for bounds in ranges:
+                    _run_range(bounds)
+            finally:
+                _release_worker()
+        else:
+            with multiprocessing.Pool(workers,
+                                      initializer=_init_pool_worker,
+                                      initargs=initargs) as pool:
+                for done in pool.imap_unordered(_run_range, ranges):
+                    pass
+                # Rather than terminating the workers on the way out
+                # of the block, let them exit (and release their
+                # shared memory) in their own time
+                pool.close()
+                pool.join()
+
+        return dict((name, np.array(arrays[name])) for name in outputs)
+    finally:
+        arrays.clear()
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
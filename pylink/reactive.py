@@ -0,0 +1,166 @@
+#!/usr/bin/python
+
+"""Push-based recomputation of watched nodes.
+
+A DAGModel is normally pull-based: override() drops the cached values
+depending on the node, and they're recomputed one at a time when next
+read.  A Reactor instead keeps a set of watched outputs up to date,
+recomputing the invalidated ones eagerly (inputs before clients) as
+soon as a change, or batch of changes, is made, and notifying
+subscribers of the outputs whose values changed:
+
+  r = pylink.Reactor(m, ['link_margin_db', 'cn0_db'])
+  r.subscribe(lambda changes: print(changes))
+  with r.batch():
+      r.set('rain_loss_db', 3)
+      r.set('min_elevation_deg', 15)
+  # => {'link_margin_db': ..., 'cn0_db': ...}
+"""
+
+import contextlib
+
+from pylink.utils import _differs
+
+
+class Reactor(object):
+    """Keeps the watched nodes of a model up to date as inputs change.
+
+    The Reactor assumes it is the only one changing the model.
+    """
+
+    def __init__(self, model, watch=()):
+        """Creates a new Reactor.
+
+        model -- DAGModel
+        watch -- names of the nodes to keep up to date
+        """
+        self.model = model
+        self.values = {}
+        self._watched = []
+        self._subscribers = []
+        self._pending = {}
+        self._depth = 0
+        self._plan = None
+        self.watch(watch)
+
+    def watch(self, names):
+        """Adds nodes to the watched set, computing them right away.
+        """
+        for name in names:
+            if name not in self._watched:
+                node = self.model.node_num(name)
+                self._watched.append(name)
+                self.values[name] = self.model.cached_calculate(node)
+        self._plan = None
+
+    def unwatch(self, names):
+        """Removes nodes from the watched set.
+        """
+        for name in names:
+            if name in self._watched:
+                self._watched.remove(name)
+                del self.values[name]
+        self._plan = None
+
+    def subscribe(self, callback, names=None):
+        """Registers callback(changes) for changes to watched nodes.
+
+        callback -- called with a dict of node name => new value
+        names -- only report these nodes (default: all watched nodes)
+
+        The callback is only called when at least one of its nodes
+        actually changed value.  Returns a handle for unsubscribe().
+        """
+        handle = (callback, None if names is None else set(names),)
+        self._subscribers.append(handle)
+        return handle
+
+    def unsubscribe(self, handle):
+        self._subscribers.remove(handle)
+
+    def get(self, name):
+        """Returns the current value of a watched node.
+        """
+        return self.values[name]
+
+    def set(self, name, value):
+        """Changes an input (overrides a node).
+
+        Inside of a batch() block the change is held until the block
+        exits, otherwise the watched nodes are updated immediately.
+        """
+        self._pending[self.model.node_num(name)] = value
+        if not self._depth:
+            self.flush()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Groups several set() calls into a single update.
+        """
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+        if not self._depth:
+            self.flush()
+
+    def _make_plan(self):
+        # The watched nodes along with everything they depend upon,
+        # in topological order.  It only needs to change when the
+        # dependency graph does.
+        m = self.model
+        watched = set(m.node_num(name) for name in self._watched)
+        relevant = set(watched)
+        with m._lock:
+            if m._deps_are_stale:
+                m._map_dependencies()
+            for node in watched:
+                relevant.update(m._flat_deps.get(node, []))
+        order = [n for n in m.topological_order() if n in relevant]
+        self._plan = (m._n_edges, order,)
+
+    def flush(self):
+        """Applies pending changes and recomputes the watched nodes.
+
+        Only nodes that were invalidated by the changes are
+        recomputed, each after all of its inputs.  Returns the dict of
+        watched nodes whose value changed.
+        """
+        m = self.model
+        pending = self._pending
+        self._pending = {}
+
+        # One invalidation for the lot, skipping unchanged values
+        m.override_many(pending)
+
+        if self._plan is None or self._plan[0] != m._n_edges:
+            self._make_plan()
+
+        # Computing in topological order means every input is cached
+        # by the time its client is computed.
+        for node in self._plan[1]:
+            if node not in m._cache:
+                m.cached_calculate(node)
+
+        changes = {}
+        for name in self._watched:
+            value = m.cached_calculate(m.node_num(name))
+            if _differs(self.values[name], value):
+                changes[name] = value
+            self.values[name] = value
+
+        # Recomputing may have discovered new dependencies
+        if self._plan[0] != m._n_edges:
+            self._plan = None
+
+        if changes:
+            for (callback, names,) in list(self._subscribers):
+                if names is None:
+                    mine = changes
+                else:
+                    mine = dict((k, v) for k, v in changes.items()
+                                if k in names)
+                if mine:
+                    callback(mine)
+        return changes
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class RenderJob(object):
+    """A self-contained request to draw one figure to one file.
+
+    Figures are produced in two phases.  First the data is sampled
+    from the model, then it is handed to a plain module-level
+    rendering function along with everything else it needs.  A
+    RenderJob is the result of the first phase, so it holds no
+    reference to the model and can be shipped to a worker process.
+    """
+
+    def __init__(self, func, path, **kwargs):
+        """Creates a new render job.
+
+        func -- module-level function called as func(path, **kwargs)
+        path -- where the image will be written
+        kwargs -- plain data (numbers, strings, lists, numpy arrays)
+        """
+        self.func = func
+        self.path = path
+        self.kwargs = kwargs
+
+    def __call__(self):
+        self.func(self.path, **self.kwargs)
+        return self.path
+
+    def digest(self):
+        """Returns a hex digest of everything that determines the image.
+
+        The kwargs are the model values the figure was sampled from
+        plus its rendering parameters, so two jobs with the same
+        digest will produce identical files.
+        """
+        h = hashlib.sha1()
+        _digest_update(h, '%s.%s' % (self.func.__module__,
+                                     self.func.__name__))
+        _digest_update(h, self.kwargs)
+        return h.hexdigest()
+
+
+def _digest_update(h, obj):
+    if isinstance(obj, np.ndarray):
+        obj = np.ascontiguousarray(obj)
+        h.update(('ndarray:%s:%s:' % (obj.dtype.str, obj.shape)).encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, dict):
+        h.update(b'dict:')
+        for k in sorted(obj.keys()):
+            _digest_update(h, k)
+            _digest_update(h, obj[k])
+    elif isinstance(obj, (list, tuple, range)):
+        h.update(('seq:%d:' % len(obj)).encode())
+        for v in obj:
+            _digest_update(h, v)
+    else:
+        # repr() is exact for floats, and stable for the remaining
+        # plain types (str, int, bool, None)
+        h.update(('%s:%r;' % (type(obj).__name__, obj)).encode())
+
+
+class FigureCache(object):
+    """Content-addressed cache of rendered figures.
+
+    Each directory that receives figures gets a small manifest
+    mapping file names to the digest of the RenderJob that produced
+    them.  A job whose output file exists and whose digest matches
+    the manifest is not rendered again.
+
+    After rendering, the paths that were skipped can be found in
+    <reused> and the ones that were drawn in <rendered>.
+    """
+
+    MANIFEST = '.pylink-figures.json'
+
+    def __init__(self):
+        self.reused = []
+        self.rendered = []
+        self._manifests = {}
+
+    def _manifest(self, dname):
+        if dname not in self._manifests:
+            path = os.path.join(dname, self.MANIFEST)
+            manifest = {}
+            if os.path.exists(path):
+                with open(path, 'r') as fd:
+                    try:
+                        manifest = json.load(fd)
+                    except ValueError:
+                        manifest = {}
+            self._manifests[dname] = manifest
+        return self._manifests[dname]
+
+    def _split(self, path):
+        path = os.path.abspath(path)
+        return (os.path.dirname(path), os.path.basename(path),)
+
+    def is_fresh(self, job):
+        """Determines whether or not the job's output is up to date.
+        """
+        (dname, fname,) = self._split(job.path)
+        if not os.path.exists(job.path):
+            return False
+        return self._manifest(dname).get(fname) == job.digest()
+
+    def reuse(self, job):
+        self.reused.append(job.path)
+
+    def record(self, job):
+        """Records that the job has just been rendered.
+        """
+        (dname, fname,) = self._split(job.path)
+        self._manifest(dname)[fname] = job.digest()
+        self.rendered.append(job.path)
+
+    def save(self):
+        """Writes the manifests back to their directories.
+        """
+        for dname, manifest in self._manifests.items():
+            path = os.path.join(dname, self.MANIFEST)
+            with open(path, 'w') as fd:
+                json.dump(manifest, fd, indent=1, sort_keys=True)
+
+
+def _run_job(job):
+    return job()
+
+
+def render_all(jobs, processes=1, cache=None):
+    """Renders a list of RenderJobs, optionally in a process pool.
+
+    jobs -- iterable of RenderJob objects
+    processes -- number of worker processes (1 renders serially)
+    cache -- optional FigureCache used to skip up-to-date figures
+
+    Every job writes to the path it was given, so the output file
+    names do not depend on the order in which the workers finish.
+    Returns the list of paths in the same order as the jobs.
+    """
+    jobs = list(jobs)
+
+    todo = []
+    for job in jobs:
+        if cache is not None and cache.is_fresh(job):
+            cache.reuse(job)
+        else:
+            todo.append(job)
+
+    if processes is None or processes <= 1 or len(todo) <= 1:
+        for job in todo:
+            job()
+    else:
+        import concurrent.futures
+
+        n = min(processes, len(todo))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n) as pool:
+            list(pool.map(_run_job, todo))
+
+    if cache is not None:
+        for job in todo:
+            cache.record(job)
+        cache.save()
+
+    return [job.path for job in jobs]
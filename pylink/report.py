@@ -1,16 +1,77 @@
 #!/usr/bin/python
 
 import collections
-import distutils.sysconfig
-import jinja2
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 import site
 
+import pylink.compliance as compliance
+import pylink.render as render
 import pylink.utils as utils
 
 
+# matplotlib, jinja2 and distutils are slow to import, so they are only
+# loaded when a figure is drawn or a template is rendered.
+
+def _render_vs_el(path, x, y, title, ylabel, pfd_limits):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure()
+    if title:
+        fig.suptitle(title)
+    ax = fig.add_subplot(1, 1, 1)
+
+    # Plot any limit lines
+    if pfd_limits:
+        lx = [p[0] for p in pfd_limits]
+        ly = [p[1] for p in pfd_limits]
+        ax.plot(lx, ly, color='r', linewidth=2, label='Limit')
+
+    ax.plot(x, y, color='b')
+    ax.set_xlabel('Elevation Angle (degrees)')
+    ax.set_ylabel(ylabel)
+
+    # XXX: matplotlib is doing weird things if you set ylim this way
+    # if pfd_limits:
+    #     upper = max(max(y), pfd_limits[-1][1])
+    #     lower = min(min(y), pfd_limits[0][1])
+
+    #     delta = upper - lower
+    #     upper += delta*0.1
+    #     lower -= delta*0.1
+
+    #     plt.ylim(lower, upper)
+    # else:
+    #     upper = max(y)
+    #     lower = min(y)
+
+    fig.savefig(path, transparent=True)
+    plt.close(fig)
+
+
+def _render_pfd_vs_bw(path, x, y, title, ylabel, pfd_limits):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure()
+    if title:
+        fig.suptitle(title)
+    ax = fig.add_subplot(1, 1, 1)
+
+    ax.plot(x, y, color='b', label='PFD (dBW/m^2)')
+
+    # Plot any limit lines
+    if pfd_limits:
+        lx = [p[0] for p in pfd_limits]
+        ly = [p[1] for p in pfd_limits]
+        ax.plot(lx, ly, color='r', linewidth=2, label='Limit')
+
+    ax.set_xlabel('Bandwidth (Hz)')
+    ax.set_ylabel(ylabel)
+
+    fig.savefig(path, transparent=True)
+    plt.close(fig)
+
+
 class Figure(object):
 
     def __init__(self, title=None):
@@ -32,58 +93,55 @@ class Figure(object):
   \\end{figure}
         ''' % (self.caption(), path, self.label())
 
-    def _plot_vs_el(self, y_func, dname='.', fname=None):
-        m = self.model
-        e = self.model.enum
-
-        orig_el = m.override_value(e.min_elevation_deg)
+    def plot(self, dname='.', fname=None, cache=None):
+        """Samples the model and renders the figure to a PNG file.
 
-        fig = plt.figure()
-        if self.title:
-            fig.suptitle(self.title)
-        ax = fig.add_subplot(1, 1, 1)
+        cache -- optional FigureCache, skips the drawing if unchanged
+        """
+        job = self.render_job(dname=dname, fname=fname)
+        return render.render_all([job], cache=cache)[0]
 
-        # Plot any limit lines
-        if 'pfd_limits' in vars(self) and self.pfd_limits:
-            x = [p[0] for p in self.pfd_limits]
-            y = [p[1] for p in self.pfd_limits]
-            ax.plot(x, y, color='r', linewidth=2, label='Limit')
+    def _sample_vs_el(self, y_func):
+        m = self.model
+        e = self.model.enum
 
-        # Now plot the PFD curve
+        # Now sample the PFD curve
         x = np.linspace(0.0, 90.0, 90)
         y = np.linspace(0.0, 90.0, 90)
 
-        for i in range(len(x)):
-            m.override(e.min_elevation_deg, x[i])
-            y[i] = y_func(i)
-
-        ax.plot(x, y, color='b')
-        ax.set_xlabel('Elevation Angle (degrees)')
-        ax.set_ylabel(self.ylabel())
+        # The overrides are scoped, so the model itself is untouched
+        with m.scoped():
+            for i in range(len(x)):
+                m.override(e.min_elevation_deg, x[i])
+                y[i] = y_func(i)
 
-        # XXX: matplotlib is doing weird things if you set ylim this way
-        # if 'pfd_limits' in vars(self) and self.pfd_limits:
-        #     upper = max(max(y), self.pfd_limits[-1][1])
-        #     lower = min(min(y), self.pfd_limits[0][1])
+        return (x, y)
 
-        #     delta = upper - lower
-        #     upper += delta*0.1
-        #     lower -= delta*0.1
+    def _vs_el_job(self, y_func, dname='.', fname=None, samples=None):
+        """Builds the render job for a curve vs elevation.
 
-        #     plt.ylim(lower, upper)
-        # else:
-        #     upper = max(y)
-        #     lower = min(y)
+        y_func -- y_func(i) gives the i'th sample, see _sample_vs_el
+        samples -- (x, y) arrays to draw instead of sampling y_func
+        """
+        if samples is None:
+            samples = self._sample_vs_el(y_func)
+        (x, y,) = samples
 
         if not fname:
             fname = self.fname()
         path = os.path.join(dname, fname)
-        fig.savefig(path, transparent=True)
 
-        if orig_el is not None:
-            m.override(e.min_elevation_deg, orig_el)
-        else:
-            m.reset(e.min_elevation_deg)
+        pfd_limits = None
+        if 'pfd_limits' in vars(self) and self.pfd_limits:
+            pfd_limits = list(self.pfd_limits)
+
+        return render.RenderJob(_render_vs_el,
+                                path,
+                                x=x,
+                                y=y,
+                                title=self.title,
+                                ylabel=self.ylabel(),
+                                pfd_limits=pfd_limits)
 
 
 class CanonicalPFDFigure(Figure):
@@ -131,13 +189,13 @@ class CanonicalPFDFigure(Figure):
     def caption(self):
         return "Peak PFD at Earth Station assuming full BW utilization"
 
-    def plot(self, dname='.', fname=None):
-        def __y(i):
-            m = self.model
-            return utils.pfd_hz_manual_adjust(m.canonical_pf_dbw_per_m2,
-                                              m.allocation_hz,
-                                              self.bw)
-        return self._plot_vs_el(__y, dname=dname, fname=fname)
+    def render_job(self, dname='.', fname=None):
+        # Nothing here depends on the modulation code, so the whole
+        # curve is computed in one vectorized pass
+        x = np.linspace(0.0, 90.0, 90)
+        y = compliance.canonical_pfd_vs_el(self.model, x, self.bw)
+        return self._vs_el_job(None, dname=dname, fname=fname,
+                               samples=(x, y,))
 
 
 class ExpectedPFDFigure(Figure):
@@ -188,12 +246,12 @@ class ExpectedPFDFigure(Figure):
     def caption(self):
         return "Expected PFD at Earth Station under normal operations"
 
-    def plot(self, dname='.', fname=None):
+    def render_job(self, dname='.', fname=None):
         def __y(i):
             return utils.rx_pfd_hz_adjust(self.model,
                                           self.model.pf_dbw_per_m2,
                                           self.bw)
-        return self._plot_vs_el(__y, dname=dname, fname=fname)
+        return self._vs_el_job(__y, dname=dname, fname=fname)
 
 
 class PFDvsBWFigure(Figure):
@@ -249,7 +307,13 @@ class PFDvsBWFigure(Figure):
             else:
                 return 'Peak PFD at Receiver vs Bandwidth'
 
-    def plot(self, dname='.', fname=None):
+    def ylabel(self):
+        if self.is_gso:
+            return 'PFD at GSO(dBW/m^2)'
+        else:
+            return 'PFD at Receiver (dBW/m^2)'
+
+    def render_job(self, dname='.', fname=None):
         m = self.model
 
         if self.is_gso:
@@ -257,10 +321,6 @@ class PFDvsBWFigure(Figure):
         else:
             pf = m.peak_pf_dbw_per_m2
 
-        fig = plt.figure()
-        if self.title:
-            fig.suptitle(self.title)
-        ax = fig.add_subplot(1, 1, 1)
         n = int(self.end_hz) - int(self.start_hz)
         x = np.linspace(1, n, n-1)
         x += self.start_hz
@@ -269,24 +329,19 @@ class PFDvsBWFigure(Figure):
             bw = x[i]
             y[i] = utils.pfd_hz_manual_adjust(pf, m.allocation_hz, bw)
 
-        ax.plot(x, y, color='b', label='PFD (dBW/m^2)')
+        pfd_limits = list(self.pfd_limits) if self.pfd_limits else None
 
-        # Plot any limit lines
-        if self.pfd_limits:
-            x = [p[0] for p in self.pfd_limits]
-            y = [p[1] for p in self.pfd_limits]
-            ax.plot(x, y, color='r', linewidth=2, label='Limit')
-
-
-        ax.set_xlabel('Bandwidth (Hz)')
-        if self.is_gso:
-            ax.set_ylabel('PFD at GSO(dBW/m^2)')
-        else:
-            ax.set_ylabel('PFD at Receiver (dBW/m^2)')
         if not fname:
             fname = self.fname()
         path = os.path.join(dname, fname)
-        fig.savefig(path, transparent=True)
+
+        return render.RenderJob(_render_pfd_vs_bw,
+                                path,
+                                x=x,
+                                y=y,
+                                title=self.title,
+                                ylabel=self.ylabel(),
+                                pfd_limits=pfd_limits)
 
 
 class BitrateFigure(Figure):
@@ -312,12 +367,10 @@ class BitrateFigure(Figure):
     def ylabel(self):
         return 'Max Bitrate (MHz)'
 
-    def plot(self, dname='.', fname=None):
+    def render_job(self, dname='.', fname=None):
         def __y(i):
-            R = self.model.max_bitrate_hz
-            m = self.model
             return self.model.max_bitrate_hz / 1.0e6
-        return self._plot_vs_el(__y, dname=dname, fname=fname)
+        return self._vs_el_job(__y, dname=dname, fname=fname)
 
 
 class Report(object):
@@ -472,7 +525,9 @@ class Report(object):
                  added_sections=[],
                  added_interference_sections=[],
                  bitrate_figure=None,
-                 watermark_text=None):
+                 watermark_text=None,
+                 processes=1,
+                 figure_cache=None):
         """Export the budget to LaTeX
 
         fname -- Top level latex path
@@ -486,6 +541,8 @@ class Report(object):
         pfd_figures -- Any desired PFD figure objects
         bitrate_figure -- Any desired bitrate figure objects
         watermark_text -- Watermark text (such as DRAFT or CONFIDENTIAL)
+        processes -- Number of worker processes used to render figures
+        figure_cache -- Optional FigureCache to skip unchanged figures
 
         Interference Subsections:
         [('Subsection Title', [
@@ -663,11 +720,17 @@ class Report(object):
                 ]),
             ])
 
+        # The figures are sampled from the model here, but the
+        # (expensive) drawing is deferred so it can be done in parallel
+        jobs = []
+
         rx_pattern_fname = '%sRXPattern.png' % self._file_namify(m.budget_name)
-        m.rx_antenna_obj.plot_pattern(os.path.join(dname, rx_pattern_fname))
+        rx_pattern_path = os.path.join(dname, rx_pattern_fname)
+        jobs.append(m.rx_antenna_obj.pattern_render_job(rx_pattern_path))
 
         tx_pattern_fname = '%sTXPattern.png' % self._file_namify(m.budget_name)
-        m.tx_antenna_obj.plot_pattern(os.path.join(dname, tx_pattern_fname))
+        tx_pattern_path = os.path.join(dname, tx_pattern_fname)
+        jobs.append(m.tx_antenna_obj.pattern_render_job(tx_pattern_path))
 
         if watermark_text:
             draft_mark = '''
@@ -682,16 +745,18 @@ class Report(object):
 
         figs = []
         for fig in pfd_figures:
-            fig.plot(dname=os.path.dirname(fname))
+            jobs.append(fig.render_job(dname=dname))
             figs.append(fig.to_latex())
         interference_figures = '\n'.join(figs)
 
         if bitrate_figure:
-            bitrate_figure.plot(dname=os.path.dirname(fname))
+            jobs.append(bitrate_figure.render_job(dname=dname))
             budget_figures = bitrate_figure.to_latex()
         else:
             budget_figures = ''
 
+        render.render_all(jobs, processes=processes, cache=figure_cache)
+
         added_tables = []
         for section_name, section in added_sections:
             added_tables.append('''
@@ -727,6 +792,9 @@ class Report(object):
 
 
     def _jinja(self, basedir=None):
+        import distutils.sysconfig
+        import jinja2
+
         if not basedir:
             lib = distutils.sysconfig.get_python_lib()
             rel = 'pylink/tex'
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+
+"""Reusable model structure.
+
+Building a DAGModel merges its tributaries, creates a fresh enum class
+and maps out the declared dependencies, all of which is the same for
+every model built from the same tributaries.  A ModelSchema does that
+work once, and models created from it share the result:
+
+  schema = pylink.ModelSchema([pylink.Geometry(), ...])
+  for altitude in altitudes:
+      m = schema.new_model(apoapsis_altitude_km=altitude,
+                           periapsis_altitude_km=altitude)
+      ...
+
+Models share the schema's tributary objects, so tributaries that keep
+state on themselves (eg the Receiver's rf_chain elements) are shared
+as well.
+"""
+
+from pylink.model import DAGModel
+
+
+class ModelSchema(object):
+    """The nodes, calculators and dependencies shared by many models.
+    """
+
+    def __init__(self, contrib=[], **extras):
+        """Creates a new schema.
+
+        The arguments are the same as for DAGModel.
+        """
+        proto = DAGModel(contrib, **extras)
+        proto._map_dependencies()
+
+        self.enum = proto.enum
+        self._names = proto._names
+        self._nodes = proto._nodes
+        self._calc = proto._calc
+        self._values = proto._values
+        self._meta = proto._meta
+        self._dists = proto._dists
+        self._deps = proto._deps
+
+        self._flat_deps = proto._flat_deps
+        self._clients = proto._clients
+
+    def nodes(self):
+        return self._names.keys()
+
+    def new_model(self, **values):
+        """Returns a new DAGModel, see DAGModel.from_schema.
+        """
+        return DAGModel.from_schema(self, **values)
@@ -0,0 +1,197 @@
+#!/usr/bin/python
+
+"""Sensitivity of an output to every input upstream of it.
+
+Rather than overriding and reverting one input at a time, each input
+gets a pair of slots in a set of arrays (one nudged up, one nudged
+down, everything else nominal) and the output is evaluated once for
+all of them in a single vectorized pass.  See uncertainty.py for the
+requirements that places on calculators.
+
+  s = pylink.sensitivity(m, 'link_margin_db')
+  s.derivatives['tx_power_at_pa_dbw']   # => 1.0 dB per dB
+  for bar in pylink.tornado(m, 'link_margin_db')[:5]:
+      print(bar.name, bar.swing)
+"""
+
+import numpy as np
+
+from pylink.uncertainty import DEFAULT_FIXED
+from pylink.uncertainty import _vectorized_eval
+
+
+def _is_numeric(value):
+    return (isinstance(value, (int, float, np.integer, np.floating))
+            and not isinstance(value, (bool, np.bool_)))
+
+
+def upstream_inputs(model, output):
+    """Returns the numeric static (or overridden) nodes an output uses.
+
+    model -- DAGModel
+    output -- node name
+
+    The output is evaluated first so that every dependency has been
+    observed.  Returns a sorted list of node names.
+    """
+    node = model.node_num(output)
+    model.cached_calculate(node)
+    with model._lock:
+        if model._deps_are_stale:
+            model._map_dependencies()
+        upstream = list(model._flat_deps.get(node, []))
+
+    retval = []
+    for dep in upstream:
+        if model.is_static_node(dep) or model.is_overridden(dep):
+            if _is_numeric(model.cached_calculate(dep)):
+                retval.append(model.node_name(dep))
+    return sorted(retval)
+
+
+def _fixed_nodes(model, fixed):
+    if fixed is None:
+        fixed = DEFAULT_FIXED
+    return [model.node_num(name) for name in fixed if name in model._nodes]
+
+
+def _perturbed_eval(model, output, names, deltas, fixed):
+    # Slot 2i holds input i moved up by its delta, slot 2i+1 moved
+    # down, and every other slot has it at its nominal value.
+    k = len(names)
+    arrays = {}
+    for i, name in enumerate(names):
+        node = model.node_num(name)
+        values = np.full(2*k, float(model.cached_calculate(node)))
+        values[2*i] += deltas[i]
+        values[2*i+1] -= deltas[i]
+        arrays[node] = values
+
+    node = model.node_num(output)
+    y = _vectorized_eval(model, arrays, [node], fixed)[node]
+    return (y[0::2], y[1::2],)
+
+
+class SensitivityResult(object):
+    """Partial derivatives of one output with respect to its inputs.
+
+    <derivatives> maps input names to d(output)/d(input) in the
+    native units of each (so dB per dB for a loss or gain), and
+    <inputs> maps them to their nominal values.
+    """
+
+    def __init__(self, output, nominal, inputs, derivatives):
+        self.output = output
+        self.nominal = nominal
+        self.inputs = inputs
+        self.derivatives = derivatives
+
+    def ranked(self):
+        """Returns (name, derivative) pairs, largest magnitude first.
+        """
+        return sorted(self.derivatives.items(),
+                      key=lambda kv: (-abs(kv[1]), kv[0]))
+
+
+def sensitivity(model, output, inputs=None, rel_step=1e-6, fixed=None):
+    """Returns the partial derivatives of an output w.r.t. its inputs.
+
+    model -- DAGModel
+    output -- node name
+    inputs -- node names to differentiate by, defaults to all of the
+              numeric static nodes upstream of the output
+    rel_step -- central difference step, relative to each input's
+                magnitude (or absolute for inputs near zero)
+    fixed -- node names held at their nominal value, as for
+             monte_carlo
+
+    Every derivative comes from the same vectorized evaluation.
+    """
+    if inputs is None:
+        inputs = upstream_inputs(model, output)
+
+    nominal = model.cached_calculate(model.node_num(output))
+    values = [float(model.cached_calculate(model.node_num(n)))
+              for n in inputs]
+    steps = [rel_step * max(abs(v), 1.0) for v in values]
+
+    derivatives = {}
+    if inputs:
+        (up, down,) = _perturbed_eval(model, output, inputs, steps,
+                                      _fixed_nodes(model, fixed))
+        for i, name in enumerate(inputs):
+            derivatives[name] = float((up[i] - down[i]) / (2 * steps[i]))
+
+    return SensitivityResult(output, nominal,
+                             dict(zip(inputs, values)), derivatives)
+
+
+class TornadoBar(object):
+    """One bar of a tornado chart.
+
+    <low_output> and <high_output> are the output with the input at
+    nominal - delta and nominal + delta, and <swing> is the absolute
+    difference between them.
+    """
+
+    def __init__(self, name, nominal, delta, low_output, high_output):
+        self.name = name
+        self.nominal = nominal
+        self.delta = delta
+        self.low_output = low_output
+        self.high_output = high_output
+        self.swing = abs(high_output - low_output)
+
+    def __repr__(self):
+        return 'TornadoBar(%s, delta=%g, swing=%g)' % (self.name,
+                                                       self.delta,
+                                                       self.swing)
+
+
+def tornado(model, output, inputs=None, deltas=None, rel_delta=0.1,
+            fixed=None):
+    """Ranks inputs by how far they swing an output.
+
+    model -- DAGModel
+    output -- node name
+    inputs -- node names, defaults to all of the numeric static nodes
+              upstream of the output
+    deltas -- optional dict of input name => +/- excursion
+    rel_delta -- excursion, relative to the nominal value, for inputs
+                 without a distribution or an entry in <deltas>
+    fixed -- node names held at their nominal value, as for
+             monte_carlo
+
+    Inputs given a Distribution swing by one standard deviation.
+    Unlike sensitivity(), the output is evaluated at the actual
+    excursions, so nonlinear responses are captured.  Returns a list
+    of TornadoBars, largest swing first.
+    """
+    if inputs is None:
+        inputs = upstream_inputs(model, output)
+    deltas = deltas or {}
+
+    values = []
+    excursions = []
+    for name in inputs:
+        node = model.node_num(name)
+        value = float(model.cached_calculate(node))
+        dist = model.get_distribution(node)
+        if name in deltas:
+            delta = deltas[name]
+        elif dist is not None:
+            delta = dist.std()
+        else:
+            delta = rel_delta * abs(value)
+        values.append(value)
+        excursions.append(delta)
+
+    if not inputs:
+        return []
+
+    (up, down,) = _perturbed_eval(model, output, inputs, excursions,
+                                  _fixed_nodes(model, fixed))
+    bars = [TornadoBar(name, values[i], excursions[i],
+                       float(down[i]), float(up[i]))
+            for i, name in enumerate(inputs)]
+    return sorted(bars, key=lambda b: (-b.swing, b.name))
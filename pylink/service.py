@@ -0,0 +1,377 @@
+#!/usr/bin/python
+
+"""Local HTTP/JSON service for evaluating link budgets.
+
+The budgets are built once when the service starts, and each request
+is evaluated against a pooled model under its own scoped overrides,
+so nothing is constructed or copied per request.
+
+POST /evaluate
+  {"budget": "uplink",
+   "nodes": ["link_margin_db", "cn0_db"],
+   "overrides": {"min_elevation_deg": 10}}
+  => {"budget": "uplink", "values": {...}, "elapsed_s": 0.0012}
+
+GET /budgets
+  => {"budgets": ["uplink", ...]}
+
+GET /stats
+  => request counts, latency percentiles, and per-budget cache sizes
+     and hit/miss counts
+
+Identical requests arriving while one is already being evaluated
+share its result rather than being evaluated again.
+
+Example:
+
+  service = pylink.BudgetService({'uplink': make_uplink_model})
+  service.run(port=8080)
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import time
+
+import numpy as np
+
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    }
+
+# Number of recent requests kept for the latency statistics
+_LATENCY_WINDOW = 1000
+
+
+class ServiceError(Exception):
+    """A request that can't be served, with the HTTP status to report.
+    """
+
+    def __init__(self, status, msg):
+        Exception.__init__(self, msg)
+        self.status = status
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return dict((str(k), _jsonable(v)) for k, v in value.items())
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return float(np.percentile(values, q))
+
+
+class BudgetService(object):
+    """Serves node evaluations for a set of named budgets.
+    """
+
+    def __init__(self, budgets, pool_size=4):
+        """Creates the service and builds the budgets.
+
+        budgets -- dict of budget name => DAGModel, or => callable
+                   returning a new DAGModel
+        pool_size -- number of requests evaluated concurrently per
+                     budget
+
+        Callables are invoked <pool_size> times so each pooled slot
+        gets its own model.  A DAGModel given directly is shared by
+        all of its slots, which is safe as requests are evaluated in
+        DAGModel.scoped blocks.
+        """
+        self.pool_size = pool_size
+        self._models = {}
+        for name, budget in budgets.items():
+            if hasattr(budget, 'enum'):
+                models = [budget] * pool_size
+            else:
+                models = [budget() for i in range(pool_size)]
+            self._models[name] = models
+
+        self._pools = None
+        self._executor = None
+        self._inflight = {}
+
+        self._n_requests = 0
+        self._n_evaluated = 0
+        self._n_coalesced = 0
+        self._n_errors = 0
+        self._hits = dict((name, 0) for name in self._models)
+        self._misses = dict((name, 0) for name in self._models)
+        self._latencies = collections.deque(maxlen=_LATENCY_WINDOW)
+
+    def _init_pools(self):
+        # Queues belong to the running event loop, so they're made on
+        # first use rather than in the constructor.
+        if self._pools is None:
+            self._pools = {}
+            for name, models in self._models.items():
+                pool = asyncio.Queue()
+                for model in models:
+                    pool.put_nowait(model)
+                self._pools[name] = pool
+            n = self.pool_size * max(len(self._models), 1)
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=n)
+
+    def budgets(self):
+        """Returns the sorted list of budget names.
+        """
+        return sorted(self._models.keys())
+
+    def _parse(self, request):
+        if not isinstance(request, dict):
+            raise ServiceError(400, "The request must be a JSON object")
+
+        budget = request.get('budget')
+        if not isinstance(budget, str):
+            raise ServiceError(400, "'budget' must be a budget name")
+        if budget not in self._models:
+            raise ServiceError(404, "Unknown budget: %s" % budget)
+
+        nodes = request.get('nodes')
+        if (not isinstance(nodes, list)
+            or not all(isinstance(n, str) for n in nodes)):
+            raise ServiceError(400, "'nodes' must be a list of node names")
+
+        overrides = request.get('overrides') or {}
+        if not isinstance(overrides, dict):
+            raise ServiceError(400, "'overrides' must be an object")
+
+        model = self._models[budget][0]
+        for name in list(nodes) + list(overrides.keys()):
+            if name not in model._nodes:
+                raise ServiceError(400, "Unknown node: %s" % name)
+
+        return (budget, nodes, overrides,)
+
+    def _evaluate_sync(self, model, nodes, overrides):
+        # Returns (values, hits, misses), counting the requested nodes
+        # found in the cache (with the overrides applied) or not
+        overrides = dict((model.node_num(k), v) for k, v in overrides.items())
+        retval = {}
+        hits = 0
+        with model.scoped(overrides):
+            for name in nodes:
+                node = model.node_num(name)
+                if model._cache_get(node)[0]:
+                    hits += 1
+                try:
+                    value = model.cached_calculate(node)
+                except Exception as err:
+                    if not overrides:
+                        raise
+                    # Blame the caller's values rather than the budget
+                    raise ServiceError(
+                        400, "Can't evaluate %s with these overrides: "
+                        "%s: %s" % (name, type(err).__name__, err))
+                retval[name] = _jsonable(value)
+        return (retval, hits, len(nodes) - hits,)
+
+    async def _evaluate_pooled(self, budget, nodes, overrides):
+        # Node names were checked by _parse, so any error from here on
+        # is the budget's own
+        pool = self._pools[budget]
+        model = await pool.get()
+        try:
+            loop = asyncio.get_running_loop()
+            (values, hits, misses,) = await loop.run_in_executor(
+                self._executor, self._evaluate_sync,
+                model, nodes, overrides)
+        finally:
+            pool.put_nowait(model)
+        self._hits[budget] += hits
+        self._misses[budget] += misses
+        return values
+
+    async def evaluate(self, request):
+        """Evaluates a request dict, returning the response dict.
+
+        request -- dict with 'budget', 'nodes' and optional 'overrides'
+
+        Raises a ServiceError for a malformed request.
+        """
+        self._init_pools()
+        start = time.perf_counter()
+        self._n_requests += 1
+        try:
+            (budget, nodes, overrides,) = self._parse(request)
+            key = json.dumps([budget, nodes, overrides], sort_keys=True)
+
+            if key in self._inflight:
+                self._n_coalesced += 1
+                values = await asyncio.shield(self._inflight[key])
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    values = await self._evaluate_pooled(budget,
+                                                         nodes,
+                                                         overrides)
+                    future.set_result(values)
+                except Exception as err:
+                    future.set_exception(err)
+                    raise
+                finally:
+                    del self._inflight[key]
+                    if not future.done():
+                        # Cancelled, which mustn't leave the requests
+                        # coalesced onto this one waiting forever
+                        future.set_exception(ServiceError(
+                            503, "The evaluation was cancelled"))
+                    # Nobody may be waiting on it, which is fine
+                    future.exception()
+                self._n_evaluated += 1
+        except Exception:
+            self._n_errors += 1
+            raise
+
+        elapsed = time.perf_counter() - start
+        self._latencies.append(elapsed)
+        return {'budget': budget, 'values': values, 'elapsed_s': elapsed}
+
+    def stats(self):
+        """Returns a dict of request counts, latencies and cache stats.
+        """
+        latencies = list(self._latencies)
+        budgets = {}
+        for name, models in self._models.items():
+            unique = dict((id(m), m) for m in models).values()
+            budgets[name] = {
+                'models': len(unique),
+                'cached_nodes': sum(len(m._cache) for m in unique),
+                'cache_hits': self._hits[name],
+                'cache_misses': self._misses[name],
+                'nodes': len(models[0].nodes()),
+                }
+            if self._pools is not None:
+                budgets[name]['idle'] = self._pools[name].qsize()
+
+        return {
+            'requests': self._n_requests,
+            'evaluated': self._n_evaluated,
+            'coalesced': self._n_coalesced,
+            'errors': self._n_errors,
+            'inflight': len(self._inflight),
+            'latency_s': {
+                'window': len(latencies),
+                'mean': (float(np.mean(latencies)) if latencies else None),
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'p99': _percentile(latencies, 99),
+                'max': (max(latencies) if latencies else None),
+                },
+            'budgets': budgets,
+            }
+
+    async def _route(self, method, path, body):
+        if path == '/evaluate':
+            if method != 'POST':
+                raise ServiceError(405, "Use POST for /evaluate")
+            try:
+                request = json.loads(body.decode('utf-8') or 'null')
+            except ValueError as err:
+                raise ServiceError(400, "Invalid JSON: %s" % err)
+            return await self.evaluate(request)
+
+        if method != 'GET':
+            raise ServiceError(405, "Use GET for %s" % path)
+        if path == '/stats':
+            return self.stats()
+        if path == '/budgets':
+            return {'budgets': self.budgets()}
+        raise ServiceError(404, "No such endpoint: %s" % path)
+
+    async def handle(self, reader, writer):
+        """asyncio stream handler for a single HTTP connection.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+
+                (method, path, version,) = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    (k, v,) = line.decode('latin-1').split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+
+                n = int(headers.get('content-length', 0))
+                body = await reader.readexactly(n) if n else b''
+
+                try:
+                    status = 200
+                    response = await self._route(method,
+                                                 path.split('?')[0],
+                                                 body)
+                except ServiceError as err:
+                    status = err.status
+                    response = {'error': str(err)}
+                except Exception as err:
+                    status = 500
+                    response = {'error': '%s: %s' % (type(err).__name__,
+                                                     err)}
+
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection') != 'close')
+                payload = json.dumps(response).encode('utf-8')
+                head = ['HTTP/1.1 %d %s' % (status, _REASONS[status]),
+                        'Content-Type: application/json',
+                        'Content-Length: %d' % len(payload),
+                        'Connection: %s' % ('keep-alive' if keep_alive
+                                            else 'close'),
+                        '', '']
+                writer.write('\r\n'.join(head).encode('latin-1') + payload)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError,
+                ConnectionError):
+            # Malformed or truncated request, just hang up
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Starts listening, returning the asyncio Server.
+        """
+        self._init_pools()
+        return await asyncio.start_server(self.handle, host, port)
+
+    def run(self, host='127.0.0.1', port=8080):
+        """Serves requests until interrupted.
+        """
+        async def _serve():
+            server = await self.start(host, port)
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(_serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+"""Persistent DAGModel snapshots.
+
+A snapshot is a directory:
+
+  model.pickle  -- the model state (values, overrides, metadata,
+                   calculators, dependency graph and optionally the
+                   cache), pickled
+  arrays/       -- every numeric numpy array found in that state,
+                   stored as a separate .npy file
+
+Keeping the arrays out of the pickle lets them be memory-mapped on
+load, so large gain patterns cost nothing until they are touched and
+are shared between processes by the page cache.
+
+Calculators are pickled by reference, which means they have to be
+module-level functions or methods of picklable objects (all of the
+built-in tributaries qualify).  Lambdas and closures cannot be saved.
+"""
+
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+from pylink.model import DAGModel
+
+
+FORMAT_VERSION = 1
+
+_STATE_FNAME = 'model.pickle'
+_ARRAY_DNAME = 'arrays'
+
+
+class _SnapshotPickler(pickle.Pickler):
+
+    def __init__(self, fd, array_dir):
+        pickle.Pickler.__init__(self, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        self.array_dir = array_dir
+        self.arrays = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject:
+            return None
+
+        # The same array is frequently referenced from several places
+        # (eg an antenna object and its tribute), so store it once.
+        # The array itself is kept in the dict so its id stays unique.
+        key = id(obj)
+        if key not in self.arrays:
+            fname = '%06d.npy' % len(self.arrays)
+            np.save(os.path.join(self.array_dir, fname), np.asarray(obj))
+            self.arrays[key] = (fname, obj)
+        return ('ndarray', self.arrays[key][0])
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+
+    def __init__(self, fd, array_dir, mmap):
+        pickle.Unpickler.__init__(self, fd)
+        self.array_dir = array_dir
+        self.mmap_mode = 'r' if mmap else None
+
+    def persistent_load(self, pid):
+        (kind, fname,) = pid
+        if kind != 'ndarray':
+            raise pickle.UnpicklingError("Unknown object in snapshot: %s"
+                                         % kind)
+        return np.load(os.path.join(self.array_dir, fname),
+                       mmap_mode=self.mmap_mode)
+
+
+def _find_unpicklable(model):
+    for node, calc in model._calc.items():
+        try:
+            pickle.dumps(calc)
+        except Exception:
+            return model.node_name(node)
+    return None
+
+
+def save_model(model, path, include_cache=False):
+    """Saves a DAGModel snapshot to a directory.
+
+    model -- the DAGModel to save
+    path -- directory in which to store the snapshot
+    include_cache -- also store the currently computed values
+
+    Storing the cache means a model loaded from the snapshot starts
+    warm: nothing that was computed before saving is recomputed.
+    """
+    state = model._export_state(include_cache=include_cache)
+    state['format'] = FORMAT_VERSION
+
+    array_dir = os.path.join(path, _ARRAY_DNAME)
+    if os.path.exists(array_dir):
+        shutil.rmtree(array_dir)
+    os.makedirs(array_dir)
+
+    state_path = os.path.join(path, _STATE_FNAME)
+    try:
+        with open(state_path, 'wb') as fd:
+            _SnapshotPickler(fd, array_dir).dump(state)
+    except (pickle.PicklingError, AttributeError, TypeError) as err:
+        name = _find_unpicklable(model)
+        if name is None:
+            raise
+        msg = ("The calculator for %s can't be saved.  Calculators "
+               + "need to be module-level functions or methods of "
+               + "picklable objects: %s") % (name, err)
+        raise pickle.PicklingError(msg)
+
+
+def load_model(path, mmap=True):
+    """Loads a DAGModel snapshot saved by save_model.
+
+    path -- snapshot directory
+    mmap -- memory-map the numpy arrays (read-only) instead of
+            reading them into memory
+    """
+    array_dir = os.path.join(path, _ARRAY_DNAME)
+    with open(os.path.join(path, _STATE_FNAME), 'rb') as fd:
+        state = _SnapshotUnpickler(fd, array_dir, mmap).load()
+
+    version = state.pop('format', None)
+    if version != FORMAT_VERSION:
+        raise ValueError("Unsupported snapshot format: %s" % version)
+
+    return DAGModel._from_state(state)
@@ -0,0 +1,166 @@
+#!/usr/bin/python
+
+"""Lazy, chunked parameter sweeps.
+
+A Sweep describes a grid of input values, either the Cartesian product
+of one array per input or equal-length arrays zipped together, without
+ever materializing it.  Iterating over it yields SweepChunks of at
+most <chunk_size> points at a time, so a full-factorial design of any
+size runs in bounded memory and can be abandoned at any point:
+
+  sweep = m.sweep({'min_elevation_deg': np.linspace(0, 90, 91),
+                   'rain_loss_db': np.linspace(0, 10, 101),
+                   'tx_power_at_pa_dbw': np.linspace(0, 10, 21)},
+                  ['link_margin_db'], chunk_size=4096)
+  for chunk in sweep:
+      save(chunk.start, chunk.inputs, chunk.outputs)
+
+Each chunk records where it stopped, so an interrupted sweep resumes
+with m.sweep(..., start=chunk.stop).
+"""
+
+import numpy as np
+
+from pylink.uncertainty import DEFAULT_FIXED
+from pylink.uncertainty import _vectorized_eval
+
+
+def _scalar(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _node(model, key):
+    if isinstance(key, str):
+        return model.node_num(key)
+    return key
+
+
+class SweepChunk(object):
+    """The points [start, stop) of a sweep along with their outputs.
+
+    <inputs> and <outputs> map the names (or node numbers) the sweep
+    was given to arrays with one entry per point.
+    """
+
+    def __init__(self, start, stop, inputs, outputs):
+        self.start = start
+        self.stop = stop
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def __len__(self):
+        return self.stop - self.start
+
+
+class Sweep(object):
+    """A lazily evaluated grid of input values for a model.
+    """
+
+    def __init__(self, model, inputs, outputs, mode='product',
+                 chunk_size=1024, start=0, vectorized=False, fixed=None):
+        """Creates a new sweep.
+
+        model -- DAGModel
+        inputs -- dict of node name (or number) => 1-D array of values
+        outputs -- list of node names (or numbers) to evaluate
+        mode -- 'product' for every combination of the inputs (the
+                last input varying fastest, as for itertools.product)
+                or 'zip' for equal-length inputs taken together
+        chunk_size -- points evaluated (and held in memory) at a time
+        start -- index of the first point, to resume an earlier sweep
+        vectorized -- evaluate each chunk in one numpy pass rather
+                      than point by point, see monte_carlo for what
+                      that requires of the calculators
+        fixed -- with <vectorized>, the node names held at their
+                 current value, defaults to DEFAULT_FIXED
+        """
+        if mode not in ('product', 'zip'):
+            raise ValueError("Unknown sweep mode: %s" % mode)
+        if chunk_size < 1:
+            raise ValueError("Chunks need at least one point")
+
+        self.model = model
+        self.keys = list(inputs.keys())
+        self.values = [np.asarray(inputs[k]).reshape(-1) for k in self.keys]
+        self.outputs = list(outputs)
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.start = start
+        self.vectorized = vectorized
+        self.fixed = DEFAULT_FIXED if fixed is None else fixed
+
+        self._inputs = [_node(model, k) for k in self.keys]
+        self._outputs = [_node(model, k) for k in self.outputs]
+
+        self.shape = tuple(len(v) for v in self.values)
+        if 'zip' == mode:
+            if len(set(self.shape)) > 1:
+                raise ValueError("Zipped sweep inputs differ in length: %s"
+                                 % (self.shape,))
+            self.n = self.shape[0] if self.shape else 0
+        else:
+            self.n = int(np.prod(self.shape)) if self.shape else 0
+
+    def __len__(self):
+        return max(self.n - self.start, 0)
+
+    def points(self, start, stop):
+        """Returns a dict of input => array of values for [start, stop).
+        """
+        idx = np.arange(start, min(stop, self.n))
+        if 'zip' == self.mode:
+            columns = [v[idx] for v in self.values]
+        else:
+            multi = np.unravel_index(idx, self.shape)
+            columns = [v[i] for v, i in zip(self.values, multi)]
+        return dict(zip(self.keys, columns))
+
+    def _evaluate_points(self, columns, n):
+        m = self.model
+        if self.vectorized:
+            fixed = [_node(m, k) for k in self.fixed
+                     if not isinstance(k, str) or k in m._nodes]
+            arrays = dict((node, columns[k])
+                          for node, k in zip(self._inputs, self.keys))
+            values = _vectorized_eval(m, arrays, self._outputs, fixed)
+            return [np.array(values[node]) for node in self._outputs]
+
+        results = [[] for node in self._outputs]
+        for i in range(n):
+            overrides = dict((node, _scalar(columns[k][i]))
+                             for node, k in zip(self._inputs, self.keys))
+            with m.scoped(overrides):
+                for j, node in enumerate(self._outputs):
+                    results[j].append(m.cached_calculate(node))
+        return [np.asarray(r) for r in results]
+
+    def evaluate(self, start, stop):
+        """Evaluates the points [start, stop), returning a SweepChunk.
+        """
+        stop = min(stop, self.n)
+        columns = self.points(start, stop)
+        values = self._evaluate_points(columns, stop - start)
+        return SweepChunk(start, stop, columns,
+                          dict(zip(self.outputs, values)))
+
+    def __iter__(self):
+        for start in range(self.start, self.n, self.chunk_size):
+            yield self.evaluate(start, start + self.chunk_size)
+
+    def collect(self):
+        """Evaluates the rest of the sweep, returning one SweepChunk.
+
+        Only use this when the whole result fits in memory.
+        """
+        chunks = list(self)
+        if not chunks:
+            return SweepChunk(self.start, self.start,
+                              dict((k, np.empty(0)) for k in self.keys),
+                              dict((k, np.empty(0)) for k in self.outputs))
+        inputs = dict((k, np.concatenate([c.inputs[k] for c in chunks]))
+                      for k in self.keys)
+        outputs = dict((k, np.concatenate([c.outputs[k] for c in chunks]))
+                       for k in self.outputs)
+        return SweepChunk(chunks[0].start, chunks[-1].stop, inputs, outputs)
@@ -1,14 +1,10 @@
 #!/usr/bin/python
 
-import scipy
-import scipy.interpolate
-import scipy.signal
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
 import math
 
 from ..model import DAGModel
+from .. import render
 from .. import utils
 
 
@@ -17,11 +13,53 @@ def _floor(v, n):
 
 
 def _find_nearest_index(array, value):
-    value = (360 + value) % 360
-    return np.abs(array - value).argmin()
+    # value may be an array of angles, giving an array of indices
+    value = (360 + np.asarray(value)) % 360
+    idx = np.abs(array - value[..., np.newaxis]).argmin(axis=-1)
+    if 0 == idx.ndim:
+        return int(idx)
+    return idx
+
+
+def _pattern_at(pattern, idx):
+    # Patterns may carry leading (eg per-frequency) axes, with the
+    # angle always last.  An array of indices pairs up with them.
+    pattern = np.asarray(pattern)
+    if 1 == pattern.ndim:
+        # Indexed directly so that a single angle gives a scalar
+        # rather than a 0-d array
+        return pattern[idx]
+    if 0 == np.ndim(idx):
+        return pattern[..., idx]
+    idx = np.asarray(idx)[..., np.newaxis]
+    return np.take_along_axis(pattern, idx, axis=-1)[..., 0]
+
+
+def _interpolate_rows(freq_hz, table_hz, table):
+    """Linearly interpolates a table of patterns in frequency.
+
+    freq_hz -- frequency, or array of frequencies
+    table_hz -- increasing frequencies of the table rows
+    table -- 2-D array with one 360-point pattern per row
+
+    Frequencies outside of the table get the nearest row.  Returns a
+    pattern, or one pattern per frequency.
+    """
+    table = np.asarray(table)
+    if 1 == len(table_hz):
+        return np.broadcast_to(table[0],
+                               np.shape(freq_hz) + table.shape[1:])
+    f = np.asarray(freq_hz, dtype=float)
+    hi = np.clip(np.searchsorted(table_hz, f), 1, len(table_hz)-1)
+    lo = hi - 1
+    w = np.clip((f - table_hz[lo]) / (table_hz[hi] - table_hz[lo]), 0, 1)
+    w = w[..., np.newaxis]
+    return table[lo] * (1 - w) + table[hi] * w
 
 
 def _average_gain_dbi(pattern, angles):
+    if np.ndim(pattern) > 1:
+        return np.mean(pattern, axis=-1)
     return sum(pattern) / float(len(pattern))
 
 
@@ -31,16 +69,145 @@ def _average_nadir_gain_dbi(pattern, angles):
     For simplicity, this function assumes some hard-coded values of
     65-degrees off of boresight.  That translates to 0->65 and (360-65)->360
     """
-    s = 0
-    n = 0
     offset = 65
-    for i in range(len(pattern)):
-        angle = angles[i]
-        gain = pattern[i]
-        if (0 <= angle <= offset) or ((360-offset) <= angle <= 360):
-            s += gain
-            n += 1
-    return s / n
+    angles = np.asarray(angles)
+    mask = (((0 <= angles) & (angles <= offset))
+            | (((360-offset) <= angles) & (angles <= 360)))
+    return np.mean(np.asarray(pattern)[..., mask], axis=-1)
+
+
+def _lst_to_rad(lst):
+    return np.array([math.radians(v) for v in lst])
+
+
+def _wrap(lst):
+    return np.array(list(lst) + [lst[0]])
+
+
+# matplotlib and scipy are slow to import, so they are only loaded when
+# a pattern is actually drawn or interpolated.
+
+def _render_peak_gain(fname, title, pattern, pattern_angles, peak_gain):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure()
+    ax = fig.add_subplot(1, 1, 1, projection='polar')
+
+    theta = _lst_to_rad(pattern_angles[:])
+    pattern = np.array(pattern)
+
+    # offset the pattern to get around the negative-radius issue
+    if peak_gain < 0:
+        offset = -2 * peak_gain
+        pattern += offset
+
+    ax.plot(theta,
+            pattern,
+            color='r',
+            linewidth=3,
+            label='Peak Gain Used Everywhere')
+    fig.canvas.draw()
+    if peak_gain < 0:
+        ax.set_yticklabels([t - offset for t in ax.get_yticks()])
+
+    fig.suptitle(title)
+    plt.legend(loc=4)
+
+    fig.savefig(fname, transparent=True)
+    plt.close(fig)
+
+
+def _render_interpolated(fname,
+                         title,
+                         include_raw,
+                         ylim,
+                         pattern,
+                         pattern_angles,
+                         interpolated,
+                         interpolated_angles):
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+
+    # Wrap around one point to close the loop and convert to radians
+    interp = _wrap(interpolated)
+    raw = np.copy(pattern)
+
+    low = min(min(interp), min(raw))
+    hi = max(min(interp), max(raw))
+
+    n_steps = 5
+    min_step_size = 1
+    step_size = max(int((hi - low) / n_steps), min_step_size)
+
+    low_r = _floor(low, step_size)
+    hi_r = _floor(hi, step_size)
+
+    val_start = low_r if low_r < low else low_r - step_size
+    val_stop = hi_r + step_size
+
+    offset = 0 - val_start
+
+    # to debug uncomment these lines
+    # print 'low:         %s' % low
+    # print 'hi:          %s' % hi
+    # print 'low_r:       %s' % low_r
+    # print 'hi_r:        %s' % hi_r
+    # print 'val_start:   %s' % val_start
+    # print 'val_stop:    %s' % val_stop
+    # print 'step_size:   %s' % step_size
+    # print 'offset:      %s' % offset
+    # print
+
+    interp += offset
+    raw += offset
+
+    fig = plt.figure()
+    ax = fig.add_subplot(1, 1, 1, projection='polar')
+
+    if ylim:
+        locator = matplotlib.ticker.MaxNLocator(nbins=8)
+        ax.yaxis.set_major_locator(locator)            
+        ax.set_ylim([ylim[0]+offset, ylim[1]+offset])
+
+    interp_angles = _wrap(_lst_to_rad(interpolated_angles))
+    raw_angles = _lst_to_rad(pattern_angles)
+
+    include_raw = (include_raw
+                   and (len(pattern) != len(interpolated)))
+
+    if len(pattern) == len(interpolated):
+        label = 'Antenna Pattern'
+        main_angles = raw_angles
+        main_pattern = raw
+    else:
+        label = 'Interpolated Pattern'
+        main_angles = interp_angles
+        main_pattern = interp
+
+
+    ax.set_theta_zero_location("N")
+
+    ax.plot(main_angles,
+            main_pattern,
+            color='r',
+            linewidth=3,
+            label=label)
+
+    if include_raw:
+        ax.plot(raw_angles,
+                raw, 'x',
+                color='b',
+                linewidth=1,
+                label='Observed')
+    fig.canvas.draw()
+
+    ax.set_yticklabels([t - offset for t in ax.get_yticks()])
+
+    fig.suptitle(title)
+    plt.legend(loc=4)
+
+    fig.savefig(fname, transparent=True)
+    plt.close(fig)
 
 
 class Antenna(object):
@@ -59,6 +226,7 @@ class Antenna(object):
                  rf_chain=[],
                  pointing_loss_db=0,
                  is_rx=True,
+                 gain_table=None,
                  **meta):
         """Create a new antenna tributary.
 
@@ -69,14 +237,38 @@ class Antenna(object):
         rf_chain -- list of Element objects for the RF hain on the board
         pointing_loss_db -- for now, just the number of dB of pointing loss
         is_rx -- is it for receive or transmit
+        gain_table -- optional (frequencies_hz, patterns) giving the
+                      pattern (or just the peak gain) at each of a list
+                      of increasing frequencies
         kwargs -- any metadata to assign to the antenna itself
 
         If there are 360 points in the pattern, it will be
         interpolated for you automatically.
+
+        With a gain_table, the gain_pattern node is interpolated from
+        the table at center_freq_hz (which may be an array of
+        frequencies, giving one pattern per frequency), and <pattern>
+        or <gain> only determine what plot_pattern draws.  If neither
+        is given, the first entry of the table is drawn.
         """
 
         self.meta = meta
 
+        if gain_table is not None:
+            (table_hz, table,) = gain_table
+            table_hz = np.asarray(table_hz, dtype=float)
+            if np.any(np.diff(table_hz) <= 0):
+                raise ValueError("gain_table frequencies must increase")
+            table = [self._table_row(row) for row in table]
+            if len(table) != len(table_hz):
+                raise ValueError("gain_table needs one pattern per frequency")
+            self.gain_table_hz = table_hz
+            self.gain_table = np.array(table)
+            if pattern is None and not np.isscalar(gain_table[1][0]):
+                pattern = gain_table[1][0]
+            elif pattern is None:
+                gain = gain_table[1][0]
+
         self.peak_gain_only = (pattern is None)
         if pattern is None:
             self.peak_gain_only = True
@@ -101,6 +293,11 @@ class Antenna(object):
 
         self.is_rx = is_rx
 
+        if gain_table is not None:
+            gain_pattern = self._gain_pattern
+        else:
+            gain_pattern = self.interpolated
+
         self.tribute = {
             # calculators
             self._mangle('peak_gain_dbi'): self._peak_gain_dbi,
@@ -114,7 +311,7 @@ class Antenna(object):
             self._name('polarization'): polarization,
             self._name('raw_gain_pattern'): pattern,
             self._name('raw_gain_pattern_angles'): self.pattern_angles,
-            self._name('gain_pattern'): self.interpolated,
+            self._name('gain_pattern'): gain_pattern,
             self._name('gain_pattern_angles'): self.interpolated_angles,
             self._name('obj'): self,
             self._name('tracking_target'): not not tracking,
@@ -122,149 +319,108 @@ class Antenna(object):
             self._name('pointing_loss_db'): pointing_loss_db,
             }
 
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        pattern_deps = [self._name('gain_pattern'),
+                        self._name('gain_pattern_angles')]
+        self.dependencies = {
+            self._mangle('peak_gain_dbi'): [self._name('gain_pattern')],
+            self._mangle('gain_dbi'): [self._name('tracking_target'),
+                                       self._mangle('boresight_gain_dbi'),
+                                       self._mangle('angle_deg')] + pattern_deps,
+            self._mangle('angle_deg'): [self._name('tracking_target'),
+                                        'is_downlink',
+                                        'min_elevation_deg',
+                                        'satellite_antenna_angle_deg'],
+            self._mangle('boresight_gain_dbi'): pattern_deps,
+            self._mangle('average_gain_dbi'): pattern_deps,
+            self._mangle('average_nadir_gain_dbi'): pattern_deps,
+            }
+
+        if gain_table is not None:
+            self.tribute[self._name('gain_table_hz')] = self.gain_table_hz
+            self.tribute[self._name('gain_table')] = self.gain_table
+            self.dependencies[self._name('gain_pattern')] = [
+                'center_freq_hz',
+                self._name('gain_table_hz'),
+                self._name('gain_table')]
+
     def _name(self, s):
         if self.is_rx:
             return 'rx_antenna_'+s
         else:
             return 'tx_antenna_'+s
 
-    def _lst_to_rad(self, lst):
-        return np.array([math.radians(v) for v in lst])
-
-    def _wrap(self, lst):
-        return np.array(list(lst) + [lst[0]])
-
-    def _plot_peak_gain(self, fname, title):
-        fig = plt.figure()
-        ax = fig.add_subplot(1, 1, 1, projection='polar')
-
-        theta = self._lst_to_rad(self.pattern_angles[:])
-        pattern = np.array(self.pattern)
-
-        # offset the pattern to get around the negative-radius issue
-        if self.peak_gain < 0:
-            offset = -2 * self.peak_gain
-            pattern += offset
-
-        ax.plot(theta,
-                pattern,
-                color='r',
-                linewidth=3,
-                label='Peak Gain Used Everywhere')
-        fig.canvas.draw()
-        if self.peak_gain < 0:
-            ax.set_yticklabels([t - offset for t in ax.get_yticks()])
-
-        fig.suptitle(title)
-        plt.legend(loc=4)
-
-        fig.savefig(fname, transparent=True)
-
-    def _plot_interpolated(self, fname, title, include_raw, ylim):
-        # Wrap around one point to close the loop and convert to radians
-        interp = self._wrap(self.interpolated)
-        raw = np.copy(self.pattern)
+    def pattern_render_job(self,
+                           fname,
+                           include_raw=True,
+                           title=None,
+                           ylim=None):
+        """Returns a RenderJob that plots the pattern to a PNG file.
 
-        low = min(min(interp), min(raw))
-        hi = max(min(interp), max(raw))
-
-        n_steps = 5
-        min_step_size = 1
-        step_size = max(int((hi - low) / n_steps), min_step_size)
-
-        low_r = _floor(low, step_size)
-        hi_r = _floor(hi, step_size)
-
-        val_start = low_r if low_r < low else low_r - step_size
-        val_stop = hi_r + step_size
-
-        offset = 0 - val_start
-
-        # to debug uncomment these lines
-        # print 'low:         %s' % low
-        # print 'hi:          %s' % hi
-        # print 'low_r:       %s' % low_r
-        # print 'hi_r:        %s' % hi_r
-        # print 'val_start:   %s' % val_start
-        # print 'val_stop:    %s' % val_stop
-        # print 'step_size:   %s' % step_size
-        # print 'offset:      %s' % offset
-        # print
-
-        interp += offset
-        raw += offset
-
-        fig = plt.figure()
-        ax = fig.add_subplot(1, 1, 1, projection='polar')
-
-        if ylim:
-            locator = matplotlib.ticker.MaxNLocator(nbins=8)
-            ax.yaxis.set_major_locator(locator)            
-            ax.set_ylim([ylim[0]+offset, ylim[1]+offset])
-
-        interp_angles = self._wrap(self._lst_to_rad(self.interpolated_angles))
-        raw_angles = self._lst_to_rad(self.pattern_angles)
+        The arguments are the same as for plot_pattern.  The job only
+        holds copies of the pattern data, so it may be rendered in
+        another process.
+        """
 
-        include_raw = (include_raw
-                       and (len(self.pattern) != len(self.interpolated)))
+        prefix = 'RX' if self.is_rx else 'TX'
+        if not title:
+            title = '%s Antenna Gain Pattern' % prefix
 
-        if len(self.pattern) == len(self.interpolated):
-            label = 'Antenna Pattern'
-            main_angles = raw_angles
-            main_pattern = raw
+        if self.peak_gain_only:
+            return render.RenderJob(_render_peak_gain,
+                                    fname,
+                                    title=title,
+                                    pattern=np.array(self.pattern),
+                                    pattern_angles=self.pattern_angles,
+                                    peak_gain=self.peak_gain)
         else:
-            label = 'Interpolated Pattern'
-            main_angles = interp_angles
-            main_pattern = interp
-
-
-        ax.set_theta_zero_location("N")
-
-        ax.plot(main_angles,
-                main_pattern,
-                color='r',
-                linewidth=3,
-                label=label)
-
-        if include_raw:
-            ax.plot(raw_angles,
-                    raw, 'x',
-                    color='b',
-                    linewidth=1,
-                    label='Observed')
-        fig.canvas.draw()
-
-        ax.set_yticklabels([t - offset for t in ax.get_yticks()])
-
-        fig.suptitle(title)
-        plt.legend(loc=4)
-
-        fig.savefig(fname, transparent=True)
-
-    def plot_pattern(self, fname, include_raw=True, title=None, ylim=None):
+            return render.RenderJob(_render_interpolated,
+                                    fname,
+                                    title=title,
+                                    include_raw=include_raw,
+                                    ylim=ylim,
+                                    pattern=np.array(self.pattern),
+                                    pattern_angles=self.pattern_angles,
+                                    interpolated=np.array(self.interpolated),
+                                    interpolated_angles=self.interpolated_angles)
+
+    def plot_pattern(self,
+                     fname,
+                     include_raw=True,
+                     title=None,
+                     ylim=None,
+                     cache=None):
         """Plots the pattern to a PNG file.
 
         fname -- where to save it
         include_raw -- If the pattern is interpolated, include the raw points?
         title -- Title of the image
         ylim -- [min, max] as desired
+        cache -- optional FigureCache, skips the drawing if unchanged
 
         If, for example, your real pattern varies by only one dB, its
         plot can be correct, but look a little weird as you see it
         vary wildly from one side to the other whereas it is quite
         stable in reality.  Thtat's why the <ylim> is an option.
         """
-
-        prefix = 'RX' if self.is_rx else 'TX'
-        if not title:
-            title = '%s Antenna Gain Pattern' % prefix
-
-        if self.peak_gain_only:
-            return self._plot_peak_gain(fname, title)
-        else:
-            return self._plot_interpolated(fname, title, include_raw, ylim)
+        job = self.pattern_render_job(fname,
+                                      include_raw=include_raw,
+                                      title=title,
+                                      ylim=ylim)
+        return render.render_all([job], cache=cache)[0]
+
+    def _table_row(self, row):
+        # A scalar is an omni pattern at that gain
+        if np.isscalar(row):
+            return np.zeros(360) + row
+        row = np.asarray(row, dtype=float)
+        if len(row) != 360:
+            row = self._interpolate_pattern(row)
+        return row
 
     def _linear_interpolate(self, src, factor):
+        import scipy.interpolate
+
         src_x = np.arange(0, len(src), 1)
         tck = scipy.interpolate.splrep(src_x, src, s=0)
         dst_x = np.arange(0, len(src), 1.0/factor)
@@ -291,8 +447,13 @@ class Antenna(object):
     def _call(self, model, name):
         return getattr(model, self._mangle(name))
 
+    def _gain_pattern(self, model):
+        return _interpolate_rows(model.center_freq_hz,
+                                 self._call(model, 'gain_table_hz'),
+                                 self._call(model, 'gain_table'))
+
     def _peak_gain_dbi(self, model):
-        return max(self._call(model, 'gain_pattern'))
+        return np.max(self._call(model, 'gain_pattern'), axis=-1)
 
     def _gain_dbi(self, model):
         if self._call(model, 'tracking_target'):
@@ -302,7 +463,7 @@ class Antenna(object):
             angles = self._call(model, 'gain_pattern_angles')
             idx = _find_nearest_index(angles, angle)
             pattern = self._call(model, 'gain_pattern')
-            return pattern[idx]
+            return _pattern_at(pattern, idx)
 
     def _angle_deg(self, model):
         if self._call(model, 'tracking_target'):
@@ -327,7 +488,7 @@ class Antenna(object):
         pattern = self._call(model, 'gain_pattern')
         angles = self._call(model, 'gain_pattern_angles')
         idx = _find_nearest_index(angles, 0)
-        return pattern[idx]
+        return _pattern_at(pattern, idx)
 
     def _average_gain_dbi(self, model):
         pattern = self._call(model, 'gain_pattern')
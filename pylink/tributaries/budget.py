@@ -100,28 +100,6 @@ def _peak_pfd_at_geo_dbw_per_m2_per_hz(model):
                                       1)
 
 
-def _gso_victim_epfd(model):
-    # http://famille.philippe.gerard.pagesperso-orange.fr/EPFD%20concept/Epfd%20conceptVfinale.htm
-    # https://www.law.cornell.edu/cfr/text/47/25.208
-    #
-    # EPFD is, essentially, the PFD that would be required at the
-    # victim's peak-gain angle to produce the same received power as
-    # the sum of transmitters.
-    #
-    # In linear units:
-    # epfd = sum(epfd_i) for all contributors
-    #
-    # We assume a single contributor, so:
-    # Pr = pfd * Ar = epfd * Ar_max
-    # epfd = pfd * Ar / Ar_max
-    #
-    # In log units:
-    # epfd = pfd + Ar - Ar_max
-    #
-    # Alternatively, we can apply a correction term to the pfd
-    # epfd_delta = Ar - Ar_max
-    pass
-
 def _rx_power_dbw(model):
     return (model.tx_eirp_dbw
             - model.total_channel_loss_db
@@ -222,3 +200,57 @@ class LinkBudget(object):
             'rx_antenna_noise_temp_k': rx_antenna_noise_temp_k,
             'target_margin_db': target_margin_db,
             }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'pf_dbw_per_m2': ['slant_range_km',
+                              'tx_eirp_dbw',
+                              'atmospheric_loss_db',
+                              'ionospheric_loss_db',
+                              'rain_loss_db'],
+            'peak_pfd_at_geo_dbw_per_m2_per_hz': ['peak_pf_at_geo_dbw_per_m2',
+                                                  'allocation_hz'],
+            'rx_power_dbw': ['tx_eirp_dbw',
+                             'total_channel_loss_db',
+                             'polarization_mismatch_loss_db',
+                             'rx_antenna_pointing_loss_db',
+                             'rx_antenna_gain_dbi'],
+            'rx_antenna_effective_area_dbm2': ['rx_antenna_gain_dbi',
+                                               'wavelength_m'],
+            'rx_g_over_t_db': ['rx_antenna_gain_dbi', 'rx_noise_temp_dbk'],
+            'rx_n0_dbw_per_hz': ['boltzmann_J_per_K_db', 'rx_noise_temp_dbk'],
+            'cn0_db': ['rx_power_dbw', 'rx_n0_dbw_per_hz'],
+            'excess_noise_bandwidth_loss_db': ['required_rx_bw_dbhz',
+                                               'rx_noise_bw_hz'],
+            'pfd_dbw_per_m2_per_hz': ['pf_dbw_per_m2', 'required_rx_bw_hz'],
+            'rx_eb': ['rx_power_dbw', 'bitrate_dbhz'],
+            'rx_ebn0_db': ['rx_eb', 'rx_n0_dbw_per_hz'],
+            'link_margin_db': ['rx_ebn0_db', 'required_ebn0_db'],
+            'peak_pf_at_geo_dbw_per_m2': ['is_downlink',
+                                          'range_to_geo_km',
+                                          'geo_altitude_km',
+                                          'peak_tx_eirp_dbw'],
+            'peak_pf_dbw_per_m2': ['periapsis_altitude_km',
+                                   'peak_tx_eirp_dbw'],
+            'canonical_pf_dbw_per_m2': ['slant_range_km', 'peak_tx_eirp_dbw'],
+            'range_to_geo_km': ['geo_altitude_km', 'apoapsis_altitude_km'],
+            'rx_rf_chain': ['rx_antenna_rf_chain',
+                            'rx_interconnect_rf_chain',
+                            'receiver_rf_chain'],
+            'tx_inline_losses_db': ['tx_antenna_rf_chain',
+                                    'tx_interconnect_rf_chain',
+                                    'transmitter_rf_chain'],
+            'tx_power_at_antenna_dbw': ['tx_power_at_pa_dbw',
+                                        'tx_inline_losses_db'],
+            'tx_eirp_dbw': ['tx_power_at_antenna_dbw',
+                            'tx_antenna_gain_dbi',
+                            'tx_antenna_pointing_loss_db'],
+            'peak_tx_eirp_dbw': ['tx_power_at_antenna_dbw',
+                                 'tx_antenna_peak_gain_dbi'],
+            'required_ebn0_db': ['required_demod_ebn0_db',
+                                 'additional_rx_losses_db'],
+            'additional_rx_losses_db': ['implementation_loss_db',
+                                        'excess_noise_bandwidth_loss_db'],
+            'peak_pfd_dbw_per_m2_per_hz': ['peak_pf_dbw_per_m2',
+                                           'allocation_hz'],
+            }
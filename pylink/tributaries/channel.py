@@ -2,6 +2,8 @@
 
 import math
 
+import numpy as np
+
 from .. import utils
 
 
@@ -64,7 +66,14 @@ class Channel(object):
                  allocation_hz=10e6,
                  speed_of_light_m_per_s=299792458.00,
                  polarization_mismatch_loss_db=3.0,
-                 gs_pfd_limits=None):
+                 gs_pfd_limits=None,
+                 frequency_grid_mhz=None):
+        """Create a new channel tributary.
+
+        frequency_grid_mhz -- optional list of candidate center
+                              frequencies, evaluated all at once with
+                              pylink.frequency_sweep
+        """
 
         # FIXME: Consider calculating polarization mismatch loss from
         # angle, including axial ratio, ...
@@ -93,4 +102,28 @@ class Channel(object):
             'polarization_mismatch_loss_db': polarization_mismatch_loss_db,
             'allocation_hz': allocation_hz,
             'gs_pfd_limits': gs_pfd_limits,
+            'frequency_grid_hz': (None if frequency_grid_mhz is None
+                                  else np.asarray(frequency_grid_mhz,
+                                                  dtype=float) * 1e6),
+            }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'unity_gain_propagation_loss_db': ['slant_range_km',
+                                               'wavelength_m'],
+            'total_channel_loss_db': ['unity_gain_propagation_loss_db',
+                                      'atmospheric_loss_db',
+                                      'ionospheric_loss_db',
+                                      'rain_loss_db',
+                                      'multipath_fading_db'],
+            'wavelength_m': ['speed_of_light_m_per_s', 'center_freq_hz'],
+            'bitrate_dbhz': ['bitrate_hz'],
+            'required_tx_bw_hz': ['bitrate_hz',
+                                  'tx_spectral_efficiency_bps_per_hz'],
+            'required_rx_bw_hz': ['bitrate_hz',
+                                  'rx_spectral_efficiency_bps_per_hz'],
+            'required_tx_bw_dbhz': ['required_tx_bw_hz'],
+            'required_rx_bw_dbhz': ['required_rx_bw_hz'],
+            'allocation_start_hz': ['center_freq_hz', 'allocation_hz'],
+            'allocation_end_hz': ['center_freq_hz', 'allocation_hz'],
             }
@@ -1,6 +1,6 @@
 #!/usr/bin/python
 
-import math
+import numpy as np
 
 from .. import utils
 
@@ -24,24 +24,24 @@ def _tx_distance_to_geo_km(model):
 def _slant_range_km(model):
     R = model.earth_radius_km
     h = model.mean_orbit_altitude_km + R
-    e = math.radians(model.min_elevation_deg)
-    return R * ((((h**2/R**2)-(math.cos(e))**2)**0.5) - math.sin(e))
+    e = np.radians(model.min_elevation_deg)
+    return R * ((((h**2/R**2)-(np.cos(e))**2)**0.5) - np.sin(e))
 
 
 def _periapsis_slant_range_km(model):    
     R = model.earth_radius_km
     h = model.periapsis_altitude_km + R
-    e = math.radians(model.min_elevation_deg)
-    return R * ((((h**2/R**2)-(math.cos(e))**2)**0.5) - math.sin(e))
+    e = np.radians(model.min_elevation_deg)
+    return R * ((((h**2/R**2)-(np.cos(e))**2)**0.5) - np.sin(e))
 
 
 def _satellite_antenna_angle_deg(model):
     R = model.earth_radius_km
     h = model.mean_orbit_altitude_km + R
-    e = math.radians(model.min_elevation_deg)
+    e = np.radians(model.min_elevation_deg)
     r = model.slant_range_km
-    tmp = min(1.0, ((r**2+h**2-R**2)/(2*r*h)))
-    return math.degrees(math.acos(tmp))
+    tmp = np.minimum(1.0, ((r**2+h**2-R**2)/(2*r*h)))
+    return np.degrees(np.arccos(tmp))
 
 
 class Geometry(object):
@@ -69,3 +69,23 @@ class Geometry(object):
             'earth_radius_km': earth_radius_km,
             'min_elevation_deg': min_elevation_deg,
             }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'slant_range_km': ['earth_radius_km',
+                               'mean_orbit_altitude_km',
+                               'min_elevation_deg'],
+            'satellite_antenna_angle_deg': ['earth_radius_km',
+                                            'mean_orbit_altitude_km',
+                                            'min_elevation_deg',
+                                            'slant_range_km'],
+            'mean_orbit_altitude_km': ['apoapsis_altitude_km',
+                                       'periapsis_altitude_km'],
+            'geo_altitude_km': ['geo_radius_km', 'earth_radius_km'],
+            'tx_distance_to_geo_km': ['geo_altitude_km',
+                                      'is_downlink',
+                                      'apoapsis_altitude_km'],
+            'periapsis_slant_range_km': ['earth_radius_km',
+                                         'periapsis_altitude_km',
+                                         'min_elevation_deg'],
+            }
@@ -1,11 +1,8 @@
 #!/usr/bin/python
 
-import argparse
 import numpy as np
 import pylink
 import math
-import jinja2
-import matplotlib.pyplot as plt
 
 
 def _interpolate(tgt, vals, off):
@@ -101,6 +98,53 @@ class HyperSpectralSNRBudget(object):
             'atmospheric_loss_db': self._atmospheric_loss_db,
             }
 
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'incident_power_flux_density_dbw_m2_nm': [
+                'lambda_nm', 'ground_solar_irradiance_w'],
+            'reflected_power_flux_density_dbw_m2_nm': [
+                'incident_power_flux_density_dbw_m2_nm', 'reflectance_db'],
+            'reflected_power_density_dbw_nm': [
+                'reflected_power_flux_density_dbw_m2_nm', 'ground_area_dbm2'],
+            'reflected_power_dbw': ['reflected_power_density_dbw_nm',
+                                    'fwhm_nm'],
+            'power_flux_at_lens_dbw_m2': ['slant_range_km',
+                                          'reflected_power_dbw',
+                                          'atmospheric_loss_db'],
+            'received_power_dbw': ['power_flux_at_lens_dbw_m2',
+                                   'lens_radius_m'],
+            'orbital_velocity_km_per_s': ['grav_const',
+                                          'earth_mass_kg',
+                                          'earth_radius_km',
+                                          'mean_orbit_altitude_km'],
+            'orbital_period_s': ['orbital_velocity_km_per_s',
+                                 'earth_radius_km',
+                                 'mean_orbit_altitude_km'],
+            'shutter_time_s': ['earth_radius_km',
+                               'orbital_period_s',
+                               'gsd_m',
+                               'gmc'],
+            'energy_at_sensor_dbj': ['received_power_dbw',
+                                     'shutter_time_s',
+                                     'optical_loss_db'],
+            'signal_electrons_in_well_dbe': ['energy_at_sensor_dbj',
+                                             'spatial_channels',
+                                             'sensor_quantum_efficiency_db',
+                                             'lambda_nm',
+                                             'plancks_constant',
+                                             'speed_of_light_m_s'],
+            'noise_electrons_dbe': ['read_out_noise_e',
+                                    'signal_electrons_in_well_dbe'],
+            'snr_db': ['signal_electrons_in_well_dbe', 'noise_electrons_dbe'],
+            'ground_area_dbm2': ['spatial_channels', 'gsd_m'],
+            'optical_loss_db': ['fore_optics_efficiency_db',
+                                'grating_efficiency_db',
+                                'focusing_optics_efficiency_db'],
+            'atmospheric_loss_db': ['lambda_nm',
+                                    'orbital_solar_irradiance_w',
+                                    'incident_power_flux_density_dbw_m2_nm'],
+            }
+
     def _incident_power_flux_density_dbw_m2_nm(self, model):
         PFD = max(_interpolate(model.lambda_nm,
                                model.ground_solar_irradiance_w,
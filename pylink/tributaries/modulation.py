@@ -2,6 +2,8 @@
 
 import math
 
+import numpy as np
+
 from .. import utils
 
 
@@ -94,7 +96,7 @@ def __max_bitrate_hz(model, code, additional_rx_losses_db):
 
     max_R = model.allocation_hz * code.tx_eff
 
-    return min(utils.from_db(R_db_hz), max_R)
+    return np.minimum(utils.from_db(R_db_hz), max_R)
 
 
 def _best_modulation_code(model):
@@ -108,18 +110,20 @@ def _best_modulation_code(model):
         model.override(e.best_modulation_code, code)
         added_loss = model.cached_calculate(e.additional_rx_losses_db,
                                             clear_stack=True)
-        model.revert(e.best_modulation_code)
         # DANGER WILL ROBINSON!!
         return __max_bitrate_hz(model, code, added_loss)
 
     # FIXME: Use an O(log(n)) algorithm here...for kicks and cycles
     prev_R = 0
     retval = None
-    for code in model.modulation_performance_table:
-        R = __rate_for(code)
-        if R > prev_R:
-            prev_R = R
-            retval = code
+    # One scope for all of the candidates, so the faked code is only
+    # ever seen by this thread
+    with model.scoped():
+        for code in model.modulation_performance_table:
+            R = __rate_for(code)
+            if R > prev_R:
+                prev_R = R
+                retval = code
 
     return retval
 
@@ -176,3 +180,31 @@ class Modulation(object):
             'modulation_name': name,
             'modulation_performance_table': perf,
             }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        #
+        # best_modulation_code evaluates additional_rx_losses_db with
+        # its own value faked (see the README section on cycles), so
+        # the static inputs of that hidden evaluation are declared
+        # here as well.
+        self.dependencies = {
+            'max_allowable_bitrate_hz': ['best_modulation_code',
+                                         'allocation_hz'],
+            'required_demod_ebn0_db': ['best_modulation_code'],
+            'best_modulation_code': ['modulation_performance_table',
+                                     'cn0_db',
+                                     'target_margin_db',
+                                     'allocation_hz',
+                                     'implementation_loss_db',
+                                     'rx_noise_bw_hz',
+                                     'bitrate_hz'],
+            'tx_spectral_efficiency_bps_per_hz': ['best_modulation_code'],
+            'rx_spectral_efficiency_bps_per_hz': ['best_modulation_code'],
+            'max_bitrate_hz': ['best_modulation_code',
+                               'additional_rx_losses_db',
+                               'cn0_db',
+                               'target_margin_db',
+                               'allocation_hz'],
+            'modulation_code_lookup_table': ['modulation_performance_table',
+                                             'allocation_hz'],
+            }
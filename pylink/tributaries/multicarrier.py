@@ -0,0 +1,285 @@
+#!/usr/bin/python
+
+import numpy as np
+
+from .. import utils
+
+
+def _carrier_count(model):
+    return len(model.carrier_bitrates_hz)
+
+
+def _carrier_power_share_db(model):
+    shares = np.asarray(model.carrier_power_shares, dtype=float)
+    return utils.to_db(shares / np.sum(shares))
+
+
+def _carrier_power_adjust_db(model):
+    # Each carrier gets its share of whatever is left after backing
+    # the amplifier off into its linear region
+    return model.carrier_power_share_db - model.intermod_backoff_db
+
+
+def _carrier_tx_eirp_dbw(model):
+    return model.tx_eirp_dbw + model.carrier_power_adjust_db
+
+
+def _carrier_rx_power_dbw(model):
+    return model.rx_power_dbw + model.carrier_power_adjust_db
+
+
+def _intermod_n0_dbw_per_hz(model):
+    # Intermodulation products are treated as noise spread evenly
+    # across the allocation, <carrier_to_intermod_db> below the total
+    # (backed-off) carrier power.
+    if model.carrier_to_intermod_db is None:
+        return -np.inf
+    return (model.rx_power_dbw
+            - model.intermod_backoff_db
+            - model.carrier_to_intermod_db
+            - utils.to_db(model.allocation_hz))
+
+
+def _carrier_n0_dbw_per_hz(model):
+    return utils.to_db(utils.from_db(model.rx_n0_dbw_per_hz)
+                       + utils.from_db(model.intermod_n0_dbw_per_hz))
+
+
+def _carrier_cn0_db(model):
+    return model.carrier_rx_power_dbw - model.carrier_n0_dbw_per_hz
+
+
+def _carrier_rx_ebn0_db(model):
+    return (model.carrier_cn0_db
+            - utils.to_db(np.asarray(model.carrier_bitrates_hz,
+                                     dtype=float)))
+
+
+def _excess_noise_bandwidth_loss_db(model, bitrates_hz, rx_eff):
+    # As the single-carrier excess_noise_bandwidth_loss_db, for the
+    # given bitrates and receive spectral efficiencies (broadcast)
+    req_bw = utils.to_db(bitrates_hz / rx_eff)
+    if not model.rx_noise_bw_hz:
+        return np.zeros(np.shape(req_bw))
+    return utils.to_db(model.rx_noise_bw_hz) - req_bw
+
+
+def _carrier_modulation_codes(model):
+    codes = model.carrier_codes
+    if codes is not None:
+        return list(codes)
+
+    # Every carrier against every code at once: each carrier gets the
+    # most spectrally efficient code closing with the target margin,
+    # or the most robust code if none of them do.
+    table = model.modulation_performance_table
+    ebn0 = np.array([c.ebn0_db for c in table])
+    tx_eff = np.array([c.tx_eff for c in table])
+    rx_eff = np.array([c.rx_eff for c in table])
+
+    bitrates = np.asarray(model.carrier_bitrates_hz, dtype=float)
+    losses = (model.implementation_loss_db
+              + _excess_noise_bandwidth_loss_db(model,
+                                                bitrates[:, np.newaxis],
+                                                rx_eff[np.newaxis, :]))
+    margins = (model.carrier_rx_ebn0_db[:, np.newaxis]
+               - ebn0[np.newaxis, :]
+               - losses)
+    closes = margins >= model.target_margin_db
+
+    score = np.where(closes, tx_eff[np.newaxis, :], -np.inf)
+    best = np.argmax(score, axis=1)
+    best = np.where(np.any(closes, axis=1), best, np.argmin(ebn0))
+    return [table[i] for i in best]
+
+
+def _carrier_rx_spectral_efficiency_bps_per_hz(model):
+    return np.array([c.rx_eff for c in model.carrier_modulation_codes])
+
+
+def _carrier_tx_spectral_efficiency_bps_per_hz(model):
+    return np.array([c.tx_eff for c in model.carrier_modulation_codes])
+
+
+def _carrier_required_rx_bw_hz(model):
+    return (np.asarray(model.carrier_bitrates_hz, dtype=float)
+            / model.carrier_rx_spectral_efficiency_bps_per_hz)
+
+
+def _carrier_required_tx_bw_hz(model):
+    return (np.asarray(model.carrier_bitrates_hz, dtype=float)
+            / model.carrier_tx_spectral_efficiency_bps_per_hz)
+
+
+def _carrier_occupied_bw_hz(model):
+    return float(np.sum(model.carrier_required_tx_bw_hz))
+
+
+def _carriers_fit_allocation(model):
+    return model.carrier_occupied_bw_hz <= model.allocation_hz
+
+
+def _carrier_excess_noise_bandwidth_loss_db(model):
+    return _excess_noise_bandwidth_loss_db(
+        model,
+        np.asarray(model.carrier_bitrates_hz, dtype=float),
+        model.carrier_rx_spectral_efficiency_bps_per_hz)
+
+
+def _carrier_additional_rx_losses_db(model):
+    return (model.implementation_loss_db
+            + model.carrier_excess_noise_bandwidth_loss_db)
+
+
+def _carrier_required_ebn0_db(model):
+    demod = np.array([c.ebn0_db for c in model.carrier_modulation_codes])
+    return demod + model.carrier_additional_rx_losses_db
+
+
+def _carrier_link_margin_db(model):
+    return model.carrier_rx_ebn0_db - model.carrier_required_ebn0_db
+
+
+def _carrier_pfd_dbw_per_m2_per_hz(model):
+    return utils.pfd_hz_manual_adjust(
+        model.pf_dbw_per_m2 + model.carrier_power_adjust_db,
+        model.carrier_required_rx_bw_hz,
+        1)
+
+
+def _carrier_total_bitrate_hz(model):
+    return float(np.sum(model.carrier_bitrates_hz))
+
+
+class MultiCarrier(object):
+    """Multi-carrier (FDMA) tributary
+
+    Splits the transmit power, and the allocation, between several
+    carriers, each with its own bitrate and modulation code.  Every
+    per-carrier node (named carrier_*) is an array with one entry per
+    carrier, computed for all carriers at once.
+
+    The single-carrier nodes of the rest of the budget (rx_power_dbw,
+    link_margin_db, ...) are left alone and continue to describe the
+    whole of the transmitted power as a single carrier.
+    """
+
+    def __init__(self,
+                 bitrates_hz,
+                 codes=None,
+                 power_shares=None,
+                 intermod_backoff_db=0.0,
+                 carrier_to_intermod_db=None):
+        """Create a new multi-carrier tributary
+
+        bitrates_hz -- bitrate of each carrier
+        codes -- optional Code for each carrier, otherwise each one
+                 gets the most efficient code from the modulation
+                 performance table that closes with target_margin_db
+        power_shares -- relative share of the transmit power of each
+                        carrier, defaults to equal shares
+        intermod_backoff_db -- output backoff of the amplifier needed
+                               to carry several carriers at once
+        carrier_to_intermod_db -- total carrier to intermodulation
+                                  power ratio, None to ignore
+                                  intermodulation noise
+        """
+        n = len(bitrates_hz)
+        if codes is not None and len(codes) != n:
+            raise ValueError("Need one code per carrier")
+        if power_shares is None:
+            power_shares = [1.0] * n
+        elif len(power_shares) != n:
+            raise ValueError("Need one power share per carrier")
+
+        self.tribute = {
+            # calculators
+            'carrier_count': _carrier_count,
+            'carrier_power_share_db': _carrier_power_share_db,
+            'carrier_power_adjust_db': _carrier_power_adjust_db,
+            'carrier_tx_eirp_dbw': _carrier_tx_eirp_dbw,
+            'carrier_rx_power_dbw': _carrier_rx_power_dbw,
+            'intermod_n0_dbw_per_hz': _intermod_n0_dbw_per_hz,
+            'carrier_n0_dbw_per_hz': _carrier_n0_dbw_per_hz,
+            'carrier_cn0_db': _carrier_cn0_db,
+            'carrier_rx_ebn0_db': _carrier_rx_ebn0_db,
+            'carrier_modulation_codes': _carrier_modulation_codes,
+            'carrier_rx_spectral_efficiency_bps_per_hz':
+                _carrier_rx_spectral_efficiency_bps_per_hz,
+            'carrier_tx_spectral_efficiency_bps_per_hz':
+                _carrier_tx_spectral_efficiency_bps_per_hz,
+            'carrier_required_rx_bw_hz': _carrier_required_rx_bw_hz,
+            'carrier_required_tx_bw_hz': _carrier_required_tx_bw_hz,
+            'carrier_occupied_bw_hz': _carrier_occupied_bw_hz,
+            'carriers_fit_allocation': _carriers_fit_allocation,
+            'carrier_excess_noise_bandwidth_loss_db':
+                _carrier_excess_noise_bandwidth_loss_db,
+            'carrier_additional_rx_losses_db':
+                _carrier_additional_rx_losses_db,
+            'carrier_required_ebn0_db': _carrier_required_ebn0_db,
+            'carrier_link_margin_db': _carrier_link_margin_db,
+            'carrier_pfd_dbw_per_m2_per_hz': _carrier_pfd_dbw_per_m2_per_hz,
+            'carrier_total_bitrate_hz': _carrier_total_bitrate_hz,
+
+            # constants
+            'carrier_bitrates_hz': np.asarray(bitrates_hz, dtype=float),
+            'carrier_codes': codes,
+            'carrier_power_shares': np.asarray(power_shares, dtype=float),
+            'intermod_backoff_db': intermod_backoff_db,
+            'carrier_to_intermod_db': carrier_to_intermod_db,
+            }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'carrier_count': ['carrier_bitrates_hz'],
+            'carrier_power_share_db': ['carrier_power_shares'],
+            'carrier_power_adjust_db': ['carrier_power_share_db',
+                                        'intermod_backoff_db'],
+            'carrier_tx_eirp_dbw': ['tx_eirp_dbw', 'carrier_power_adjust_db'],
+            'carrier_rx_power_dbw': ['rx_power_dbw',
+                                     'carrier_power_adjust_db'],
+            'intermod_n0_dbw_per_hz': ['carrier_to_intermod_db',
+                                       'rx_power_dbw',
+                                       'intermod_backoff_db',
+                                       'allocation_hz'],
+            'carrier_n0_dbw_per_hz': ['rx_n0_dbw_per_hz',
+                                      'intermod_n0_dbw_per_hz'],
+            'carrier_cn0_db': ['carrier_rx_power_dbw',
+                               'carrier_n0_dbw_per_hz'],
+            'carrier_rx_ebn0_db': ['carrier_cn0_db', 'carrier_bitrates_hz'],
+            'carrier_modulation_codes': ['carrier_codes',
+                                         'modulation_performance_table',
+                                         'carrier_bitrates_hz',
+                                         'carrier_rx_ebn0_db',
+                                         'implementation_loss_db',
+                                         'rx_noise_bw_hz',
+                                         'target_margin_db'],
+            'carrier_rx_spectral_efficiency_bps_per_hz':
+                ['carrier_modulation_codes'],
+            'carrier_tx_spectral_efficiency_bps_per_hz':
+                ['carrier_modulation_codes'],
+            'carrier_required_rx_bw_hz':
+                ['carrier_bitrates_hz',
+                 'carrier_rx_spectral_efficiency_bps_per_hz'],
+            'carrier_required_tx_bw_hz':
+                ['carrier_bitrates_hz',
+                 'carrier_tx_spectral_efficiency_bps_per_hz'],
+            'carrier_occupied_bw_hz': ['carrier_required_tx_bw_hz'],
+            'carriers_fit_allocation': ['carrier_occupied_bw_hz',
+                                        'allocation_hz'],
+            'carrier_excess_noise_bandwidth_loss_db':
+                ['carrier_bitrates_hz',
+                 'carrier_rx_spectral_efficiency_bps_per_hz',
+                 'rx_noise_bw_hz'],
+            'carrier_additional_rx_losses_db':
+                ['implementation_loss_db',
+                 'carrier_excess_noise_bandwidth_loss_db'],
+            'carrier_required_ebn0_db': ['carrier_modulation_codes',
+                                         'carrier_additional_rx_losses_db'],
+            'carrier_link_margin_db': ['carrier_rx_ebn0_db',
+                                       'carrier_required_ebn0_db'],
+            'carrier_pfd_dbw_per_m2_per_hz': ['pf_dbw_per_m2',
+                                              'carrier_power_adjust_db',
+                                              'carrier_required_rx_bw_hz'],
+            'carrier_total_bitrate_hz': ['carrier_bitrates_hz'],
+            }
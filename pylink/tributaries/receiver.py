@@ -108,3 +108,14 @@ class Receiver(object):
             'room_temp_k': room_temp_k,
             'implementation_loss_db': implementation_loss_db,
             }
+
+        # inputs of each calculator, see DAGModel.declare_dependencies
+        self.dependencies = {
+            'rx_noise_temp_k': ['rx_system_noise_temp_k',
+                                'rx_antenna_noise_temp_k'],
+            'rx_system_noise_temp_k': ['rx_rf_chain', 'room_temp_k'],
+            'rx_system_noise_factor': ['rx_system_noise_temp_k',
+                                       'rx_rf_chain'],
+            'rx_system_noise_figure': ['rx_system_noise_factor'],
+            'rx_noise_temp_dbk': ['rx_noise_temp_k'],
+            }
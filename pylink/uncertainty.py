@@ -0,0 +1,226 @@
+#!/usr/bin/python
+
+"""Uncertain node values and Monte Carlo propagation.
+
+Any static node may be given a Distribution instead of a plain value.
+Normal evaluation of the model uses the distribution's nominal value,
+while monte_carlo() draws every uncertain input at once as a numpy
+array and pushes the arrays through the calculators in a single
+vectorized pass:
+
+  m = pylink.DAGModel([...,
+                       pylink.Channel(rain_loss_db=pylink.Normal(2, 0.5)),
+                       ...])
+  m.link_margin_db                      # at the nominal rain loss
+  mc = pylink.monte_carlo(m, ['link_margin_db'], n=100000, seed=1)
+  mc.percentiles('link_margin_db')      # {5: ..., 50: ..., 95: ...}
+  mc.probability_below('link_margin_db', 0)
+"""
+
+import numpy as np
+
+
+# Nodes held at their nominal value by default.  The modulation code
+# is a design decision made at the nominal point, and selecting one
+# per sample can't be vectorized anyway.
+DEFAULT_FIXED = ['best_modulation_code']
+
+
+class Distribution(object):
+    """Base class of the distributions a node's value may be given as.
+
+    Subclasses provide <nominal>, the value used for ordinary
+    (non-Monte Carlo) evaluation, plus sample() and std().
+    """
+
+    nominal = None
+
+    def sample(self, n, rng):
+        """Returns an array of n samples drawn with numpy Generator rng.
+        """
+        raise NotImplementedError()
+
+    def std(self):
+        """Returns the standard deviation of the distribution.
+        """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        args = ', '.join('%s=%r' % (k, v)
+                         for k, v in sorted(vars(self).items()))
+        return '%s(%s)' % (self.__class__.__name__, args)
+
+
+class Normal(Distribution):
+
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.sigma = std
+        self.nominal = mean
+
+    def sample(self, n, rng):
+        return rng.normal(self.mean, self.sigma, n)
+
+    def std(self):
+        return self.sigma
+
+
+class Uniform(Distribution):
+
+    def __init__(self, low, high, nominal=None):
+        """Uniform between low and high, nominally in the middle.
+        """
+        self.low = low
+        self.high = high
+        self.nominal = (low + high) / 2.0 if nominal is None else nominal
+
+    def sample(self, n, rng):
+        return rng.uniform(self.low, self.high, n)
+
+    def std(self):
+        return (self.high - self.low) / 12**0.5
+
+
+class Triangular(Distribution):
+
+    def __init__(self, low, mode, high):
+        """Triangular between low and high peaking at (and nominally) mode.
+        """
+        self.low = low
+        self.mode = mode
+        self.high = high
+        self.nominal = mode
+
+    def sample(self, n, rng):
+        return rng.triangular(self.low, self.mode, self.high, n)
+
+    def std(self):
+        (a, b, c,) = (self.low, self.mode, self.high,)
+        return ((a*a + b*b + c*c - a*b - a*c - b*c) / 18.0)**0.5
+
+
+class Empirical(Distribution):
+
+    def __init__(self, samples, nominal=None):
+        """Resamples (with replacement) from observed values.
+
+        samples -- observed values
+        nominal -- defaults to the median of the samples
+        """
+        self.samples = np.asarray(samples, dtype=float)
+        if nominal is None:
+            nominal = float(np.median(self.samples))
+        self.nominal = nominal
+
+    def sample(self, n, rng):
+        return rng.choice(self.samples, n, replace=True)
+
+    def std(self):
+        return float(np.std(self.samples))
+
+
+def _vectorized_eval(model, arrays, outputs, fixed=()):
+    """Evaluates outputs with some nodes replaced by equal-length arrays.
+
+    model -- DAGModel
+    arrays -- dict of node number => 1-D numpy array
+    outputs -- list of node numbers
+    fixed -- node numbers held at their current (scalar) value
+
+    Returns a dict of node number => array, broadcast to the length of
+    the input arrays for outputs that don't depend upon them.  The
+    model itself is left untouched.
+    """
+    n = len(next(iter(arrays.values()))) if arrays else 1
+    overrides = dict((node, model.cached_calculate(node)) for node in fixed)
+    overrides.update(arrays)
+
+    retval = {}
+    with model.scoped(overrides):
+        for node in outputs:
+            value = np.asarray(model.cached_calculate(node))
+            shape = (n,) + value.shape[1:] if value.ndim else (n,)
+            retval[node] = np.broadcast_to(value, shape)
+    return retval
+
+
+class MonteCarloResult(object):
+    """The sampled outputs (and inputs) of a monte_carlo run.
+
+    <samples> maps output node names to arrays of n values, and
+    <inputs> does the same for the uncertain inputs that were drawn.
+    """
+
+    def __init__(self, n, samples, inputs):
+        self.n = n
+        self.samples = samples
+        self.inputs = inputs
+
+    def __getitem__(self, name):
+        return self.samples[name]
+
+    def mean(self, name):
+        return float(np.mean(self.samples[name]))
+
+    def std(self, name):
+        return float(np.std(self.samples[name]))
+
+    def percentiles(self, name, q=(5, 50, 95)):
+        """Returns a dict of percentile => value for the named output.
+        """
+        values = np.percentile(self.samples[name], q)
+        return dict(zip(q, [float(v) for v in values]))
+
+    def probability_below(self, name, threshold):
+        """Returns the fraction of samples of the output below threshold.
+
+        For example, probability_below('link_margin_db', 0) is the
+        chance of closing the link without any margin.
+        """
+        return float(np.mean(self.samples[name] < threshold))
+
+    def summary(self, q=(5, 50, 95)):
+        """Returns a dict of output name => dict of statistics.
+        """
+        retval = {}
+        for name in self.samples:
+            stats = {'mean': self.mean(name), 'std': self.std(name)}
+            stats.update(self.percentiles(name, q))
+            retval[name] = stats
+        return retval
+
+
+def monte_carlo(model, outputs, n=10000, seed=None, fixed=None):
+    """Propagates the uncertain inputs of a model to its outputs.
+
+    model -- DAGModel with some nodes given as Distributions
+    outputs -- list of node names to sample
+    n -- number of samples
+    seed -- seed for numpy's random Generator, for repeatable runs
+    fixed -- node names held at their nominal value, defaults to
+             DEFAULT_FIXED (ie the modulation code)
+
+    All n samples are evaluated at once: every uncertain input is
+    replaced by an array, so the calculators involved have to be
+    written with numpy-compatible arithmetic (all of the built-in
+    link budget tributaries are).  The model itself is left as it
+    was.
+    """
+    if fixed is None:
+        fixed = DEFAULT_FIXED
+    fixed = [model.node_num(name) for name in fixed if name in model._nodes]
+
+    rng = np.random.default_rng(seed)
+    arrays = {}
+    for node in sorted(model._dists):
+        if node not in fixed:
+            arrays[node] = model._dists[node].sample(n, rng)
+    if not arrays:
+        raise ValueError("None of the model's nodes are uncertain")
+
+    nodes = [model.node_num(name) for name in outputs]
+    values = _vectorized_eval(model, arrays, nodes, fixed)
+
+    samples = dict((name, values[node]) for name, node in zip(outputs, nodes))
+    inputs = dict((model.node_name(node), v) for node, v in arrays.items())
+    return MonteCarloResult(n, samples, inputs)
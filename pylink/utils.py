@@ -5,6 +5,16 @@ import math
 import numpy as np
 
 
+def _differs(a, b):
+    # Whether a and b are different values, element-wise for arrays
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return not np.array_equal(a, b)
+    try:
+        return bool(a != b)
+    except (TypeError, ValueError):
+        return a is not b
+
+
 def sequential_enum(*sequential, **named):
     """Returns a new enum with all given named and sequential nodes.
 
@@ -32,13 +42,21 @@ def node_associations(enum):
 
 def to_db(v):
     """linear to dB
+
+    Works element-wise on numpy arrays as well.
     """
+    if isinstance(v, np.ndarray):
+        return np.log10(v) * 10
     return math.log(float(v), 10) * 10
 
 
 def from_db(v):
     """dB to linear
+
+    Works element-wise on numpy arrays as well.
     """
+    if isinstance(v, np.ndarray):
+        return 10**(v/10.0)
     return 10**(float(v)/10.0)
 
 
@@ -106,6 +124,8 @@ def pfd_hz_manual_adjust(base, occ, n):
 
     n_db = to_db(n)
     occ_db = to_db(occ)
+    if any(isinstance(v, np.ndarray) for v in (base, n_db, occ_db)):
+        return np.where(n_db > occ_db, base, base - occ_db + n_db)
     if n_db > occ_db:
         return base
     else:
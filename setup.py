@@ -52,5 +52,10 @@ setup(
     packages=[
         'pylink',
         'pylink.tributaries'
-        ]
+        ],
+    entry_points={
+        'console_scripts': [
+            'pylink=pylink.cli:main',
+            ],
+        },
     )
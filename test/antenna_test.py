@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import numpy as np
 import pylink
 import pytest
 
@@ -63,6 +64,22 @@ class TestAntenna(object):
         model.clear_cache()
         assert model.tx_antenna_boresight_gain_dbi == 1
 
+    def test_gain_is_scalar(self, model):
+        pattern = range(1, 10, 1)
+        antenna = pylink.Antenna(
+            is_rx=False,
+            tracking=False,
+            pattern=pattern)
+        model.accept_tribute(antenna.tribute)
+        model.clear_cache()
+        for name in ('tx_antenna_gain_dbi',
+                     'tx_antenna_boresight_gain_dbi',
+                     'rx_antenna_gain_dbi',
+                     'rx_antenna_boresight_gain_dbi'):
+            gain = getattr(model, name)
+            assert isinstance(gain, np.float64), name
+            assert 0 == np.ndim(gain), name
+
     def test_average_gain_dbi(self, model):
         e = model.enum
         m = model
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import csv
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pylink
+import pytest
+
+from pylink import cli
+
+
+BUDGET = '''
+import pylink
+
+def _b(m):
+    return m.a * 2
+
+def _c(m):
+    return m.b + m.offset
+
+def budget():
+    return pylink.DAGModel(a=1, offset=10, b=_b, c=_c)
+'''
+
+
+@pytest.fixture
+def budget_file(tmpdir):
+    path = os.path.join(str(tmpdir), 'budget.py')
+    with open(path, 'w') as fd:
+        fd.write(BUDGET)
+    return path
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='') as fd:
+        csv.writer(fd).writerows(rows)
+
+
+def _read_csv(path):
+    with open(path, 'r', newline='') as fd:
+        return list(csv.reader(fd))
+
+
+class TestCLI(object):
+
+    def test_load_budget(self, budget_file, tmpdir):
+        m = cli.load_budget('%s:budget' % budget_file)
+        assert 12 == m.c
+
+        m = cli.load_budget('pylink.model:DAGModel')
+        assert isinstance(m, pylink.DAGModel)
+
+        path = os.path.join(str(tmpdir), 'snap')
+        m = pylink.DAGModel([pylink.Geometry()])
+        pylink.save_model(m, path)
+        assert m.slant_range_km == cli.load_budget(path).slant_range_km
+
+        with pytest.raises(ValueError):
+            cli.load_budget(budget_file)
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_csv(self, budget_file, tmpdir, workers):
+        src = os.path.join(str(tmpdir), 'in.csv')
+        dst = os.path.join(str(tmpdir), 'out.csv')
+        rows = [['a', 'offset']] + [[i, i % 3] for i in range(50)]
+        _write_csv(src, rows)
+
+        assert 0 == cli.main(['%s:budget' % budget_file, src,
+                              '-o', 'c', '-o', 'b',
+                              '--workers', str(workers),
+                              '--chunk-size', '7',
+                              '--out', dst])
+
+        out = _read_csv(dst)
+        assert ['a', 'offset', 'c', 'b'] == out[0]
+        assert 51 == len(out)
+        for i, row in enumerate(out[1:]):
+            assert [i, i % 3, 2*i + i % 3, 2*i] == [int(v) for v in row]
+
+    def test_npz(self, budget_file, tmpdir):
+        src = os.path.join(str(tmpdir), 'in.npz')
+        dst = os.path.join(str(tmpdir), 'out.csv')
+        np.savez(src, a=np.arange(5.0))
+
+        assert 0 == cli.main(['%s:budget' % budget_file, src,
+                              '-o', 'c', '--no-inputs', '--out', dst])
+
+        out = _read_csv(dst)
+        assert [['c']] + [[str(2.0*i + 10)] for i in range(5)] == out
+
+    @pytest.mark.parametrize('save', [np.savez, np.savez_compressed])
+    def test_npz_chunks(self, budget_file, tmpdir, save):
+        src = os.path.join(str(tmpdir), 'in.npz')
+        dst = os.path.join(str(tmpdir), 'out.csv')
+        save(src, a=np.arange(10.0), offset=np.arange(10) % 3)
+
+        assert 0 == cli.main(['%s:budget' % budget_file, src,
+                              '-o', 'c', '--chunk-size', '3', '--out', dst])
+
+        out = _read_csv(dst)
+        assert ['a', 'offset', 'c'] == out[0]
+        assert 11 == len(out)
+        for i, row in enumerate(out[1:]):
+            assert [i, i % 3, 2*i + i % 3] == [int(float(v)) for v in row]
+
+    def test_npz_mismatch(self, budget_file, tmpdir):
+        src = os.path.join(str(tmpdir), 'in.npz')
+        np.savez(src, a=np.arange(5.0), offset=np.arange(4.0))
+        with pytest.raises(SystemExit):
+            cli.main(['%s:budget' % budget_file, src, '-o', 'c'])
+
+    def test_csv_mismatch(self, budget_file, tmpdir, capsys):
+        src = os.path.join(str(tmpdir), 'in.csv')
+        dst = os.path.join(str(tmpdir), 'out.csv')
+        _write_csv(src, [['a', 'offset'], [1, 2], [3], [4, 5]])
+
+        assert 1 == cli.main(['%s:budget' % budget_file, src,
+                              '-o', 'c', '--out', dst])
+        assert 'Line 3' in capsys.readouterr().err
+
+        model = cli.load_budget('%s:budget' % budget_file)
+        results = cli.evaluate_stream(model, None, ['a', 'offset'],
+                                      [[1, 2], [3]], ['c'])
+        with pytest.raises(cli.ScenarioError):
+            list(results)
+
+    def test_csv_empty(self, budget_file, tmpdir, capsys):
+        src = os.path.join(str(tmpdir), 'in.csv')
+        open(src, 'w').close()
+        with pytest.raises(SystemExit) as err:
+            cli.main(['%s:budget' % budget_file, src, '-o', 'c'])
+        assert 0 != err.value.code
+        assert 'No header row' in capsys.readouterr().err
+
+    def test_csv_not_a_number(self, budget_file, tmpdir, capsys):
+        src = os.path.join(str(tmpdir), 'in.csv')
+        dst = os.path.join(str(tmpdir), 'out.csv')
+        _write_csv(src, [['a'], [1], ['x']])
+
+        assert 1 == cli.main(['%s:budget' % budget_file, src,
+                              '-o', 'c', '--out', dst])
+        err = capsys.readouterr().err
+        assert src in err
+        assert 'Line 3' in err
+        assert "'x'" in err
+
+    def test_unknown_node(self, budget_file, tmpdir):
+        src = os.path.join(str(tmpdir), 'in.csv')
+        _write_csv(src, [['nope'], [1]])
+        with pytest.raises(SystemExit):
+            cli.main(['%s:budget' % budget_file, src, '-o', 'c'])
+
+    def test_stream_is_lazy(self, budget_file):
+        model = cli.load_budget('%s:budget' % budget_file)
+
+        consumed = []
+        def _rows():
+            for i in range(1000000):
+                consumed.append(i)
+                yield [i]
+
+        results = cli.evaluate_stream(model, None, ['a'], _rows(), ['b'],
+                                      chunk_size=10)
+        assert [0] == next(results)
+        assert [2] == next(results)
+        assert len(consumed) <= 10
+
+    def test_stdin(self, budget_file):
+        out = subprocess.check_output(
+            [sys.executable, '-m', 'pylink', '%s:budget' % budget_file,
+             '-o', 'c'],
+            input=b'a\n3\n4\n')
+        assert ['a,c', '3,16', '4,18'] == out.decode().split()
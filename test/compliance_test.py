@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+from pylink.compliance import canonical_pfd_vs_el
+from pylink.compliance import expected_pfd_vs_el
+from testutils import model
+
+
+LIMITS = [(0, -150), (5, -150), (25, -140), (90, -140)]
+
+
+def _scalar_pfd(m, el, bw, expected=False):
+    with m.scoped({m.enum.min_elevation_deg: el}):
+        if expected:
+            return pylink.rx_pfd_hz_adjust(m, m.pf_dbw_per_m2, bw)
+        return pylink.utils.pfd_hz_manual_adjust(m.canonical_pf_dbw_per_m2,
+                                                 m.allocation_hz, bw)
+
+
+class TestCompliance(object):
+
+    def test_canonical_matches_scalar(self, model):
+        els = np.linspace(0, 90, 19)
+        pfd = canonical_pfd_vs_el(model, els, 4e3)
+        for el, v in zip(els, pfd):
+            assert abs(v - _scalar_pfd(model, el, 4e3)) < 1e-9
+
+    def test_expected_matches_scalar(self, model):
+        code = model.best_modulation_code
+        els = np.linspace(0, 90, 19)
+        pfd = expected_pfd_vs_el(model, els, 4e3)
+        for el, v in zip(els, pfd):
+            with model.scoped({model.enum.best_modulation_code: code}):
+                assert abs(v - _scalar_pfd(model, el, 4e3, True)) < 1e-9
+
+    def test_compliance(self, model):
+        c = pylink.pfd_compliance(model, LIMITS)
+        # The breakpoints are part of the grid
+        for el, lim in LIMITS:
+            i = list(c.elevations_deg).index(el)
+            assert lim == c.limit[i]
+
+        assert np.allclose(c.limit - c.pfd, c.margin_db)
+        i = np.argmin(c.margin_db)
+        assert c.worst_margin_db == c.margin_db[i]
+        assert c.worst_elevation_deg == c.elevations_deg[i]
+        assert c.compliant == (c.worst_margin_db >= 0)
+        assert c.compliant == (not c.violations)
+
+        # Raising the EIRP to the max allowable just meets the mask
+        eirp = model.peak_tx_eirp_dbw
+        assert abs(c.max_allowable_eirp_dbw
+                   - (eirp + c.worst_margin_db)) < 1e-9
+        with model.scoped():
+            model.override(model.enum.tx_power_at_pa_dbw,
+                           model.tx_power_at_pa_dbw
+                           + c.max_allowable_eirp_dbw - eirp)
+            c2 = pylink.pfd_compliance(model, LIMITS)
+        assert abs(c2.worst_margin_db) < 1e-9
+        assert c2.compliant
+
+    def test_violations(self, model):
+        c = pylink.pfd_compliance(model, LIMITS)
+        # Push it over the flat part of the mask at high elevations
+        # only, by tightening the mask up there
+        shift = c.margin_db[-1] + 1
+        limits = [(0, -150), (5, -150), (25, -140),
+                  (50, -140), (60, -140 - shift), (90, -140 - shift)]
+        bad = pylink.pfd_compliance(model, limits)
+        assert not bad.compliant
+        assert 1 == len(bad.violations)
+        (start, end,) = bad.violations[0]
+        assert 50 < start < 90
+        assert 90 == end
+        # The margin crosses zero at the start of the violation
+        margin = np.interp(start, bad.elevations_deg, bad.margin_db)
+        assert abs(margin) < 1e-6
+
+    def test_defaults(self, model):
+        with pytest.raises(ValueError):
+            pylink.pfd_compliance(model)
+        model.override(model.enum.gs_pfd_limits, LIMITS)
+        c = pylink.pfd_compliance(model, expected=True)
+        assert len(c.elevations_deg) == 901
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+from pylink.utils import spreading_loss_db
+
+
+R = 6378.14
+
+
+def _victims():
+    # Two ground stations on the equator, pointed straight up
+    victims = np.array([[R, 0, 0], [0, R, 0]])
+    return (victims, victims / R)
+
+
+class TestEPFD(object):
+
+    def test_single_overhead(self):
+        (victims, boresights,) = _victims()
+        tx = np.array([[[R + 1000, 0, 0]]])
+        r = pylink.epfd(tx, victims, boresights, eirp_dbw=-10,
+                        victim_pattern=[30]*360)
+        assert (1, 2) == r.epfd_dbw_per_m2.shape
+        assert abs(r.epfd_dbw_per_m2[0, 0]
+                   - (-10 - spreading_loss_db(1000))) < 1e-9
+        # Below the horizon of the second station
+        assert -np.inf == r.epfd_dbw_per_m2[0, 1]
+
+    def test_aggregation_and_pattern(self):
+        (victims, boresights,) = _victims()
+        victims = victims[:1]
+        boresights = boresights[:1]
+        h = 1000.0
+        # One satellite overhead, one 10 degrees off (as seen from
+        # the ground station), one behind the Earth
+        off = np.radians(10)
+        d = h / np.cos(off)
+        tx = np.array([[[R + h, 0, 0],
+                        [R + h, d * np.sin(off), 0],
+                        [-R - h, 0, 0]]])
+        pattern = np.zeros(360) - 20
+        pattern[0] = 0
+        pattern[355:] = -10
+        pattern[1:6] = -10
+        r = pylink.epfd(tx, victims, boresights, [-10, -7, 50], pattern)
+
+        expected = pylink.to_db(
+            pylink.from_db(-10 - spreading_loss_db(h))
+            + pylink.from_db(-7 - spreading_loss_db(d) - 20))
+        assert abs(r.epfd_dbw_per_m2[0, 0] - expected) < 1e-9
+
+    def test_callable_and_tx_pattern(self):
+        (victims, boresights,) = _victims()
+        tx = np.array([[R + 1000, 0, 0]])
+        r = pylink.epfd(tx, victims[:1], boresights[:1], eirp_dbw=0,
+                        victim_pattern=lambda theta: 10 - theta / 10.0,
+                        tx_pattern=lambda theta: 5 - theta)
+        assert abs(r.epfd_dbw_per_m2[0, 0] + spreading_loss_db(1000)) < 1e-9
+
+    def test_chunking(self):
+        rng = np.random.default_rng(1)
+        (victims, boresights,) = _victims()
+        tx = _unit_sphere(rng, (50, 20)) * (R + 1200)
+        pattern = np.linspace(30, -10, 360)
+        full = pylink.epfd(tx, victims, boresights, -20, pattern)
+        chunked = pylink.epfd(tx, victims, boresights, -20, pattern,
+                              chunk_size=7)
+        streamed = pylink.epfd(iter(tx), victims, boresights, -20, pattern)
+        assert (50, 2) == full.epfd_dbw_per_m2.shape
+        assert np.array_equal(full.epfd_dbw_per_m2, chunked.epfd_dbw_per_m2)
+        assert np.array_equal(full.epfd_dbw_per_m2, streamed.epfd_dbw_per_m2)
+
+    def test_statistics(self):
+        values = np.array([[-200.0, -180], [-190, -170], [-180, -160],
+                           [-170, -150]])
+        r = pylink.EPFDResult(values)
+        assert [-170, -150] == list(r.worst())
+        assert [-190, -170] == list(r.percentiles([50])[50])
+        assert [0.25, 0.75] == list(r.exceedance(-175))
+
+        mask = [(-185, 50), (-170, 100)]
+        margins = r.mask_margins(mask)
+        assert [[5, -15], [0, -20]] == margins.tolist()
+        assert not r.complies(mask)
+        assert pylink.EPFDResult(values[:, :1]).complies(mask)
+
+        # Weighting the quietest step by 3/4 of the time
+        w = pylink.EPFDResult(values, weights=[3, 1/3., 1/3., 1/3.])
+        assert [-200, -180] == list(w.percentiles([50])[50])
+        assert np.allclose([1/12., 1/12.*3], w.exceedance(-175))
+
+    def test_bad_args(self):
+        (victims, boresights,) = _victims()
+        with pytest.raises(ValueError):
+            pylink.epfd(np.zeros((1, 1, 3)) + R * 2, victims,
+                        boresights[:1], 0, [0]*360)
+        with pytest.raises(ValueError):
+            pylink.epfd(np.zeros((2, 1, 3)) + R * 2, victims, boresights,
+                        0, [0]*360, weights=[1])
+
+
+def _unit_sphere(rng, shape):
+    v = rng.normal(size=shape + (3,))
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+from testutils import tributaries
+
+
+def _model(**antenna):
+    return pylink.DAGModel(tributaries(
+        rx_antenna=antenna,
+        channel=dict(frequency_grid_mhz=[400, 401.5, 403])))
+
+
+NODES = ['wavelength_m',
+         'unity_gain_propagation_loss_db',
+         'rx_antenna_effective_area_dbm2',
+         'rx_antenna_boresight_gain_dbi',
+         'link_margin_db']
+
+
+class TestFrequencySweep(object):
+
+    def _check_matches_scalar(self, m):
+        code = m.best_modulation_code
+        sweep = pylink.frequency_sweep(m, NODES)
+        for i, f in enumerate(m.frequency_grid_hz):
+            with m.scoped({m.enum.center_freq_hz: f,
+                           m.enum.best_modulation_code: code}):
+                for name in NODES:
+                    assert abs(sweep[name][i]
+                               - m.cached_calculate(m.node_num(name))) < 1e-9
+
+    def test_grid(self):
+        m = _model()
+        assert [400e6, 401.5e6, 403e6] == list(m.frequency_grid_hz)
+        assert 402.7e6 == m.center_freq_hz
+
+        orig = m.link_margin_db
+        self._check_matches_scalar(m)
+        assert orig == m.link_margin_db
+        assert 402.7e6 == m.center_freq_hz
+
+    def test_explicit_freqs(self):
+        m = pylink.DAGModel([pylink.Channel()])
+        assert m.frequency_grid_hz is None
+        with pytest.raises(ValueError):
+            pylink.frequency_sweep(m, ['wavelength_m'])
+        sweep = pylink.frequency_sweep(m, ['wavelength_m'], [1e9, 2e9])
+        assert np.allclose(m.speed_of_light_m_per_s / np.array([1e9, 2e9]),
+                           sweep['wavelength_m'])
+
+    def test_gain_table(self):
+        m = _model(gain_table=([400e6, 402e6], [3, 5]))
+        # 402.7MHz is past the end of the table
+        assert 5 == m.rx_antenna_peak_gain_dbi
+
+        sweep = pylink.frequency_sweep(m, ['rx_antenna_peak_gain_dbi',
+                                           'rx_antenna_gain_pattern'])
+        assert np.allclose([3, 4.5, 5], sweep['rx_antenna_peak_gain_dbi'])
+        assert (3, 360) == sweep['rx_antenna_gain_pattern'].shape
+        self._check_matches_scalar(m)
+
+    def test_gain_table_patterns(self):
+        low = [0]*180 + [6]*180
+        high = [2]*360
+        m = _model(gain_table=([400e6, 404e6], [low, high]))
+        sweep = pylink.frequency_sweep(m, ['rx_antenna_gain_pattern',
+                                           'rx_antenna_average_gain_dbi'],
+                                       [400e6, 402e6, 404e6])
+        patterns = sweep['rx_antenna_gain_pattern']
+        assert np.allclose(patterns[0], low)
+        assert np.allclose(patterns[1], (np.array(low) + high) / 2.0)
+        assert np.allclose(patterns[2], high)
+        assert np.allclose([3, 2.5, 2], sweep['rx_antenna_average_gain_dbi'])
+
+    def test_bad_gain_table(self):
+        with pytest.raises(ValueError):
+            pylink.Antenna(gain_table=([402e6, 400e6], [1, 2]))
+        with pytest.raises(ValueError):
+            pylink.Antenna(gain_table=([400e6, 402e6], [1]))
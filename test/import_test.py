@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import subprocess
+import sys
+
+import pylink
+import pytest
+
+
+def _loaded_after(code):
+    probe = '%s\nimport sys\nprint(",".join(sorted(sys.modules)))' % code
+    out = subprocess.check_output([sys.executable, '-c', probe])
+    return out.decode().strip().split(',')
+
+
+class TestImport(object):
+
+    def test_import_is_light(self):
+        loaded = _loaded_after('import pylink')
+        for name in ['matplotlib', 'scipy', 'jinja2']:
+            assert name not in loaded, "%s imported eagerly" % name
+
+    def test_model_is_light(self):
+        code = '\n'.join([
+            'import pylink',
+            'm = pylink.DAGModel([pylink.Geometry(),',
+            '                     pylink.Antenna(is_rx=True),',
+            '                     pylink.Antenna(is_rx=False)])',
+            'm.slant_range_km',
+            'm.tx_antenna_gain_dbi',
+            ])
+        loaded = _loaded_after(code)
+        for name in ['matplotlib', 'scipy', 'jinja2']:
+            assert name not in loaded, "%s imported eagerly" % name
+
+    def test_lazy_names(self):
+        assert pylink.Report.__name__ == 'Report'
+        assert pylink.CanonicalPFDFigure.__name__ == 'CanonicalPFDFigure'
+        assert 'Report' in dir(pylink)
+        with pytest.raises(AttributeError):
+            pylink.NotANode
@@ -1,9 +1,15 @@
 #!/usr/bin/env python
 
+import copy
+import pickle
+import sys
+
+import numpy as np
 import pylink
 import pytest
 
-from testutils import model
+from pylink.model import _MAX_DEPTH
+from testutils import model, tributaries
 
 
 class TestModel(object):
@@ -357,3 +363,705 @@ class TestModel(object):
                         10.0, 0.0, -1.0,
                         rounds=4)
         assert abs(b - 10.0) < 1e-4
+
+    def _observed_deps(self, m):
+        m._deps = {}
+        m.clear_cache()
+        for node in m.nodes():
+            m.cached_calculate(node)
+        return m._deps
+
+    def test_declared_dependencies_cover_observed(self, model):
+        declared = dict((k, dict(v)) for k, v in model._deps.items())
+        assert len(declared)
+
+        for tracking in (True, False):
+            m = pylink.DAGModel(tributaries(
+                rx_antenna=dict(tracking=tracking),
+                tx_antenna=dict(tracking=not tracking)))
+            observed = self._observed_deps(m)
+            for dep, inputs in observed.items():
+                for node in inputs:
+                    assert node in declared.get(dep, {}), (
+                        '%s -> %s not declared' % (m.node_name(dep),
+                                                   m.node_name(node)))
+
+    def test_declared_dependencies_ignored_when_replaced(self):
+        def __slant_range_km(model):
+            return model.fixed_range_km
+
+        m = pylink.DAGModel([pylink.Geometry()],
+                            slant_range_km=__slant_range_km,
+                            fixed_range_km=1000)
+        e = m.enum
+        assert e.slant_range_km not in m._deps
+        assert 1000 == m.slant_range_km
+        assert [e.fixed_range_km] == list(m._deps[e.slant_range_km])
+
+    def test_declared_invalidation_before_calculation(self, model):
+        e = model.enum
+
+        # The graph is known without computing anything, although it
+        # isn't mapped out until something needs it
+        assert e.link_margin_db in model._deps
+        assert model._deps_are_stale
+        assert (set([e.rx_antenna_noise_temp_k, e.link_margin_db])
+                <= set(model._affected([e.rx_antenna_noise_temp_k])))
+        assert not model._deps_are_stale
+
+        model.link_margin_db
+        assert not model._deps_are_stale
+
+    def test_trace_dependencies(self):
+        def __a(model):
+            return model.b + model.c
+
+        def __b(model):
+            return model.c * 2
+
+        m = pylink.DAGModel(a=__a, b=__b, c=1)
+        e = m.enum
+        assert {} == m._deps
+
+        m.trace_dependencies()
+        assert {} == m._cache
+        assert set([e.b, e.c]) == set(m._deps[e.a])
+        assert set([e.c]) == set(m._deps[e.b])
+        assert set([e.a, e.b]) == set(m._clients[e.c])
+
+    def test_trace_dependencies_fork(self):
+        def __a(model):
+            return model.b + 1
+
+        def __b(model):
+            return model.c * 2
+
+        m = pylink.DAGModel(a=__a, b=__b, c=1)
+        e = m.enum
+        assert 3 == m.a
+        f = m.fork()
+        f.trace_dependencies()
+        assert e.b in f._deps[e.a]
+
+        # The fork still has its own cache, over its parent's
+        assert isinstance(f._cache, type(m.fork()._cache))
+        f.override(e.c, 2)
+        assert 5 == f.a
+        assert 3 == m.a
+
+    def test_trace_dependencies_memo(self):
+        def __a(model):
+            return model.b + 1
+
+        m = pylink.DAGModel(a=__a, b=1)
+        e = m.enum
+        m.enable_memo()
+        assert 2 == m.a
+        m.clear_cache()
+        assert 2 == m.a
+        assert 1 == m.memo_stats()['size']
+
+        # Memo hits mustn't hide the calculators from the trace
+        m._deps.clear()
+        m.trace_dependencies()
+        assert set([e.b]) == set(m._deps[e.a])
+        assert 1 == m.memo_stats()['size']
+
+    def test_known_edges_not_rewritten(self, model):
+        calls = []
+        orig = model._add_dependency_impl
+
+        def _add(node, dep):
+            calls.append((node, dep,))
+            orig(node, dep)
+
+        # The budget declares its dependencies, so nothing is recorded
+        # while calculating it, let alone while reading it back
+        model._add_dependency_impl = _add
+        model.link_margin_db
+        n_edges = model._n_edges
+        model.clear_cache()
+        model.link_margin_db
+        assert [] == calls
+        assert n_edges == model._n_edges
+
+        def __a(m):
+            return m.b + m.c
+
+        m = pylink.DAGModel(a=__a, b=1, c=2)
+        e = m.enum
+        orig = m._add_dependency_impl
+        m._add_dependency_impl = _add
+        assert 3 == m.a
+        assert set([(e.b, e.a), (e.c, e.a)]) == set(calls)
+        del calls[:]
+        m.override(e.b, 2)
+        assert 4 == m.a
+        assert [] == calls
+
+    def test_cache_hit_fast_path(self):
+        def __a(m):
+            return m.b + 1
+
+        def __b(m):
+            return m.c * 2
+
+        m = pylink.DAGModel(a=__a, b=__b, c=1)
+        e = m.enum
+        assert 2 == m.b
+
+        # A calculator reading a cached input still records the edge
+        assert 3 == m.a
+        assert e.a in m._affected([e.b])
+        assert 0 == m._n_evaluating
+
+        # Outside of any calculation, a hit doesn't touch the thread
+        # state at all
+        tls = m._tls
+        del m._tls
+        try:
+            assert 3 == m.a
+        finally:
+            m._tls = tls
+        m.override(e.c, 2)
+        assert 5 == m.a
+
+    def test_evaluation_count_unwinds(self):
+        def __a(m):
+            raise ValueError()
+
+        m = pylink.DAGModel(a=__a)
+        with pytest.raises(ValueError):
+            m.a
+        assert 0 == m._n_evaluating
+
+    def _chain(self, n, loop=False):
+        def _stage(i):
+            def __stage(m):
+                return m.cached_calculate(m.node_num('s%d' % (i - 1))) + 1
+            return __stage
+
+        nodes = dict(('s%d' % i, _stage(i)) for i in range(1, n))
+        nodes['s0'] = _stage(n) if loop else 0
+        return pylink.DAGModel(**nodes)
+
+    def test_long_chain(self):
+        n = 5 * sys.getrecursionlimit()
+        m = self._chain(n)
+        assert n - 1 == m.cached_calculate(m.node_num('s%d' % (n - 1)))
+        assert [] == m._stack
+        assert set([m.enum.s0]) == set(m._deps[m.enum.s1])
+        m.override(m.enum.s0, 1)
+        assert n == m.cached_calculate(m.node_num('s%d' % (n - 1)))
+
+        m = self._chain(n, loop=True)
+        with pytest.raises(pylink.LoopException):
+            m.cached_calculate(m.node_num('s10'))
+        assert [] == m._stack
+
+    def test_long_chain_in_scope(self):
+        # A calculator opening a scope and then reading a chain long
+        # enough to be deferred, as best_modulation_code does
+        def _stage(i):
+            def __stage(m):
+                return m.cached_calculate(m.node_num('s%d' % (i - 1))) + m.x
+            return __stage
+
+        n = 3 * _MAX_DEPTH
+        nodes = dict(('s%d' % i, _stage(i)) for i in range(1, n))
+        last = 's%d' % (n - 1)
+
+        def __top(m):
+            with m.scoped({m.enum.x: 1}):
+                inner = m.cached_calculate(m.node_num(last))
+            return (inner, m.cached_calculate(m.node_num(last)),)
+
+        m = pylink.DAGModel(s0=0, x=0, top=__top, **nodes)
+        assert (n - 1, 0,) == m.top
+        assert 0 == getattr(m, last)
+        assert [] == m._stack
+        assert 0 == m._tls.state.base
+
+    def test_flattened_maps(self, model):
+        model.link_margin_db
+        model._map_dependencies()
+
+        def _reachable(node, edges):
+            seen = set()
+            todo = [node]
+            while todo:
+                for dep in edges.get(todo.pop(), ()):
+                    if dep not in seen:
+                        seen.add(dep)
+                        todo.append(dep)
+            return seen
+
+        clients = dict((node, []) for node in model.nodes())
+        for node, inputs in model._deps.items():
+            for dep in inputs:
+                clients[dep].append(node)
+
+        assert set(model._deps) == set(model._flat_deps)
+        for node in model._deps:
+            assert (_reachable(node, model._deps)
+                    == set(model._flat_deps[node]))
+        for node in model.nodes():
+            assert _reachable(node, clients) == set(model._clients[node])
+
+        names = model._client_names['rx_antenna_noise_temp_k']
+        assert 'link_margin_db' in names
+
+    def test_flattened_maps_with_cycle(self):
+        m = pylink.DAGModel(a=1, b=2, c=3, d=4)
+        e = m.enum
+        m.declare_dependencies({'a': ['b'], 'b': ['c'], 'c': ['b', 'd']})
+        m._map_dependencies()
+        assert set([e.b, e.c, e.d]) == set(m._flat_deps[e.a])
+        assert set([e.b, e.c, e.d]) == set(m._flat_deps[e.b])
+        assert set([e.a, e.b, e.c]) == set(m._clients[e.d])
+        assert [] == m._clients[e.a]
+
+    def test_failed_calculation_unwinds_stack(self):
+        def __a(m):
+            return m.b
+
+        def __b(m):
+            raise ValueError()
+
+        m = pylink.DAGModel(a=__a, b=__b, c=1)
+        with pytest.raises(ValueError):
+            m.a
+        assert [] == m._stack
+        assert 1 == m.c
+        # Nothing is recorded as an input of the failed calculation
+        assert m.enum.c not in m._deps.get(m.enum.b, {})
+
+    def test_topological_order(self, model):
+        order = model.topological_order()
+        assert sorted(order) == sorted(model.nodes())
+
+        position = dict((node, i) for i, node in enumerate(order))
+        for dep, inputs in model._deps.items():
+            for node in inputs:
+                assert position[node] < position[dep]
+
+        m = pylink.DAGModel(a=1, b=2)
+        e = m.enum
+        m.declare_dependencies({'a': ['b'], 'b': ['a']})
+        with pytest.raises(pylink.LoopException):
+            m.topological_order()
+
+    def test_scoped_override(self, model):
+        e = model.enum
+        orig_el = model.min_elevation_deg
+        orig_margin = model.link_margin_db
+
+        with model.scoped({e.min_elevation_deg: 5}):
+            assert model.min_elevation_deg == 5
+            assert model.link_margin_db != orig_margin
+            model.override(e.link_margin_db, 3)
+            assert model.is_overridden(e.link_margin_db)
+            assert model.link_margin_db == 3
+
+            # nested scopes see their parent's overrides
+            with model.scoped():
+                model.revert(e.link_margin_db)
+                assert not model.is_overridden(e.link_margin_db)
+                assert model.link_margin_db != orig_margin
+            assert model.link_margin_db == 3
+
+        assert model.min_elevation_deg == orig_el
+        assert model.link_margin_db == orig_margin
+        assert not model.is_overridden(e.link_margin_db)
+
+    def test_scoped_revert_of_shared_override(self):
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1)
+        e = m.enum
+        m.override(e.A, 42)
+
+        with m.scoped():
+            m.revert(e.A)
+            assert m.A == 2
+            with pytest.raises(AttributeError):
+                m.revert(e.B)
+        assert m.A == 42
+
+    def test_concurrent_scoped_readers(self, model):
+        import threading
+
+        e = model.enum
+        expected = {}
+        for el in range(0, 90, 10):
+            with model.scoped({e.min_elevation_deg: el}):
+                expected[el] = model.link_margin_db
+        model.clear_cache()
+
+        errors = []
+
+        def reader(offset):
+            try:
+                for i in range(20):
+                    el = ((i + offset) % 9) * 10
+                    with model.scoped({e.min_elevation_deg: el}):
+                        if model.link_margin_db != expected[el]:
+                            errors.append(el)
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=reader, args=(i,))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [] == errors
+        assert not model.is_overridden(e.min_elevation_deg)
+
+    def test_concurrent_override(self):
+        import threading
+
+        started = threading.Event()
+        cleared = threading.Event()
+        read = threading.Event()
+
+        def __b(m):
+            return m.a * 10
+
+        def __c(m):
+            started.set()
+            cleared.wait(5)
+            retval = m.b + 1
+            read.set()
+            return retval
+
+        m = pylink.DAGModel(a=1, b=__b, c=__c)
+        e = m.enum
+        cleared.set()
+        assert 11 == m.c
+        m.clear_cache()
+        for event in (started, cleared, read):
+            event.clear()
+
+        # Have the reader calculate b while the override is under way,
+        # just after the cache has been invalidated
+        orig = m._cache_clear
+
+        def _cache_clear(*args, **kwargs):
+            orig(*args, **kwargs)
+            cleared.set()
+            read.wait(5)
+
+        results = []
+        reader = threading.Thread(target=lambda: results.append(m.c))
+        reader.start()
+        assert started.wait(5)
+        m._cache_clear = _cache_clear
+        m.override(e.a, 2)
+        reader.join()
+
+        assert 2 == m.a
+        assert 20 == m.b
+        assert 21 == m.c
+
+    def test_scoped_values_shared_when_independent(self):
+        m = pylink.DAGModel(A=lambda m: m.B + 1,
+                            B=lambda m: m.C * 2,
+                            C=1,
+                            D=lambda m: m.C + 10)
+        e = m.enum
+
+        # The dependencies are unknown until they're observed, so
+        # nothing computed here may leak into the shared cache.
+        with m.scoped({e.C: 5}):
+            assert 11 == m.A
+            assert 15 == m.D
+        assert {} == m._cache
+        assert 3 == m.A
+
+        # Now the graph is known, so values not derived from the
+        # overrides are published.
+        with m.scoped({e.B: 7}):
+            assert 8 == m.A
+            assert 11 == m.D
+        assert 11 == m._cache[e.D]
+        assert 3 == m._cache[e.A]
+
+    def test_memo(self):
+        calls = []
+
+        def f_A(m):
+            calls.append('A')
+            return m.B * 2
+
+        def f_B(m):
+            calls.append('B')
+            return m.C + m.D
+
+        m = pylink.DAGModel(A=f_A, B=f_B, C=1, D=10)
+        e = m.enum
+        assert m.memo_stats() is None
+        m.enable_memo(maxsize=4)
+
+        # The first round discovers the dependencies
+        assert 22 == m.A
+        m.override(e.C, 2)
+        assert 24 == m.A
+        m.override(e.C, 1)
+        assert 22 == m.A
+        assert 6 == len(calls)
+
+        # Going back to a previous scenario is a memo hit
+        m.override(e.C, 2)
+        assert 24 == m.A
+        m.override(e.C, 1)
+        assert 22 == m.A
+        assert 6 == len(calls)
+        stats = m.memo_stats()
+        assert 2 == stats['hits']
+        assert 4 == stats['size']
+
+        # Scoped overrides are keyed as well
+        with m.scoped({e.C: 2}):
+            assert 24 == m.A
+        assert 6 == len(calls)
+
+        # Least recently used values are dropped first
+        m.override(e.C, 3)
+        assert 26 == m.A
+        assert 8 == len(calls)
+        assert 2 == m.memo_stats()['evictions']
+
+        m.clear_cache()
+        assert 0 == m.memo_stats()['size']
+        m.disable_memo()
+        assert m.memo_stats() is None
+
+    def test_memo_unhashable(self):
+        m = pylink.DAGModel(A=lambda m: sum(m.B), B=[1, 2])
+        e = m.enum
+        m.enable_memo()
+        assert 3 == m.A
+        m.override(e.B, [3])
+        assert 3 == m.A
+        assert 1 == m.memo_stats()['size']
+
+        # Compared by identity, so an equal list is a different key
+        m.override(e.B, [3])
+        assert 3 == m.A
+        assert 0 == m.memo_stats()['hits']
+
+    def test_memo_unknown_dependencies(self):
+        # Nothing can be filed before the dependencies are known
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1)
+        e = m.enum
+        m.enable_memo()
+        assert 2 == m.A
+        assert 0 == m.memo_stats()['size']
+        m.override(e.B, 2)
+        assert 3 == m.A
+        assert 1 == m.memo_stats()['size']
+
+    def test_pickle(self, model):
+        margin = model.link_margin_db
+        model.enable_memo(100)
+        other = pickle.loads(pickle.dumps(model))
+        assert len(model._cache) == len(other._cache)
+        assert margin == other.link_margin_db
+        assert 100 == other.memo_stats()['maxsize']
+
+        e = other.enum
+        other.override(e.rain_loss_db, 10)
+        assert other.link_margin_db < margin
+        assert margin == model.link_margin_db
+
+    def test_getattr_before_init(self):
+        # Nothing is set up yet while unpickling or copying
+        m = pylink.DAGModel.__new__(pylink.DAGModel)
+        with pytest.raises(AttributeError):
+            m.link_margin_db
+        assert not hasattr(m, '__deepcopy__')
+
+    def test_copy(self):
+        pattern = np.zeros(360)
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1, C=pattern)
+        e = m.enum
+        assert 2 == m.A
+        m.enable_memo()
+
+        c = m.copy()
+        assert c._cache == m._cache
+        assert c.C is pattern
+        assert c._calc is m._calc
+        assert 2 == c.A
+        assert copy.copy(m).A == 2
+
+        # Values, caches and the structures are independent afterwards
+        c.override(e.B, 5)
+        assert 6 == c.A
+        assert 2 == m.A
+        m.accept_tribute({'A': lambda m: m.B * 10})
+        m.clear_cache()
+        assert 10 == m.A
+        assert 6 == c.A
+        c.set_meta(e.A, 'unit', 'dB')
+        assert m.get_meta(e.A) is None
+
+        m.declare_dependencies({'A': ['C']})
+        assert e.C not in c._deps.get(e.A, {})
+
+    def test_fork(self, model):
+        e = model.enum
+        margin = model.link_margin_db
+        n_cached = len(model._cache)
+
+        alt = model.fork()
+        # Untouched nodes come straight from the parent's cache
+        assert 0 == len(alt._cache.keys())
+        assert margin == alt.link_margin_db
+        assert 0 == len(dict(alt._cache))
+
+        alt.override(e.rain_loss_db, model.rain_loss_db + 3)
+        assert abs(alt.link_margin_db - (margin - 3)) < 1e-9
+        assert margin == model.link_margin_db
+        assert n_cached == len(model._cache)
+        # Only what depends on the change was recomputed
+        assert e.slant_range_km not in dict(alt._cache)
+        assert e.link_margin_db in dict(alt._cache)
+
+        # Parent changes show through, unless the fork changed them
+        model.override(e.tx_power_at_pa_dbw, model.tx_power_at_pa_dbw + 1)
+        assert abs(model.link_margin_db - (margin + 1)) < 1e-9
+        assert abs(alt.link_margin_db - (margin - 2)) < 1e-9
+        model.override(e.rain_loss_db, 0)
+        assert abs(alt.link_margin_db - (margin - 2)) < 1e-9
+
+        alt.override(e.rain_loss_db, 0)
+        assert model.link_margin_db == alt.link_margin_db
+
+    def test_fork_revert_parent_override(self):
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1, C=lambda m: m.A * 2)
+        e = m.enum
+        m.override(e.A, 10)
+        assert 20 == m.C
+
+        alt = m.fork()
+        assert alt.is_overridden(e.A)
+        alt.revert(e.A)
+        assert not alt.is_overridden(e.A)
+        assert 4 == alt.C
+        assert 20 == m.C
+        assert e.A not in dict(alt._values)
+
+        m.revert(e.A)
+        assert 4 == m.C
+        alt.override(e.A, 5)
+        assert 10 == alt.C
+        assert 4 == m.C
+
+    def test_fork_of_fork(self):
+        m = pylink.DAGModel(A=lambda m: m.B + m.C, B=1, C=2)
+        e = m.enum
+        assert 3 == m.A
+        f1 = m.fork()
+        f1.override(e.B, 10)
+        f2 = f1.fork()
+        assert 12 == f2.A
+        f2.override(e.C, 20)
+        assert 30 == f2.A
+        assert 12 == f1.A
+        assert 3 == m.A
+
+        m.override(e.C, 5)
+        assert 15 == f1.A
+        assert 30 == f2.A
+
+    def test_fork_parent_only_edges(self):
+        # The parent discovers A's inputs after the fork was made,
+        # and the fork has to learn them to invalidate its own D
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1,
+                            D=lambda m: m.A + m.E, E=0)
+        e = m.enum
+        alt = m.fork()
+        assert 2 == m.A
+        alt.override(e.E, 100)
+        assert 102 == alt.D
+        alt.override(e.B, 2)
+        assert 103 == alt.D
+        assert 2 == m.A
+
+        m.override(e.B, 5)
+        assert 103 == alt.D
+        alt2 = m.fork()
+        alt2.override(e.E, 1)
+        assert 7 == alt2.D
+
+    def test_fork_is_dropped(self):
+        import gc
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1)
+        alt = m.fork()
+        assert 1 == len(m._forks)
+        del alt
+        gc.collect()
+        assert 0 == len(m._forks)
+
+    def test_override_many(self, model):
+        e = model.enum
+        margin = model.link_margin_db
+        generation = model._generation
+
+        model.override_many({e.rain_loss_db: model.rain_loss_db + 1,
+                             e.tx_power_at_pa_dbw:
+                             model.tx_power_at_pa_dbw + 3})
+        assert generation + 1 == model._generation
+        assert abs(model.link_margin_db - (margin + 2)) < 1e-9
+
+        # Same values (and types) don't invalidate anything
+        n_cached = len(model._cache)
+        model.override_many({e.rain_loss_db: model.rain_loss_db,
+                             e.bitrate_hz: model.bitrate_hz})
+        assert generation + 1 == model._generation
+        assert n_cached == len(model._cache)
+
+        model.override_many({e.bitrate_hz: float(model.bitrate_hz)})
+        assert generation + 2 == model._generation
+
+    def test_override_many_reverts(self):
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1, C=lambda m: m.A * 2)
+        e = m.enum
+        m.override_many({e.A: 10, e.B: 5})
+        assert 20 == m.C
+        m.override_many({e.B: 6}, reverts=[e.A])
+        assert 14 == m.C
+        # Reverting something that isn't overridden is a no-op
+        m.override_many(reverts=[e.A])
+        with pytest.raises(AttributeError):
+            m.override_many({e.A: 3}, reverts=[e.B])
+
+        with m.scoped():
+            m.override_many({e.A: 1, e.B: 6})
+            assert 2 == m.C
+            m.override_many(reverts=[e.A])
+            assert 14 == m.C
+        assert 14 == m.C
+
+    def test_transaction(self):
+        m = pylink.DAGModel(A=lambda m: m.B + 1, B=1, C=lambda m: m.A * 2)
+        e = m.enum
+        m.override(e.A, 10)
+        assert 20 == m.C
+
+        with m.transaction({e.B: 5}, reverts=[e.A]):
+            assert 12 == m.C
+            assert not m.is_overridden(e.A)
+        assert 20 == m.C
+        assert 1 == m.B
+        assert m.is_overridden(e.A)
+
+        m.revert(e.A)
+        with pytest.raises(KeyError):
+            with m.transaction({e.A: 7}):
+                assert 14 == m.C
+                raise KeyError()
+        assert 4 == m.C
+        assert not m.is_overridden(e.A)
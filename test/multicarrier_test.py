@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+from testutils import perf, tributaries
+
+
+def _model(**kwargs):
+    return pylink.DAGModel(tributaries(
+        extra=[pylink.MultiCarrier(**kwargs)],
+        transmitter=dict(tx_power_at_pa_dbw=20)))
+
+
+class TestMultiCarrier(object):
+
+    def test_single_carrier_matches(self):
+        # One carrier with the budget's bitrate and code is the
+        # ordinary single-carrier budget
+        m = _model(bitrates_hz=[9600])
+        code = m.best_modulation_code
+        m.override(m.enum.carrier_codes, [code])
+        assert 1 == m.carrier_count
+        assert np.allclose([m.rx_ebn0_db], m.carrier_rx_ebn0_db)
+        assert np.allclose([m.cn0_db], m.carrier_cn0_db)
+        assert np.allclose([m.required_rx_bw_hz], m.carrier_required_rx_bw_hz)
+        assert np.allclose([m.pfd_dbw_per_m2_per_hz],
+                           m.carrier_pfd_dbw_per_m2_per_hz)
+        assert np.allclose([m.link_margin_db], m.carrier_link_margin_db)
+
+    def test_excess_noise_bandwidth(self):
+        m = _model(bitrates_hz=[9600, 19200])
+        m.override(m.enum.carrier_codes, [perf[1], perf[1]])
+        assert np.allclose([0, 0], m.carrier_excess_noise_bandwidth_loss_db)
+
+        # Both carriers demodulated through a 50 kHz filter
+        m.override(m.enum.rx_noise_bw_hz, 50e3)
+        bw = np.array([9600, 19200]) / perf[1].rx_eff
+        excess = pylink.to_db(50e3) - pylink.to_db(bw)
+        assert np.allclose(excess, m.carrier_excess_noise_bandwidth_loss_db)
+        assert np.allclose(perf[1].ebn0_db + m.implementation_loss_db
+                           + excess,
+                           m.carrier_required_ebn0_db)
+
+        # A single carrier matches the single-carrier budget
+        m = _model(bitrates_hz=[9600])
+        m.override(m.enum.rx_noise_bw_hz, 50e3)
+        code = m.best_modulation_code
+        m.override(m.enum.carrier_codes, [code])
+        assert np.allclose([m.required_ebn0_db], m.carrier_required_ebn0_db)
+        assert np.allclose([m.link_margin_db], m.carrier_link_margin_db)
+
+    def test_power_sharing(self):
+        m = _model(bitrates_hz=[9600, 9600, 19200, 1200],
+                   power_shares=[1, 1, 2, 0.5],
+                   intermod_backoff_db=3.0)
+        assert 4 == m.carrier_count
+        adjust = pylink.to_db(np.array([1, 1, 2, 0.5]) / 4.5) - 3.0
+        assert np.allclose(m.rx_power_dbw + adjust, m.carrier_rx_power_dbw)
+        assert np.allclose(m.tx_eirp_dbw + adjust, m.carrier_tx_eirp_dbw)
+
+        # Total carrier power is the backed off total
+        total = pylink.to_db(np.sum(pylink.from_db(m.carrier_rx_power_dbw)))
+        assert abs(total - (m.rx_power_dbw - 3.0)) < 1e-9
+
+        expected = (m.carrier_cn0_db
+                    - pylink.to_db(np.array([9600, 9600, 19200, 1200.])))
+        assert np.allclose(expected, m.carrier_rx_ebn0_db)
+        assert 39600 == m.carrier_total_bitrate_hz
+
+    @pytest.mark.parametrize('noise_bw_hz', [None, 2e5])
+    def test_code_selection(self, noise_bw_hz):
+        bitrates = [1e3, 1e5, 1e7]
+        m = _model(bitrates_hz=bitrates)
+        m.override(m.enum.rx_noise_bw_hz, noise_bw_hz)
+        margins = m.carrier_link_margin_db
+        codes = m.carrier_modulation_codes
+        assert 3 == len(codes)
+
+        def _excess(bitrate, c):
+            if noise_bw_hz is None:
+                return 0
+            return pylink.to_db(noise_bw_hz * c.rx_eff / bitrate)
+
+        table = m.modulation_performance_table
+        for margin, code, ebn0, bitrate in zip(margins, codes,
+                                               m.carrier_rx_ebn0_db,
+                                               bitrates):
+            available = ebn0 - m.implementation_loss_db
+            closing = [c for c in table
+                       if (available - c.ebn0_db - _excess(bitrate, c)
+                           >= m.target_margin_db)]
+            if closing:
+                assert code.tx_eff == max(c.tx_eff for c in closing)
+                assert margin >= m.target_margin_db
+            else:
+                assert code.ebn0_db == min(c.ebn0_db for c in table)
+
+        bw = np.array([1e3, 1e5, 1e7]) / [c.rx_eff for c in codes]
+        assert np.allclose(bw, m.carrier_required_rx_bw_hz)
+        assert (m.carriers_fit_allocation
+                == (m.carrier_occupied_bw_hz <= m.allocation_hz))
+
+    def test_intermod(self):
+        m = _model(bitrates_hz=[9600, 9600])
+        clean = m.carrier_cn0_db
+        m.override(m.enum.carrier_to_intermod_db, 20)
+        dirty = m.carrier_cn0_db
+        assert np.all(dirty < clean)
+
+        im0 = (m.rx_power_dbw - 20 - pylink.to_db(m.allocation_hz))
+        n0 = pylink.to_db(pylink.from_db(m.rx_n0_dbw_per_hz)
+                          + pylink.from_db(im0))
+        assert np.allclose(m.carrier_rx_power_dbw - n0, dirty)
+
+    def test_bad_args(self):
+        with pytest.raises(ValueError):
+            pylink.MultiCarrier([1, 2], codes=[perf[0]])
+        with pytest.raises(ValueError):
+            pylink.MultiCarrier([1, 2], power_shares=[1])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import multiprocessing.shared_memory
+
+import numpy as np
+import pylink
+import pytest
+
+from pylink import parallel
+
+from testutils import tributaries
+
+
+def _budget(power_dbw=3):
+    return pylink.DAGModel(tributaries(
+        transmitter=dict(tx_power_at_pa_dbw=power_dbw)))
+
+
+GRID = {'min_elevation_deg': np.linspace(5, 90, 11),
+        'rain_loss_db': np.linspace(0, 4, 5)}
+OUTPUTS = ['link_margin_db', 'rx_antenna_gain_pattern']
+
+
+class TestParallelSweep(object):
+
+    def _expected(self, power_dbw=3):
+        return _budget(power_dbw).sweep(GRID, OUTPUTS).collect().outputs
+
+    @pytest.mark.parametrize('workers', [1, 3])
+    def test_matches_serial(self, workers):
+        recipe = pylink.ModelRecipe(_budget, power_dbw=6)
+        out = pylink.parallel_sweep(recipe, GRID, OUTPUTS,
+                                    workers=workers, chunk_size=4)
+        expected = self._expected(6)
+        assert (55,) == out['link_margin_db'].shape
+        assert (55, 360) == out['rx_antenna_gain_pattern'].shape
+        for name in OUTPUTS:
+            assert np.allclose(expected[name].astype(float), out[name])
+
+    def test_zip_and_bare_factory(self):
+        grid = {'min_elevation_deg': [10, 20, 30],
+                'rain_loss_db': [0, 1, 2]}
+        out = pylink.parallel_sweep(_budget, grid, ['link_margin_db'],
+                                    mode='zip', workers=2, chunk_size=1)
+        m = _budget()
+        expected = m.sweep(grid, ['link_margin_db'], mode='zip').collect()
+        assert np.allclose(expected.outputs['link_margin_db'],
+                           out['link_margin_db'])
+
+    def test_empty(self):
+        out = pylink.parallel_sweep(_budget, {'rain_loss_db': []},
+                                    ['link_margin_db'])
+        assert 0 == len(out['link_margin_db'])
+
+    def test_pool_worker_releases_memory(self):
+        shm = multiprocessing.shared_memory.SharedMemory(create=True,
+                                                         size=8)
+        try:
+            buffers = {'link_margin_db': (shm.name, (1,), 'float64',)}
+            parallel._init_pool_worker(
+                pylink.ModelRecipe(_budget), {'rain_loss_db': [0]},
+                ['link_margin_db'], 'product', False, None, buffers)
+            worker = parallel._worker
+            assert parallel._finalizer.still_active()
+
+            # As run when the worker process exits
+            parallel._finalizer()
+            assert parallel._worker is None
+            assert not worker.arrays
+            assert all(s.buf is None for s in worker.shm)
+        finally:
+            shm.close()
+            shm.unlink()
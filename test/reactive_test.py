@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import pylink
+import pytest
+
+from testutils import model
+
+
+class TestReactor(object):
+
+    def _counting_model(self):
+        self.calls = {}
+
+        def _count(name, f):
+            def retval(m):
+                self.calls[name] = self.calls.get(name, 0) + 1
+                return f(m)
+            return retval
+
+        return pylink.DAGModel(a=1,
+                               b=2,
+                               c=_count('c', lambda m: m.a * 10),
+                               d=_count('d', lambda m: m.b * 10),
+                               e=_count('e', lambda m: m.c + m.d),
+                               f=_count('f', lambda m: -m.a))
+
+    def test_only_dirty_nodes(self):
+        m = self._counting_model()
+        r = pylink.Reactor(m, ['e'])
+        assert 30 == r.get('e')
+        assert {'c': 1, 'd': 1, 'e': 1} == self.calls
+
+        changes = []
+        r.subscribe(changes.append)
+        r.set('a', 2)
+        assert [{'e': 40}] == changes
+        assert {'c': 2, 'd': 1, 'e': 2} == self.calls
+
+        # f isn't watched, so it must not be computed
+        assert 'f' not in self.calls
+
+    def test_batch(self):
+        m = self._counting_model()
+        r = pylink.Reactor(m, ['c', 'e'])
+
+        changes = []
+        r.subscribe(changes.append)
+        e_changes = []
+        r.subscribe(e_changes.append, names=['e'])
+
+        with r.batch():
+            r.set('a', 3)
+            r.set('b', 3)
+            assert [] == changes
+        assert [{'c': 30, 'e': 60}] == changes
+        assert [{'e': 60}] == e_changes
+        assert {'c': 2, 'd': 2, 'e': 2} == self.calls
+
+    def test_unchanged_values(self):
+        m = self._counting_model()
+        r = pylink.Reactor(m, ['e'])
+
+        changes = []
+        handle = r.subscribe(changes.append)
+        r.set('a', 1)
+        assert [] == changes
+        assert {'c': 1, 'd': 1, 'e': 1} == self.calls
+
+        # c changes, but e doesn't, so nobody is told
+        with r.batch():
+            r.set('a', 2)
+            r.set('b', 1)
+        assert [] == changes
+        assert 30 == r.get('e')
+
+        r.unsubscribe(handle)
+        r.set('a', 5)
+        assert [] == changes
+        assert 60 == r.get('e')
+
+    def test_link_budget(self, model):
+        e = model.enum
+        r = pylink.Reactor(model, ['link_margin_db', 'cn0_db'])
+        margin = r.get('link_margin_db')
+
+        changes = []
+        r.subscribe(changes.append)
+        r.set('tx_power_at_pa_dbw', model.tx_power_at_pa_dbw + 1)
+        assert 1 == len(changes)
+        assert set(['link_margin_db', 'cn0_db']) == set(changes[0])
+        assert abs(changes[0]['link_margin_db'] - margin - 1) < 1e-9
+        assert model.link_margin_db == r.get('link_margin_db')
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import os
+import pickle
+import pylink
+import pytest
+
+from testutils import model
+
+
+limits = [(0, -150),
+          (5, -150),
+          (25, -140),
+          (90, -140)]
+
+
+class TestReport(object):
+
+    def _figures(self, m):
+        return [pylink.CanonicalPFDFigure(m, pfd_limits=limits),
+                pylink.ExpectedPFDFigure(m, pfd_limits=limits),
+                pylink.PFDvsBWFigure(m, pfd_limits=limits),
+                pylink.BitrateFigure(m, 'Bitrate')]
+
+    def test_render_job_leaves_model_alone(self, model):
+        e = model.enum
+        orig = model.min_elevation_deg
+        orig_margin = model.link_margin_db
+
+        for fig in self._figures(model):
+            fig.render_job(dname='.')
+
+        assert model.min_elevation_deg == orig
+        assert model.link_margin_db == orig_margin
+
+    def test_render_job_is_picklable(self, model):
+        jobs = [f.render_job(dname='.') for f in self._figures(model)]
+        jobs.append(model.rx_antenna_obj.pattern_render_job('rx.png'))
+        jobs.append(model.tx_antenna_obj.pattern_render_job('tx.png'))
+        for job in jobs:
+            pickle.loads(pickle.dumps(job))
+
+    def test_render_all_serial(self, model, tmpdir):
+        dname = str(tmpdir)
+        jobs = [f.render_job(dname=dname) for f in self._figures(model)]
+        paths = pylink.render_all(jobs)
+        assert paths == [job.path for job in jobs]
+        for path in paths:
+            assert os.path.exists(path)
+
+    def test_render_all_parallel(self, model, tmpdir):
+        dname = str(tmpdir)
+        jobs = [f.render_job(dname=dname) for f in self._figures(model)]
+        path = os.path.join(dname, 'pattern.png')
+        jobs.append(model.tx_antenna_obj.pattern_render_job(path))
+        paths = pylink.render_all(jobs, processes=2)
+        assert paths == [job.path for job in jobs]
+        for path in paths:
+            assert os.path.exists(path)
+
+    def test_figure_cache(self, model, tmpdir):
+        e = model.enum
+        dname = str(tmpdir)
+
+        cache = pylink.FigureCache()
+        fig = pylink.CanonicalPFDFigure(model, pfd_limits=limits)
+        path = fig.plot(dname=dname, cache=cache)
+        assert [path] == cache.rendered
+        assert [] == cache.reused
+
+        # Nothing changed, so it should not be drawn again
+        cache = pylink.FigureCache()
+        fig.plot(dname=dname, cache=cache)
+        assert [] == cache.rendered
+        assert [path] == cache.reused
+
+        # A relevant input changed, so it must be redrawn
+        model.override(e.tx_power_at_pa_dbw, 10)
+        cache = pylink.FigureCache()
+        fig.plot(dname=dname, cache=cache)
+        assert [path] == cache.rendered
+
+        # A removed file must be redrawn as well
+        os.unlink(path)
+        cache = pylink.FigureCache()
+        fig.plot(dname=dname, cache=cache)
+        assert [path] == cache.rendered
+
+    def test_figure_cache_antenna(self, model, tmpdir):
+        path = os.path.join(str(tmpdir), 'pattern.png')
+        antenna = model.tx_antenna_obj
+
+        cache = pylink.FigureCache()
+        antenna.plot_pattern(path, cache=cache)
+        antenna.plot_pattern(path, cache=cache)
+        antenna.plot_pattern(path, cache=cache, title='Another Title')
+        assert [path, path] == cache.rendered
+        assert [path] == cache.reused
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import pylink
+import pytest
+
+from testutils import model, tributaries
+
+
+class TestSchema(object):
+
+    def test_same_as_model(self):
+        schema = pylink.ModelSchema(tributaries())
+        a = schema.new_model()
+        b = pylink.DAGModel(tributaries())
+        for node in b.nodes():
+            name = b.node_name(node)
+            assert a.node_num(name) == node
+            value = getattr(b, name)
+            if isinstance(value, float):
+                assert getattr(a, name) == value
+
+    def test_shared_structure(self):
+        schema = pylink.ModelSchema(tributaries())
+        a = schema.new_model()
+        b = schema.new_model(min_elevation_deg=20)
+        assert a.enum is b.enum is schema.enum
+        assert a._calc is b._calc
+        assert a._deps is b._deps
+        assert a._values is not b._values
+        assert 10 == a.min_elevation_deg
+        assert 20 == b.min_elevation_deg
+
+        # Evaluation with fully declared dependencies copies nothing
+        a.link_margin_db
+        assert a._deps is schema._deps
+
+    def test_copy_on_write(self):
+        schema = pylink.ModelSchema(a=1, b=lambda m: m.a + 1)
+        m = schema.new_model()
+        other = schema.new_model()
+        e = schema.enum
+
+        # New edges are observed for this model only
+        assert 2 == m.b
+        assert e.a in m._deps[e.b]
+        assert e.b not in schema._deps
+        assert e.b not in other._deps
+
+        m.set_meta(e.a, 'part', 'x')
+        assert m.get_meta(e.a) == {'part': 'x'}
+        assert other.get_meta(e.a) is None
+
+        m.accept_tribute({'b': lambda m: m.a + 2,
+                          'a': pylink.Normal(1, 1)})
+        m.clear_cache()
+        assert 3 == m.b
+        assert 2 == other.b
+        assert other.get_distribution(e.a) is None
+
+        m.override(e.a, 5)
+        assert 7 == m.b
+        assert 1 == other.a
+
+    def test_meta_inner_dict(self):
+        schema = pylink.ModelSchema(a=pylink.TaggedAttribute(1, part='x'))
+        m = schema.new_model()
+        e = schema.enum
+        m.set_meta(e.a, 'part', 'y')
+        assert 'y' == m.get_meta(e.a)['part']
+        assert 'x' == schema.new_model().get_meta(e.a)['part']
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import pylink
+import pytest
+
+from pylink.sensitivity import upstream_inputs
+from testutils import model
+
+
+def _f(m):
+    return m.a * m.b + m.c**2
+
+
+class TestSensitivity(object):
+
+    def _simple(self):
+        return pylink.DAGModel(a=2.0, b=3.0, c=4, d=True, label='x', f=_f)
+
+    def test_upstream_inputs(self):
+        m = self._simple()
+        assert ['a', 'b', 'c'] == upstream_inputs(m, 'f')
+
+    def test_analytic(self):
+        m = self._simple()
+        orig = dict(m._values)
+        s = pylink.sensitivity(m, 'f')
+        assert 22 == s.nominal
+        assert abs(s.derivatives['a'] - 3) < 1e-6
+        assert abs(s.derivatives['b'] - 2) < 1e-6
+        assert abs(s.derivatives['c'] - 8) < 1e-6
+        assert ['c', 'a', 'b'] == [name for name, d in s.ranked()]
+
+        # The model is left alone
+        assert 22 == m.f
+        assert orig == m._values
+
+    def test_link_margin(self, model):
+        nominal = model.link_margin_db
+        s = pylink.sensitivity(model, 'link_margin_db')
+        assert abs(s.derivatives['tx_power_at_pa_dbw'] - 1) < 1e-6
+        assert abs(s.derivatives['rain_loss_db'] + 1) < 1e-6
+        assert abs(s.derivatives['implementation_loss_db'] + 1) < 1e-6
+        assert nominal == model.link_margin_db
+
+    def test_tornado(self, model):
+        model.accept_tribute({'rain_loss_db': pylink.Normal(0.5, 2.0)})
+        model.clear_cache()
+
+        bars = pylink.tornado(model, 'link_margin_db',
+                              deltas={'tx_power_at_pa_dbw': 0.5})
+        by_name = dict((b.name, b) for b in bars)
+        assert abs(by_name['rain_loss_db'].swing - 4) < 1e-9
+        assert abs(by_name['tx_power_at_pa_dbw'].swing - 1) < 1e-9
+        assert by_name['tx_power_at_pa_dbw'].high_output > \
+            by_name['tx_power_at_pa_dbw'].low_output
+
+        swings = [b.swing for b in bars]
+        assert sorted(swings, reverse=True) == swings
+
+        m = self._simple()
+        bars = pylink.tornado(m, 'f', rel_delta=0.5)
+        assert 'c' == bars[0].name
+        assert abs(bars[0].high_output - (6 + 36)) < 1e-9
+        assert abs(bars[0].low_output - (6 + 4)) < 1e-9
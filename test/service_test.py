@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import asyncio
+import json
+
+import pylink
+import pytest
+
+from pylink.service import BudgetService
+from pylink.service import ServiceError
+from testutils import model
+
+
+def _request(port, method, path, body=None):
+    async def _go():
+        (reader, writer,) = await asyncio.open_connection('127.0.0.1', port)
+        payload = b'' if body is None else json.dumps(body).encode()
+        head = ['%s %s HTTP/1.1' % (method, path),
+                'Host: localhost',
+                'Content-Length: %d' % len(payload),
+                'Connection: close',
+                '', '']
+        writer.write('\r\n'.join(head).encode() + payload)
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        (head, payload,) = data.split(b'\r\n\r\n', 1)
+        status = int(head.split()[1])
+        return (status, json.loads(payload.decode()),)
+    return _go()
+
+
+def _serve(service, *requests):
+    async def _go():
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        retval = []
+        async with server:
+            for r in requests:
+                retval.append(await _request(port, *r))
+        return retval
+    return asyncio.run(_go())
+
+
+class TestService(object):
+
+    def test_evaluate(self, model):
+        e = model.enum
+        orig_margin = model.link_margin_db
+        with model.scoped({e.min_elevation_deg: 10}):
+            expected = model.link_margin_db
+
+        service = BudgetService({'uplink': model}, pool_size=2)
+        request = {'budget': 'uplink',
+                   'nodes': ['link_margin_db', 'min_elevation_deg'],
+                   'overrides': {'min_elevation_deg': 10}}
+        ((status, response,),) = _serve(service, ('POST', '/evaluate',
+                                                  request))
+        assert 200 == status
+        assert expected == response['values']['link_margin_db']
+        assert 10 == response['values']['min_elevation_deg']
+
+        # The shared model must not have been touched
+        assert orig_margin == model.link_margin_db
+
+    def test_factory_pool(self, model):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return model
+
+        service = BudgetService({'a': factory, 'b': factory}, pool_size=3)
+        assert 6 == len(calls)
+        assert ['a', 'b'] == service.budgets()
+
+    def test_errors(self, model):
+        service = BudgetService({'uplink': model}, pool_size=1)
+        responses = _serve(
+            service,
+            ('POST', '/evaluate', {'budget': 'nope', 'nodes': []}),
+            ('POST', '/evaluate', {'budget': 'uplink', 'nodes': ['nope']}),
+            ('POST', '/evaluate', {'budget': 'uplink', 'nodes': 'x'}),
+            ('GET', '/evaluate'),
+            ('GET', '/nope'),
+            ('POST', '/evaluate', {'budget': ['uplink'], 'nodes': []}),
+            ('POST', '/evaluate', {'budget': {}, 'nodes': []}),
+            ('POST', '/evaluate', {'budget': 'uplink',
+                                   'nodes': ['link_margin_db'],
+                                   'overrides': {'min_elevation_deg': 'x'}}))
+        assert ([404, 400, 400, 405, 404, 400, 400, 400]
+                == [r[0] for r in responses])
+        assert 'nope' in responses[0][1]['error']
+        assert 'overrides' in responses[-1][1]['error']
+
+        # A failure must not leak the pooled model
+        ((status, response,),) = _serve(
+            service,
+            ('POST', '/evaluate', {'budget': 'uplink',
+                                   'nodes': ['link_margin_db']}))
+        assert 200 == status
+
+    def test_calculator_error(self):
+        def __broken(m):
+            return m.no_such_attribute
+
+        model = pylink.DAGModel(broken=__broken)
+        service = BudgetService({'uplink': model}, pool_size=1)
+        ((status, response,),) = _serve(
+            service,
+            ('POST', '/evaluate', {'budget': 'uplink',
+                                   'nodes': ['broken']}))
+        assert 500 == status
+        assert 'AttributeError' in response['error']
+
+    def test_cancelled_leader(self, model):
+        service = BudgetService({'uplink': model}, pool_size=1)
+        request = {'budget': 'uplink',
+                   'nodes': ['link_margin_db'],
+                   'overrides': {'min_elevation_deg': 20}}
+
+        async def _go():
+            # Holding the only model keeps the leader waiting for it
+            service._init_pools()
+            held = await service._pools['uplink'].get()
+            leader = asyncio.ensure_future(service.evaluate(request))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(service.evaluate(dict(request)))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(ServiceError) as err:
+                await asyncio.wait_for(waiter, 5)
+            service._pools['uplink'].put_nowait(held)
+            return err.value
+        err = asyncio.run(_go())
+        assert 503 == err.status
+        assert 0 == service.stats()['inflight']
+
+    def test_coalescing(self, model):
+        service = BudgetService({'uplink': model}, pool_size=2)
+        request = {'budget': 'uplink',
+                   'nodes': ['link_margin_db'],
+                   'overrides': {'min_elevation_deg': 20}}
+        other = {'budget': 'uplink',
+                 'nodes': ['link_margin_db'],
+                 'overrides': {'min_elevation_deg': 30}}
+
+        async def _go():
+            return await asyncio.gather(service.evaluate(request),
+                                        service.evaluate(dict(request)),
+                                        service.evaluate(other))
+        (a, b, c,) = asyncio.run(_go())
+        assert a['values'] == b['values']
+        assert a['values'] != c['values']
+
+        stats = service.stats()
+        assert 3 == stats['requests']
+        assert 2 == stats['evaluated']
+        assert 1 == stats['coalesced']
+        assert 0 == stats['inflight']
+
+    def test_stats_and_budgets(self, model):
+        service = BudgetService({'uplink': model}, pool_size=2)
+        request = {'budget': 'uplink', 'nodes': ['link_margin_db']}
+        responses = _serve(service,
+                           ('POST', '/evaluate', request),
+                           ('GET', '/budgets'),
+                           ('GET', '/stats'))
+        assert {'budgets': ['uplink']} == responses[1][1]
+
+        stats = responses[2][1]
+        assert 1 == stats['requests']
+        assert 1 == stats['latency_s']['window']
+        assert stats['latency_s']['p50'] > 0
+        assert stats['budgets']['uplink']['cached_nodes'] > 0
+        assert 0 == stats['budgets']['uplink']['cache_hits']
+        assert 1 == stats['budgets']['uplink']['cache_misses']
+        assert 2 == stats['budgets']['uplink']['idle']
+
+        # Cached unless overridden
+        request = {'budget': 'uplink',
+                   'nodes': ['link_margin_db', 'min_elevation_deg']}
+        responses = _serve(service,
+                           ('POST', '/evaluate', request),
+                           ('POST', '/evaluate',
+                            dict(request, overrides={'rain_loss_db': 1})),
+                           ('GET', '/stats'))
+        stats = responses[2][1]
+        assert 3 == stats['budgets']['uplink']['cache_hits']
+        assert 2 == stats['budgets']['uplink']['cache_misses']
+
+    def test_lazy_name(self):
+        assert pylink.BudgetService is BudgetService
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import os
+import pickle
+import numpy as np
+import pylink
+import pytest
+
+from testutils import model
+
+
+def _same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    if isinstance(a, pylink.Code):
+        return a.name == b.name
+    if isinstance(a, list):
+        return len(a) == len(b)
+    if isinstance(a, dict):
+        return sorted(a.keys()) == sorted(b.keys())
+    if isinstance(a, pylink.Antenna):
+        return np.array_equal(a.pattern, b.pattern)
+    return a == b
+
+
+class TestSnapshot(object):
+
+    def test_round_trip(self, model, tmpdir):
+        e = model.enum
+        path = str(tmpdir)
+
+        model.override(e.rx_antenna_noise_temp_k, 500)
+        model.override(e.rx_ebn0_db, 12)
+        model.set_meta(e.tx_power_at_pa_dbw, 'part_number', '234x')
+        model.link_margin_db
+
+        pylink.save_model(model, path)
+        loaded = pylink.load_model(path)
+
+        assert loaded.enum.link_margin_db == e.link_margin_db
+        assert loaded.is_overridden(e.rx_ebn0_db)
+        assert 'part_number' in loaded.get_meta(e.tx_power_at_pa_dbw)
+        assert loaded._deps == model._deps
+
+        # Without the cache, nothing should be precomputed
+        assert {} == loaded._cache
+
+        for node in model.nodes():
+            a = model.cached_calculate(node)
+            b = loaded.cached_calculate(node)
+            assert _same(a, b), model.node_name(node)
+
+    def test_warm_cache(self, model, tmpdir):
+        path = str(tmpdir)
+        model.link_margin_db
+        pylink.save_model(model, path, include_cache=True)
+        loaded = pylink.load_model(path)
+        assert len(loaded._cache) == len(model._cache)
+        assert loaded.link_margin_db == model.link_margin_db
+
+    def test_mmap(self, tmpdir):
+        path = str(tmpdir)
+        pattern = np.arange(1000.0)
+        m = pylink.DAGModel(big_pattern=pattern)
+        pylink.save_model(m, path)
+
+        loaded = pylink.load_model(path)
+        assert isinstance(loaded.big_pattern, np.memmap)
+        assert np.array_equal(pattern, loaded.big_pattern)
+
+        loaded = pylink.load_model(path, mmap=False)
+        assert not isinstance(loaded.big_pattern, np.memmap)
+        assert np.array_equal(pattern, loaded.big_pattern)
+
+    def test_unpicklable_calculator(self, tmpdir):
+        m = pylink.DAGModel(a=lambda model: 42)
+        with pytest.raises(pickle.PicklingError):
+            pylink.save_model(m, str(tmpdir))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import itertools
+
+import numpy as np
+import pylink
+import pytest
+
+from testutils import model
+
+
+def _f(m):
+    return m.a * 10 + m.b
+
+
+class TestSweep(object):
+
+    def _simple(self):
+        return pylink.DAGModel(a=1.0, b=2.0, f=_f)
+
+    def test_product_order(self):
+        m = self._simple()
+        s = m.sweep({'a': [1, 2, 3], 'b': [4, 5]}, ['f'], chunk_size=4)
+        assert 6 == len(s)
+        chunks = list(s)
+        assert [(0, 4), (4, 6)] == [(c.start, c.stop) for c in chunks]
+        assert [4, 2] == [len(c) for c in chunks]
+
+        full = s.collect()
+        expected = list(itertools.product([1, 2, 3], [4, 5]))
+        assert [a for a, b in expected] == list(full.inputs['a'])
+        assert [b for a, b in expected] == list(full.inputs['b'])
+        assert [a * 10 + b for a, b in expected] == list(full.outputs['f'])
+
+        # The model is left alone
+        assert 12 == m.f
+
+    def test_zip(self):
+        m = self._simple()
+        s = m.sweep({'a': [1, 2, 3], 'b': [4, 5, 6]}, ['f'], mode='zip')
+        assert [14, 25, 36] == list(s.collect().outputs['f'])
+        with pytest.raises(ValueError):
+            m.sweep({'a': [1, 2, 3], 'b': [4, 5]}, ['f'], mode='zip')
+        with pytest.raises(ValueError):
+            m.sweep({'a': [1]}, ['f'], mode='diagonal')
+
+    def test_resume_and_early_exit(self):
+        m = self._simple()
+        grid = {'a': np.arange(10), 'b': np.arange(7)}
+        s = m.sweep(grid, ['f'], chunk_size=9)
+        full = s.collect()
+
+        seen = []
+        for chunk in s:
+            seen.append(chunk)
+            if 3 == len(seen):
+                break
+        stop = seen[-1].stop
+        assert 27 == stop
+
+        rest = m.sweep(grid, ['f'], chunk_size=9, start=stop).collect()
+        assert 70 - 27 == len(rest)
+        both = np.concatenate([c.outputs['f'] for c in seen]
+                              + [rest.outputs['f']])
+        assert np.array_equal(full.outputs['f'], both)
+
+    def test_lazy(self):
+        # A huge grid costs nothing until it's iterated over
+        m = self._simple()
+        s = m.sweep({'a': np.arange(100000), 'b': np.arange(100000)},
+                    ['f'], chunk_size=5)
+        assert 10**10 == len(s)
+        chunk = next(iter(s))
+        assert [0, 1, 2, 3, 4] == list(chunk.outputs['f'])
+        chunk = s.evaluate(10**10 - 2, 10**10 + 5)
+        assert (10**10 - 2, 10**10,) == (chunk.start, chunk.stop,)
+        assert [99999 * 10 + 99998, 99999 * 10 + 99999] == list(
+            chunk.outputs['f'])
+
+    def test_vectorized_matches(self, model):
+        grid = {'min_elevation_deg': np.linspace(5, 90, 7),
+                'rain_loss_db': [0.0, 1.5, 3.0]}
+        code = model.best_modulation_code
+        model.override(model.enum.best_modulation_code, code)
+        outputs = ['link_margin_db', 'slant_range_km']
+        slow = model.sweep(grid, outputs, chunk_size=5).collect()
+        fast = model.sweep(grid, outputs, chunk_size=5,
+                           vectorized=True).collect()
+        for name in outputs:
+            assert np.allclose(slow.outputs[name], fast.outputs[name])
@@ -33,15 +33,32 @@ perf = [
     ]
 
 
+def tributaries(extra=(), rx_antenna=None, tx_antenna=None,
+                transmitter=None, channel=None, modulation=None):
+    """Returns a fresh list of every standard tributary.
+
+    extra -- further tributaries to append
+    rx_antenna, tx_antenna, transmitter, channel, modulation -- dicts of
+        keyword arguments overriding those tributaries' defaults
+    """
+    rx = dict(is_rx=True, tracking=True)
+    rx.update(rx_antenna or {})
+    tx = dict(is_rx=False, tracking=False)
+    tx.update(tx_antenna or {})
+    mod = dict(name='QPSK', perf=perf)
+    mod.update(modulation or {})
+    return [pylink.Geometry(),
+            pylink.Antenna(**rx),
+            pylink.Interconnect(is_rx=True),
+            pylink.Receiver(),
+            pylink.Transmitter(**(transmitter or {})),
+            pylink.Interconnect(is_rx=False),
+            pylink.Antenna(**tx),
+            pylink.Channel(**(channel or {})),
+            pylink.Modulation(**mod),
+            pylink.LinkBudget()] + list(extra)
+
+
 @pytest.fixture
 def model():
-    return pylink.DAGModel([pylink.Geometry(),
-                            pylink.Antenna(is_rx=True, tracking=True),
-                            pylink.Interconnect(is_rx=True),
-                            pylink.Receiver(),
-                            pylink.Transmitter(),
-                            pylink.Interconnect(is_rx=False),
-                            pylink.Antenna(is_rx=False, tracking=False),
-                            pylink.Channel(),
-                            pylink.Modulation(name='QPSK', perf=perf),
-                            pylink.LinkBudget()])
+    return pylink.DAGModel(tributaries())
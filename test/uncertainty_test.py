@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pylink
+import pytest
+
+from testutils import model
+
+
+class TestUncertainty(object):
+
+    def test_distributions(self):
+        rng = np.random.default_rng(0)
+        n = 200000
+        for dist, nominal in [(pylink.Normal(2, 0.5), 2),
+                              (pylink.Uniform(1, 3), 2),
+                              (pylink.Triangular(1, 1.5, 3), 1.5),
+                              (pylink.Empirical([1, 2, 2, 3, 7]), 2)]:
+            assert nominal == dist.nominal
+            samples = dist.sample(n, rng)
+            assert (n,) == samples.shape
+            assert abs(np.std(samples) - dist.std()) < 0.02
+
+    def test_nominal_evaluation(self):
+        m = pylink.DAGModel(a=pylink.Normal(3, 1),
+                            b=pylink.TaggedAttribute(pylink.Uniform(0, 2),
+                                                     part='x'),
+                            c=lambda m: m.a + m.b)
+        e = m.enum
+        assert 4 == m.c
+        assert isinstance(m.get_distribution(e.a), pylink.Normal)
+        assert 'x' == m.get_meta(e.b)['part']
+        assert m.get_distribution(e.c) is None
+
+    def test_monte_carlo_matches_scalar(self, model):
+        e = model.enum
+        model.accept_tribute({
+            'rain_loss_db': pylink.Normal(0.5, 0.3),
+            'min_elevation_deg': pylink.Uniform(5, 60),
+            })
+        model.clear_cache()
+        nominal = model.link_margin_db
+
+        mc = pylink.monte_carlo(model, ['link_margin_db', 'cn0_db'],
+                                n=1000, seed=42)
+        assert (1000,) == mc['link_margin_db'].shape
+        assert nominal == model.link_margin_db
+
+        # The vectorized pass must agree with evaluating the samples
+        # one at a time, at the nominal modulation code.
+        code = model.best_modulation_code
+        for i in range(0, 1000, 97):
+            with model.scoped({e.rain_loss_db:
+                               mc.inputs['rain_loss_db'][i],
+                               e.min_elevation_deg:
+                               mc.inputs['min_elevation_deg'][i],
+                               e.best_modulation_code: code}):
+                expected = model.link_margin_db
+            assert abs(expected - mc['link_margin_db'][i]) < 1e-9
+
+        pct = mc.percentiles('link_margin_db')
+        assert pct[5] < pct[50] < pct[95]
+        assert 0 <= mc.probability_below('link_margin_db', nominal) <= 1
+        assert set(['link_margin_db', 'cn0_db']) == set(mc.summary())
+
+    def test_monte_carlo_repeatable(self, model):
+        model.accept_tribute({'rain_loss_db': pylink.Normal(0.5, 0.3)})
+        model.clear_cache()
+        a = pylink.monte_carlo(model, ['link_margin_db'], n=100, seed=1)
+        b = pylink.monte_carlo(model, ['link_margin_db'], n=100, seed=1)
+        assert np.all(a['link_margin_db'] == b['link_margin_db'])
+
+        # Outputs that don't depend on anything uncertain are constant
+        c = pylink.monte_carlo(model, ['bitrate_hz'], n=10, seed=1)
+        assert np.all(c['bitrate_hz'] == model.bitrate_hz)
+
+    def test_monte_carlo_nothing_uncertain(self, model):
+        with pytest.raises(ValueError):
+            pylink.monte_carlo(model, ['link_margin_db'])
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import math
+import numpy as np
 import pylink
 import pytest
 
@@ -14,6 +15,19 @@ class TestUtils(object):
         assert abs(pylink.from_db(10) - 10) < 1e-6
         assert abs(pylink.from_db(3) - 2) < 0.1
 
+    def test_db_arrays(self):
+        v = np.array([1.0, 2.0, 10.0])
+        for i in range(len(v)):
+            assert abs(pylink.to_db(v)[i] - pylink.to_db(v[i])) < 1e-9
+            assert abs(pylink.from_db(v)[i] - pylink.from_db(v[i])) < 1e-9
+
+    def test_pfd_hz_manual_adjust_arrays(self):
+        occ = np.array([0.5, 2.0, 1000.0])
+        adjusted = pylink.utils.pfd_hz_manual_adjust(-100, occ, 1)
+        for i in range(len(occ)):
+            expected = pylink.utils.pfd_hz_manual_adjust(-100, occ[i], 1)
+            assert abs(adjusted[i] - expected) < 1e-9
+
     def test_e_field_to_eirp_dbw(self):
         # http://www.ti.com/lit/an/swra048/swra048.pdf
         eirp_dbw = pylink.e_field_to_eirp_dbw(200e-6, 3)